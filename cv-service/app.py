@@ -1,6 +1,6 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 import cv2
 import numpy as np
@@ -8,8 +8,20 @@ import time
 import os
 from typing import List, Dict, Any, Optional
 import base64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from yolov8 import YOLOv8, utils
-import boto3
+from cascade import CascadeDetector, CASCADE_MODES
+from warmup import warm_up_detector, parse_shapes, parse_batch_sizes
+from detection_cache import DetectionCache
+from inference_pool import InferencePool, parse_cpu_sets
+from scheduler import (PriorityScheduler, PRIORITY_CLASSES, DeadlineExceeded, current_deadline, lower_thread_priority,
+                       parse_deadline, parse_quotas)
+import rekognition_backend
+import streaming
+import fast_decode
+import metrics
 from botocore.exceptions import ClientError
 import json
 from dotenv import load_dotenv
@@ -28,9 +40,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    """Count requests and track latency and in-flight requests per endpoint"""
+    # Unknown paths share one label to keep the label cardinality bounded
+    endpoint = request.url.path if request.url.path in known_paths() else "other"
+    model = current_model_label()
+    in_flight = metrics.IN_FLIGHT.labels(endpoint=endpoint)
+    in_flight.inc()
+    exemplar = metrics.trace_exemplar(request.headers.get('traceparent'))
+    # Budget left on the caller's deadline, counted from arrival - queued detections past it are dropped
+    current_deadline.set(parse_deadline(request.headers.get('x-deadline-ms'), time.monotonic()))
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        # Lets traced callers split their round-trip into service time and transport/queueing
+        response.headers['Server-Timing'] = f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+        return response
+    finally:
+        in_flight.dec()
+        metrics.REQUEST_SECONDS.labels(endpoint=endpoint, model=model).observe(time.perf_counter() - start, exemplar)
+        metrics.REQUESTS.labels(endpoint=endpoint, model=model, status=str(status)).inc()
+
+@lru_cache(maxsize=1)
+def known_paths():
+    # Routes are fixed once the app is imported
+    return frozenset(route.path for route in app.routes)
+
 # Global variables for model and configuration
 yolov8_detector = None
+yolov8_model_path = None
+cascade_detector = None
+detection_cache = None
+inference_pool = None  # InferencePool when INFERENCE_WORKERS > 0
 rekognition_client = None
+rekognition = None  # RekognitionBackend wrapping rekognition_client
 cv_service_config = {
     "service": os.getenv('CV_SERVICE', 'yolov8'),  # 'yolov8' or 'rekognition'
     "aws_region": os.getenv('AWS_REGION', 'eu-central-1'),
@@ -42,9 +88,114 @@ cv_service_config = {
 YOLO_CONFIDENCE_THRESHOLD = float(os.getenv('YOLO_CONFIDENCE', '0.25'))
 YOLO_IOU_THRESHOLD = float(os.getenv('YOLO_IOU', '0.45'))
 
+# Two-stage cascade: small screening model first, heavy model only on candidates
+CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'false').lower() == 'true'
+CASCADE_SCREEN_MODEL_PATH = os.getenv('CASCADE_SCREEN_MODEL_PATH', '../models/yolov8n.onnx')
+CASCADE_SCREEN_CONFIDENCE = float(os.getenv('CASCADE_SCREEN_CONFIDENCE', '0.1'))
+CASCADE_MODE = os.getenv('CASCADE_MODE', 'roi')  # 'frame' or 'roi'
+CASCADE_ROI_PADDING = float(os.getenv('CASCADE_ROI_PADDING', '1.0'))
+
+# Startup warm-up: dummy inferences per expected frame size before reporting ready
+WARMUP_ITERATIONS = int(os.getenv('WARMUP_ITERATIONS', '3'))
+WARMUP_SHAPES = parse_shapes(os.getenv('WARMUP_SHAPES', '1280x720,2560x1440'))
+WARMUP_BATCH_SIZES = parse_batch_sizes(os.getenv('WARMUP_BATCH_SIZES', '1'))
+
+# Readiness - only true once the loaded models are warmed up
+service_ready = False
+warmup_status = {
+    "state": "pending",  # 'pending', 'running', 'done' or 'failed'
+    "duration": None,
+    "timings": {},
+    "error": None
+}
+
+# Detection cache for repeated frames (local-image devices, frozen streams)
+DETECTION_CACHE_ENABLED = os.getenv('DETECTION_CACHE_ENABLED', 'true').lower() == 'true'
+DETECTION_CACHE_SIZE = int(os.getenv('DETECTION_CACHE_SIZE', '256'))
+DETECTION_CACHE_TTL = float(os.getenv('DETECTION_CACHE_TTL', '60'))
+DETECTION_CACHE_PHASH = os.getenv('DETECTION_CACHE_PHASH', 'false').lower() == 'true'
+DETECTION_CACHE_PHASH_DISTANCE = int(os.getenv('DETECTION_CACHE_PHASH_DISTANCE', '4'))
+
+if DETECTION_CACHE_ENABLED:
+    detection_cache = DetectionCache(
+        max_entries=DETECTION_CACHE_SIZE,
+        ttl=DETECTION_CACHE_TTL,
+        phash_enabled=DETECTION_CACHE_PHASH,
+        phash_max_distance=DETECTION_CACHE_PHASH_DISTANCE
+    )
+
+# Rekognition backend: worker pool size, retries on throttling, upload size and result cache
+REKOGNITION_MAX_CONCURRENCY = int(os.getenv('REKOGNITION_MAX_CONCURRENCY', '8'))
+REKOGNITION_MAX_ATTEMPTS = int(os.getenv('REKOGNITION_MAX_ATTEMPTS', '5'))
+REKOGNITION_MAX_IMAGE_SIDE = int(os.getenv('REKOGNITION_MAX_IMAGE_SIDE', '1280'))
+REKOGNITION_CACHE_SIZE = int(os.getenv('REKOGNITION_CACHE_SIZE', '256'))
+REKOGNITION_CACHE_TTL = float(os.getenv('REKOGNITION_CACHE_TTL', '300'))
+
+# Streaming detection (/ws/detect): default and maximum analysed frames per second
+STREAM_TARGET_FPS = float(os.getenv('STREAM_TARGET_FPS', '5'))
+STREAM_MAX_FPS = float(os.getenv('STREAM_MAX_FPS', '30'))
+
+# Decode large JPEGs at 1/2, 1/4 or 1/8 scale (never below the model input size x margin)
+REDUCED_DECODE = os.getenv('REDUCED_DECODE', 'true').lower() == 'true'
+REDUCED_DECODE_MARGIN = float(os.getenv('REDUCED_DECODE_MARGIN', '1.0'))
+
+# Multi-process inference: worker processes with their own pinned ONNX session (0 = in this process)
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0'))
+# Cores per worker, e.g. '0-3;4-7' (default: the available cores split evenly)
+INFERENCE_CPU_SETS = os.getenv('INFERENCE_CPU_SETS', '')
+# Shared memory per frame slot - larger decoded frames are detected in this process (2560x1440 BGR = 11 MB)
+INFERENCE_SLOT_MB = float(os.getenv('INFERENCE_SLOT_MB', '12'))
+# Frames in flight in the workers (0 = two per worker)
+INFERENCE_SLOTS = int(os.getenv('INFERENCE_SLOTS', '0'))
+INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', '30'))
+# Seconds the workers may take to load and warm up their models before warm-up fails
+INFERENCE_STARTUP_TIMEOUT = float(os.getenv('INFERENCE_STARTUP_TIMEOUT', '300'))
+
+# Priority classes (targeting > interactive > batch) share one inference slot per worker (one in-process);
+# per-class concurrency quotas, e.g. 'interactive:3,batch:1' (default: lower classes leave a slot to targeting)
+SCHEDULER_QUOTAS = os.getenv('SCHEDULER_QUOTAS', '')
+scheduler = PriorityScheduler(max(INFERENCE_WORKERS, 1), parse_quotas(SCHEDULER_QUOTAS, max(INFERENCE_WORKERS, 1)))
+# In-process inference runs on this thread, so the event loop keeps accepting and ordering requests meanwhile
+inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+# Decoding for interactive/batch requests and rendering annotated images: threads and their nice value
+SCHEDULER_BACKGROUND_THREADS = int(os.getenv('SCHEDULER_BACKGROUND_THREADS', '2'))
+SCHEDULER_BACKGROUND_NICE = int(os.getenv('SCHEDULER_BACKGROUND_NICE', '10'))
+background_executor = ThreadPoolExecutor(max_workers=SCHEDULER_BACKGROUND_THREADS, thread_name_prefix='background',
+                                         initializer=lower_thread_priority, initargs=(SCHEDULER_BACKGROUND_NICE,))
+
+# Class name keywords treated as birds
+BIRD_KEYWORDS = ['bird', 'birds', 'vogel', 'vögel', 'pigeon', 'dove', 'sparrow', 'crow', 'raven', 'eagle', 'hawk']
+
+def is_bird_class(class_name):
+    """Check whether a class name is bird-related"""
+    return any(keyword in class_name.lower() for keyword in BIRD_KEYWORDS)
+
+def model_label(model_path):
+    """Short model name for metric labels, e.g. 'yolov8l'"""
+    return os.path.splitext(os.path.basename(model_path))[0] if model_path else "none"
+
+def current_model_label():
+    if cv_service_config["service"] == "rekognition":
+        return "rekognition"
+    return model_label(yolov8_model_path)
+
+def resolve_model_path(model_path):
+    """Resolve a model path relative to this file's directory"""
+    if not os.path.isabs(model_path):
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        model_path = os.path.abspath(os.path.join(script_dir, model_path))
+    return model_path
+
 def load_model():
     """Load the appropriate model based on configuration"""
-    global yolov8_detector, rekognition_client
+    global yolov8_detector, rekognition_client, cascade_detector
+    
+    # Cached results belong to the previous model
+    if detection_cache is not None:
+        detection_cache.clear()
+    stop_inference_pool()
+    # Only the YOLOv8 backend uses the cascade - load_yolov8_model loads it again if enabled
+    cascade_detector = None
     
     if cv_service_config["service"] == "yolov8":
         load_yolov8_model()
@@ -55,20 +206,16 @@ def load_model():
 
 def load_yolov8_model():
     """Load the YOLOv8 model using the working repository approach"""
-    global yolov8_detector
+    global yolov8_detector, yolov8_model_path
     
     # Use local models directory - resolve relative path from this file's directory
-    model_path = os.getenv('MODEL_PATH', '../models/yolov8l.onnx')
-    
-    # Convert to absolute path if it's relative
-    if not os.path.isabs(model_path):
-        # Get the directory where this script is located
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.abspath(os.path.join(script_dir, model_path))
+    model_path = resolve_model_path(os.getenv('MODEL_PATH', '../models/yolov8l.onnx'))
     
     try:
         # Initialize YOLOv8 detector with configurable thresholds
-        yolov8_detector = YOLOv8(model_path, conf_thres=YOLO_CONFIDENCE_THRESHOLD, iou_thres=YOLO_IOU_THRESHOLD)
+        yolov8_detector = YOLOv8(model_path, conf_thres=YOLO_CONFIDENCE_THRESHOLD, iou_thres=YOLO_IOU_THRESHOLD,
+                                 stage_callback=metrics.stage_callback(model_label(model_path)))
+        yolov8_model_path = model_path
         
         print(f"YOLOv8 model loaded successfully: {model_path}")
         print(f"Confidence threshold: {yolov8_detector.conf_threshold}")
@@ -77,26 +224,96 @@ def load_yolov8_model():
     except Exception as e:
         print(f"Error loading YOLOv8 model: {e}")
         raise e
+    
+    if CASCADE_ENABLED:
+        load_cascade_detector()
+    
+    if INFERENCE_WORKERS > 0:
+        start_inference_pool()
+
+def load_cascade_detector():
+    """Load the screening model and wrap both models into a cascade"""
+    global cascade_detector
+    
+    if CASCADE_MODE not in CASCADE_MODES:
+        raise ValueError(f"Unknown cascade mode: {CASCADE_MODE}")
+    
+    screen_model_path = resolve_model_path(CASCADE_SCREEN_MODEL_PATH)
+    
+    try:
+        screen_detector = YOLOv8(screen_model_path, conf_thres=CASCADE_SCREEN_CONFIDENCE, iou_thres=YOLO_IOU_THRESHOLD,
+                                 stage_callback=metrics.stage_callback(model_label(screen_model_path)))
+        bird_class_ids = [i for i, name in enumerate(utils.class_names) if is_bird_class(name)]
+        cascade_detector = CascadeDetector(screen_detector, yolov8_detector, bird_class_ids,
+                                           mode=CASCADE_MODE, roi_padding=CASCADE_ROI_PADDING)
+        
+        print(f"Cascade screening model loaded successfully: {screen_model_path}")
+        print(f"Cascade mode: {CASCADE_MODE}, screening threshold: {CASCADE_SCREEN_CONFIDENCE}")
+        
+    except Exception as e:
+        # The single-model path keeps working without the cascade
+        cascade_detector = None
+        print(f"Error loading cascade screening model, using single model: {e}")
+
+def start_inference_pool():
+    """Start worker processes running the loaded models - this process keeps its own for oversized frames"""
+    global inference_pool
+    
+    config = {
+        "model_path": yolov8_model_path,
+        "model_label": model_label(yolov8_model_path),
+        "conf_threshold": YOLO_CONFIDENCE_THRESHOLD,
+        "iou_threshold": YOLO_IOU_THRESHOLD,
+        "cascade": None,
+        "warmup": (WARMUP_SHAPES, WARMUP_ITERATIONS, WARMUP_BATCH_SIZES) if WARMUP_ITERATIONS > 0 else None
+    }
+    if cascade_detector is not None:
+        screen_model_path = resolve_model_path(CASCADE_SCREEN_MODEL_PATH)
+        config["cascade"] = {
+            "screen_model_path": screen_model_path,
+            "screen_model_label": model_label(screen_model_path),
+            "screen_confidence": CASCADE_SCREEN_CONFIDENCE,
+            "mode": cascade_detector.mode,
+            "roi_padding": cascade_detector.roi_padding,
+            "bird_class_ids": sorted(cascade_detector.candidate_class_ids)
+        }
+    
+    pool = InferencePool(INFERENCE_WORKERS, config, INFERENCE_SLOT_MB * 1e6,
+                         parse_cpu_sets(INFERENCE_CPU_SETS, INFERENCE_WORKERS),
+                         slots=INFERENCE_SLOTS or None, timeout=INFERENCE_TIMEOUT)
+    pool.start(asyncio.get_running_loop())
+    inference_pool = pool
+
+def stop_inference_pool():
+    global inference_pool
+    
+    if inference_pool is not None:
+        inference_pool.close()
+        inference_pool = None
 
 def load_rekognition_client():
     """Initialize AWS Rekognition client"""
-    global rekognition_client
+    global rekognition_client, rekognition
     
     try:
-        # Initialize Rekognition client
-        if cv_service_config["aws_access_key"] and cv_service_config["aws_secret_key"]:
-            rekognition_client = boto3.client(
-                'rekognition',
-                region_name=cv_service_config["aws_region"],
-                aws_access_key_id=cv_service_config["aws_access_key"],
-                aws_secret_access_key=cv_service_config["aws_secret_key"]
-            )
-        else:
-            # Use default AWS credentials (from environment, IAM role, etc.)
-            rekognition_client = boto3.client(
-                'rekognition',
-                region_name=cv_service_config["aws_region"]
-            )
+        # Initialize Rekognition client - connection pool sized to the worker pool
+        rekognition_client = rekognition_backend.create_client(
+            cv_service_config["aws_region"],
+            access_key=cv_service_config["aws_access_key"],
+            secret_key=cv_service_config["aws_secret_key"],
+            max_pool_connections=REKOGNITION_MAX_CONCURRENCY,
+            max_attempts=REKOGNITION_MAX_ATTEMPTS
+        )
+        
+        if rekognition is not None:
+            rekognition.shutdown()
+        rekognition = rekognition_backend.RekognitionBackend(
+            rekognition_client,
+            max_concurrency=REKOGNITION_MAX_CONCURRENCY,
+            max_image_side=REKOGNITION_MAX_IMAGE_SIDE,
+            cache_size=REKOGNITION_CACHE_SIZE,
+            cache_ttl=REKOGNITION_CACHE_TTL
+        )
         
         print(f"AWS Rekognition client initialized for region: {cv_service_config['aws_region']}")
         
@@ -104,12 +321,59 @@ def load_rekognition_client():
         print(f"Error initializing AWS Rekognition client: {e}")
         raise e
 
+def warm_up_models():
+    """Warm up all loaded models and mark the service as ready"""
+    global service_ready
+    
+    service_ready = False
+    warmup_status.update({"state": "running", "duration": None, "timings": {}, "error": None})
+    start_time = time.time()
+    
+    try:
+        detectors = {}
+        if cv_service_config["service"] == "yolov8" and yolov8_detector is not None:
+            detectors["main"] = yolov8_detector
+            if cascade_detector is not None:
+                detectors["screen"] = cascade_detector.screen_detector
+        
+        if inference_pool is not None:
+            # The workers warm up their own sessions; this process only detects oversized frames
+            for index, timings in inference_pool.wait_ready(INFERENCE_STARTUP_TIMEOUT).items():
+                warmup_status["timings"][f"worker_{index}"] = timings
+            detectors = {}
+        
+        # Rekognition runs remotely - nothing to warm up
+        for name, detector in detectors.items():
+            warmup_status["timings"][name] = warm_up_detector(
+                detector, WARMUP_SHAPES, WARMUP_ITERATIONS, WARMUP_BATCH_SIZES
+            )
+        
+        warmup_status["state"] = "done"
+        service_ready = True
+        print(f"Warm-up complete after {time.time() - start_time:.2f}s: {warmup_status['timings']}")
+        
+    except Exception as e:
+        warmup_status["state"] = "failed"
+        warmup_status["error"] = str(e)
+        print(f"Error during model warm-up: {e}")
+    
+    finally:
+        warmup_status["duration"] = time.time() - start_time
+
 # All the complex preprocessing, postprocessing, and drawing functions are now handled by the YOLOv8 class from the repository
 
 @app.on_event("startup")
 async def startup_event():
-    """Load model on startup"""
+    """Load model on startup and warm it up in the background"""
     load_model()
+    # Warm-up runs off the event loop so /health stays responsive; /ready reports when it's done.
+    # It shares the inference thread, so detections queue behind it instead of running the
+    # same model instance concurrently (YOLOv8 keeps per-call input sizes on the instance)
+    asyncio.get_running_loop().run_in_executor(inference_executor, warm_up_models)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_inference_pool()
 
 @app.get("/")
 async def root():
@@ -129,16 +393,60 @@ async def health():
         "status": "healthy",
         "message": "Taubenschiesser CV Service is running", 
         "model_loaded": model_loaded,
+        "ready": service_ready,
         "service": cv_service_config["service"]
     }
 
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint - 200 only after the models are loaded and warmed up"""
+    body = {
+        "ready": service_ready,
+        "service": cv_service_config["service"],
+        "warmup": warmup_status
+    }
+    if not service_ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+@app.get("/metrics")
+async def get_metrics(request: Request):
+    """Prometheus metrics"""
+    data, content_type = metrics.render(request.headers.get('accept'))
+    return Response(content=data, media_type=content_type)
+
+@app.get("/cache")
+async def get_cache_stats():
+    """Detection cache size and hit/miss metrics"""
+    stats = {"enabled": False}
+    if detection_cache is not None:
+        stats = {"enabled": True, **detection_cache.stats()}
+    if rekognition is not None:
+        stats["rekognition"] = rekognition.stats()
+    return stats
+
+@app.delete("/cache")
+async def clear_cache():
+    """Drop all cached detection results"""
+    if detection_cache is not None:
+        detection_cache.clear()
+    if rekognition is not None and rekognition.cache is not None:
+        rekognition.cache.clear()
+    return {"message": "Detection cache cleared"}
+
+@app.get("/scheduler")
+async def get_scheduler_stats():
+    """Inference slots, quotas, running and queued detections per priority class"""
+    return scheduler.stats()
+
 @app.get("/config")
 async def get_config():
     """Get current configuration"""
     return {
         "service": cv_service_config["service"],
         "aws_region": cv_service_config["aws_region"],
-        "aws_configured": bool(cv_service_config["aws_access_key"] and cv_service_config["aws_secret_key"])
+        "aws_configured": bool(cv_service_config["aws_access_key"] and cv_service_config["aws_secret_key"]),
+        "cascade_enabled": cascade_detector is not None
     }
 
 @app.post("/config")
@@ -163,30 +471,117 @@ async def update_config(config: Dict[str, Any]):
     # Reload model with new configuration
     try:
         load_model()
+        await asyncio.get_running_loop().run_in_executor(inference_executor, warm_up_models)
         return {"message": "Configuration updated successfully", "config": cv_service_config}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to reload model: {str(e)}")
 
-def load_image_from_file(file):
-    """Load image from uploaded file - BASED ON WORKING REPOSITORY"""
+def run_detector(detector, image):
+    """boxes, scores, class_ids and cascade info (or None) of one detection"""
+    boxes, scores, class_ids = detector(image)
+    return boxes, scores, class_ids, dict(detector.last_info) if isinstance(detector, CascadeDetector) else None
+
+async def detect_with_cache(detector, image, class_filter, scale=(1.0, 1.0), priority="batch"):
+    """Run a detector, answering repeated frames from the detection cache
+    
+    Cache misses wait for an inference slot in the scheduler under the given priority class.
+    Returns boxes, scores, class_ids, cascade info (or None) and whether it was a cache hit.
+    Boxes are scaled by scale (reduced-scale decoding) to the original image coordinates.
+    """
+    is_cascade = isinstance(detector, CascadeDetector)
+    
+    if is_cascade:
+        params = ("cascade", yolov8_model_path, CASCADE_SCREEN_MODEL_PATH, detector.mode,
+                  detector.screen_detector.conf_threshold, detector.confirm_detector.conf_threshold,
+                  detector.confirm_detector.iou_threshold, class_filter)
+    else:
+        params = ("single", yolov8_model_path, detector.conf_threshold, detector.iou_threshold, class_filter)
+    
+    if detection_cache is not None:
+        cached = detection_cache.get(image, params)
+        metrics.CACHE_LOOKUPS.labels(result="miss" if cached is None else "hit").inc()
+        if cached is not None:
+            boxes, scores, class_ids, info = cached
+            return fast_decode.scale_boxes(boxes, scale), scores, class_ids, info, True
+    
+    async with scheduler.slot(priority):
+        if inference_pool is not None and inference_pool.fits(image):
+            boxes, scores, class_ids, info, timings, _ = await inference_pool.detect(
+                "cascade" if is_cascade else "single", image)
+            # Stage timings measured in the worker
+            for stage, seconds, model in timings:
+                metrics.observe_stage(stage, seconds, model)
+        else:
+            boxes, scores, class_ids, info = await asyncio.get_running_loop().run_in_executor(
+                inference_executor, run_detector, detector, image)
+    
+    if detection_cache is not None:
+        detection_cache.put(image, params, (boxes, scores, class_ids, info))
+    
+    return fast_decode.scale_boxes(boxes, scale), scores, class_ids, info, False
+
+def decode_min_size(cascade=False):
+    """Smallest decoded size that loses nothing for the detector, or None for full resolution"""
+    if not REDUCED_DECODE or yolov8_detector is None:
+        return None
+    # ROI cascade crops the frame for the confirmation model - it needs the full resolution
+    if cascade and cascade_detector is not None and cascade_detector.mode == "roi":
+        return None
+    return (int(yolov8_detector.input_width * REDUCED_DECODE_MARGIN),
+            int(yolov8_detector.input_height * REDUCED_DECODE_MARGIN))
+
+def load_image_from_file(file, endpoint="other", min_size=None):
+    """Load image from uploaded file - BASED ON WORKING REPOSITORY
+    
+    With min_size, large JPEGs are decoded at a reduced scale. Returns the
+    image and the (x, y) scale mapping its coordinates back to the upload.
+    """
     contents = file.file.read()
-    nparr = np.frombuffer(contents, np.uint8)
-    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    with metrics.stage_timer("decode", current_model_label()):
+        image, scale, full_size = fast_decode.decode_image(contents, min_size)
+    if image is not None:
+        metrics.observe_image(endpoint, image, len(contents), full_size)
+    return image, scale
 
-def detect_with_rekognition(image_bytes):
-    """Detect objects using AWS Rekognition"""
-    global rekognition_client
+def priority_class(value, default):
+    """Priority class of a request - an X-Priority header overrides the endpoint's default"""
+    if not value:
+        return default
+    priority = value.strip().lower()
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=400, detail=f"Priority must be one of {', '.join(PRIORITY_CLASSES)}")
+    return priority
+
+def render_annotated(image, boxes, scores, class_ids):
+    """Draw the detections and JPEG-encode the result (runs on an executor thread)"""
+    model = current_model_label()
+    with metrics.stage_timer("draw", model):
+        annotated_image, results = utils.draw_detections(image, boxes, scores, class_ids, 0.4)
     
-    if rekognition_client is None:
+    with metrics.stage_timer("encode", model):
+        success, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    if not success:
+        print("[ERROR] Failed to encode image")
+        # Fallback: return original image
+        _, buffer = cv2.imencode('.jpg', image)
+    return base64.b64encode(buffer).decode('utf-8')
+
+async def decode_upload(file, endpoint="other", min_size=None, priority="targeting"):
+    """load_image_from_file on an executor thread - decoding releases the GIL, the event loop keeps serving
+    
+    Only targeting requests decode on the default executor; the others use the niced background threads.
+    """
+    executor = None if priority == "targeting" else background_executor
+    return await asyncio.get_running_loop().run_in_executor(executor, load_image_from_file, file, endpoint, min_size)
+
+async def detect_with_rekognition(image_bytes):
+    """Detect objects using AWS Rekognition"""
+    if rekognition is None:
         raise HTTPException(status_code=500, detail="Rekognition client not initialized")
     
     try:
         # Call AWS Rekognition
-        response = rekognition_client.detect_labels(
-            Image={'Bytes': image_bytes},
-            MaxLabels=10,
-            MinConfidence=0.5
-        )
+        response = await rekognition.detect_labels(image_bytes, max_labels=10, min_confidence=0.5)
         
         # Process response
         detections = []
@@ -222,20 +617,14 @@ def detect_with_rekognition(image_bytes):
         print(f"Error in detect_with_rekognition: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def detect_birds_with_rekognition(image_bytes):
+async def detect_birds_with_rekognition(image_bytes):
     """Detect only birds using AWS Rekognition"""
-    global rekognition_client
-    
-    if rekognition_client is None:
+    if rekognition is None:
         raise HTTPException(status_code=500, detail="Rekognition client not initialized")
     
     try:
         # Call AWS Rekognition
-        response = rekognition_client.detect_labels(
-            Image={'Bytes': image_bytes},
-            MaxLabels=20,
-            MinConfidence=0.3
-        )
+        response = await rekognition.detect_labels(image_bytes, max_labels=20, min_confidence=0.3)
         
         # Filter for bird-related labels
         bird_detections = []
@@ -272,23 +661,24 @@ def detect_birds_with_rekognition(image_bytes):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/detect")
-async def detect_objects(file: UploadFile = File(...)):
+async def detect_objects(file: UploadFile = File(...), x_priority: Optional[str] = Header(None)):
     """Detect objects in uploaded image using configured service"""
     if cv_service_config["service"] == "yolov8":
-        return await detect_objects_yolov8(file)
+        return await detect_objects_yolov8(file, priority_class(x_priority, "interactive"))
     elif cv_service_config["service"] == "rekognition":
         return await detect_objects_rekognition(file)
     else:
         raise HTTPException(status_code=500, detail="No valid CV service configured")
 
-async def detect_objects_yolov8(file: UploadFile):
+async def detect_objects_yolov8(file: UploadFile, priority="interactive"):
     """Detect objects using YOLOv8"""
     if yolov8_detector is None:
         raise HTTPException(status_code=500, detail="YOLOv8 model not loaded")
     
     try:
         # Load image using working repository method
-        image = load_image_from_file(file)
+        # Full resolution - the annotated image is returned to the client
+        image, _ = await decode_upload(file, "/detect", priority=priority)
         
         if image is None:
             raise HTTPException(status_code=400, detail="Invalid image format")
@@ -296,7 +686,7 @@ async def detect_objects_yolov8(file: UploadFile):
         start_time = time.time()
         
         # Detect objects using working repository method
-        boxes, scores, class_ids = yolov8_detector(image)
+        boxes, scores, class_ids, _, cache_hit = await detect_with_cache(yolov8_detector, image, "all", priority=priority)
         
         # Convert to our format
         detections = []
@@ -322,23 +712,17 @@ async def detect_objects_yolov8(file: UploadFile):
             }
             detections.append(detection)
         
-        # Draw detections on image using working repository method
-        annotated_image, results = yolov8_detector.draw_detections(image)
-        
         processing_time = time.time() - start_time
         
-        # Encode annotated image
-        success, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        if not success:
-            print("[ERROR] Failed to encode image")
-            # Fallback: return original image
-            _, buffer = cv2.imencode('.jpg', image)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        # Draw and encode off the event loop - from this request's results, the detector may not have run
+        image_base64 = await asyncio.get_running_loop().run_in_executor(
+            background_executor, render_annotated, image, boxes, scores, class_ids)
         
         return {
             "success": True,
             "detections": detections,
             "processing_time": processing_time,
+            "cache_hit": cache_hit,
             "model": {
                 "name": "YOLOv8",
                 "version": "1.0.0"
@@ -357,6 +741,9 @@ async def detect_objects_yolov8(file: UploadFile):
             }
         }
         
+    except DeadlineExceeded as e:
+        # Shed, not failed - the caller no longer needs the answer
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Error in detect_objects_yolov8: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -373,7 +760,7 @@ async def detect_objects_rekognition(file: UploadFile):
         start_time = time.time()
         
         # Detect objects using AWS Rekognition
-        detections, response = detect_with_rekognition(image_bytes)
+        detections, response = await detect_with_rekognition(image_bytes)
         
         processing_time = time.time() - start_time
         
@@ -401,29 +788,29 @@ async def detect_objects_rekognition(file: UploadFile):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/detect_birds_only")
-async def detect_birds_only(file: UploadFile = File(...)):
+async def detect_birds_only(file: UploadFile = File(...), x_priority: Optional[str] = Header(None)):
     """Detect only birds in uploaded image using configured service"""
     if cv_service_config["service"] == "yolov8":
-        return await detect_birds_only_yolov8(file)
+        return await detect_birds_only_yolov8(file, priority_class(x_priority, "batch"))
     elif cv_service_config["service"] == "rekognition":
         return await detect_birds_only_rekognition(file)
     else:
         raise HTTPException(status_code=500, detail="No valid CV service configured")
 
-async def detect_birds_only_yolov8(file: UploadFile):
+async def detect_birds_only_yolov8(file: UploadFile, priority="batch"):
     """Detect only birds using YOLOv8"""
     if yolov8_detector is None:
         raise HTTPException(status_code=500, detail="YOLOv8 model not loaded")
     
     try:
         # Load image using working repository method
-        image = load_image_from_file(file)
+        image, scale = await decode_upload(file, "/detect_birds_only", decode_min_size(), priority)
         
         if image is None:
             raise HTTPException(status_code=400, detail="Invalid image format")
         
         # Detect objects using working repository method
-        boxes, scores, class_ids = yolov8_detector(image)
+        boxes, scores, class_ids, _, cache_hit = await detect_with_cache(yolov8_detector, image, "birds", scale, priority)
         
         # Filter only birds
         bird_detections = []
@@ -458,9 +845,13 @@ async def detect_birds_only_yolov8(file: UploadFile):
             "bird_count": len(bird_detections),
             "detections": bird_detections,
             "timestamp": time.time(),
+            "cache_hit": cache_hit,
             "service": "YOLOv8"
         }
         
+    except DeadlineExceeded as e:
+        # Shed, not failed - the caller no longer needs the answer
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Error in detect_birds_only_yolov8: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -475,7 +866,7 @@ async def detect_birds_only_rekognition(file: UploadFile):
         image_bytes = await file.read()
         
         # Detect birds using AWS Rekognition
-        bird_detections = detect_birds_with_rekognition(image_bytes)
+        bird_detections = await detect_birds_with_rekognition(image_bytes)
         
         return {
             "success": True,
@@ -490,88 +881,152 @@ async def detect_birds_only_rekognition(file: UploadFile):
         print(f"Error in detect_birds_only_rekognition: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def analyze_birds_optimized(image, cascade=True, scale=(1.0, 1.0), priority="targeting"):
+    """Run the optimized bird detection on a decoded image and build the response"""
+    start_time = time.time()
+    
+    # Detect objects - through the cascade if enabled, so most empty frames skip the heavy model
+    use_cascade = cascade and cascade_detector is not None
+    detector = cascade_detector if use_cascade else yolov8_detector
+    boxes, scores, class_ids, cascade_info, cache_hit = await detect_with_cache(detector, image, "birds_optimized", scale, priority)
+    
+    # Filter and optimize for birds
+    bird_detections = []
+    for box, score, class_id in zip(boxes, scores, class_ids):
+        class_name = utils.class_names[class_id] if class_id < len(utils.class_names) else f"class_{class_id}"
+        
+        # Enhanced bird detection - check for various bird-related terms
+        is_bird = is_bird_class(class_name)
+        
+        if is_bird and score > YOLO_CONFIDENCE_THRESHOLD:
+            x1, y1, x2, y2 = box.astype(int)
+            
+            # Calculate center and dimensions
+            center_x = (x1 + x2) / 2
+            center_y = (y1 + y2) / 2
+            width = x2 - x1
+            height = y2 - y1
+            
+            detection = {
+                "class": class_name,
+                "confidence": float(score),
+                "position": {
+                    "center_x": float(center_x),
+                    "center_y": float(center_y),
+                    "width": float(width),
+                    "height": float(height)
+                },
+                "bbox": {
+                    "x": float(x1),
+                    "y": float(y1),
+                    "width": float(width),
+                    "height": float(height)
+                },
+                "size_category": "large" if width * height > 10000 else "small",
+                "detection_quality": "high" if score > 0.7 else "medium" if score > 0.5 else "low"
+            }
+            bird_detections.append(detection)
+    
+    processing_time = time.time() - start_time
+    
+    # Determine if action should be taken
+    should_activate = len(bird_detections) > 0
+    confidence_level = max([d["confidence"] for d in bird_detections]) if bird_detections else 0.0
+    
+    # Report which stage made the final decision
+    if cascade_info is None:
+        cascade_info = {"decided_by": "single"}
+    
+    return {
+        "success": True,
+        "birds_found": len(bird_detections) > 0,
+        "bird_count": len(bird_detections),
+        "should_activate_taubenschiesser": should_activate,
+        "confidence_level": confidence_level,
+        "detections": bird_detections,
+        "processing_time": processing_time,
+        "timestamp": time.time(),
+        "service": "YOLOv8-Optimized",
+        "model_info": {
+            "confidence_threshold": YOLO_CONFIDENCE_THRESHOLD,
+            "iou_threshold": YOLO_IOU_THRESHOLD
+        },
+        "decided_by": "cache" if cache_hit else cascade_info["decided_by"],
+        "cache_hit": cache_hit,
+        "cascade": cascade_info
+    }
+
 @app.post("/detect_birds_optimized")
-async def detect_birds_optimized(file: UploadFile = File(...)):
+async def detect_birds_optimized(file: UploadFile = File(...), cascade: bool = True,
+                                 x_priority: Optional[str] = Header(None)):
     """Optimized bird detection with YOLOv8 - best for Taubenschiesser"""
     if yolov8_detector is None:
         raise HTTPException(status_code=500, detail="YOLOv8 model not loaded")
+    priority = priority_class(x_priority, "targeting")
     
     try:
         # Load image
-        image = load_image_from_file(file)
+        image, scale = await decode_upload(file, "/detect_birds_optimized", decode_min_size(cascade), priority)
         
         if image is None:
             raise HTTPException(status_code=400, detail="Invalid image format")
         
-        start_time = time.time()
-        
-        # Detect objects
-        boxes, scores, class_ids = yolov8_detector(image)
-        
-        # Filter and optimize for birds
-        bird_detections = []
-        for box, score, class_id in zip(boxes, scores, class_ids):
-            class_name = utils.class_names[class_id] if class_id < len(utils.class_names) else f"class_{class_id}"
-            
-            # Enhanced bird detection - check for various bird-related terms
-            bird_keywords = ['bird', 'birds', 'vogel', 'vögel', 'pigeon', 'dove', 'sparrow', 'crow', 'raven', 'eagle', 'hawk']
-            is_bird = any(keyword in class_name.lower() for keyword in bird_keywords)
-            
-            if is_bird and score > YOLO_CONFIDENCE_THRESHOLD:
-                x1, y1, x2, y2 = box.astype(int)
-                
-                # Calculate center and dimensions
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
-                width = x2 - x1
-                height = y2 - y1
-                
-                detection = {
-                    "class": class_name,
-                    "confidence": float(score),
-                    "position": {
-                        "center_x": float(center_x),
-                        "center_y": float(center_y),
-                        "width": float(width),
-                        "height": float(height)
-                    },
-                    "bbox": {
-                        "x": float(x1),
-                        "y": float(y1),
-                        "width": float(width),
-                        "height": float(height)
-                    },
-                    "size_category": "large" if width * height > 10000 else "small",
-                    "detection_quality": "high" if score > 0.7 else "medium" if score > 0.5 else "low"
-                }
-                bird_detections.append(detection)
-        
-        processing_time = time.time() - start_time
-        
-        # Determine if action should be taken
-        should_activate = len(bird_detections) > 0
-        confidence_level = max([d["confidence"] for d in bird_detections]) if bird_detections else 0.0
-        
-        return {
-            "success": True,
-            "birds_found": len(bird_detections) > 0,
-            "bird_count": len(bird_detections),
-            "should_activate_taubenschiesser": should_activate,
-            "confidence_level": confidence_level,
-            "detections": bird_detections,
-            "processing_time": processing_time,
-            "timestamp": time.time(),
-            "service": "YOLOv8-Optimized",
-            "model_info": {
-                "confidence_threshold": YOLO_CONFIDENCE_THRESHOLD,
-                "iou_threshold": YOLO_IOU_THRESHOLD
-            }
-        }
+        return await analyze_birds_optimized(image, cascade, scale, priority)
         
+    except DeadlineExceeded as e:
+        # Shed, not failed - the caller no longer needs the answer
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Error in detect_birds_optimized: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/ws/detect")
+async def detect_stream(websocket: WebSocket):
+    """Continuous bird detection over a WebSocket
+    
+    The first message is a JSON config:
+        {"mode": "push", "target_fps": 5, "cascade": true, "priority": "interactive"}
+        {"mode": "pull", "rtsp_url": "rtsp://...", "target_fps": 5}
+    In push mode the client then sends frames as binary messages (JPEG/PNG);
+    in pull mode the service reads the RTSP stream itself. Frames arriving
+    faster than they can be analysed are dropped, only the newest is kept.
+    Results are sent as {"type": "detection", ...} messages; send
+    {"type": "stop"} to end the session.
+    """
+    await websocket.accept()
+    if yolov8_detector is None:
+        await websocket.send_json({"type": "error", "message": "YOLOv8 model not loaded"})
+        await websocket.close()
+        return
+    
+    try:
+        config = await websocket.receive_json()
+    except Exception:
+        await websocket.send_json({"type": "error", "message": "Expected a JSON config message"})
+        await websocket.close()
+        return
+    
+    config.setdefault("target_fps", STREAM_TARGET_FPS)
+    cascade = bool(config.get("cascade", True))
+    try:
+        priority = priority_class(config.get("priority"), "interactive")
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "message": e.detail})
+        await websocket.close()
+        return
+    
+    async def analyze(image):
+        metrics.observe_image("/ws/detect", image)
+        return await analyze_birds_optimized(image, cascade, priority=priority)
+    
+    # Pushed frames decode where uploads of the same class do (see decode_upload)
+    executor = None if priority == "targeting" else background_executor
+    await streaming.run_session(websocket, config, analyze, max_fps=STREAM_MAX_FPS, executor=executor)
+    try:
+        await websocket.close()
+    except Exception:
+        pass
+
 # Request models
 class CaptureFrameRequest(BaseModel):
     rtsp_url: str
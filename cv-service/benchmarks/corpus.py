@@ -0,0 +1,51 @@
+"""
+Frame corpora for the benchmarks.
+
+Synthetic frames are generated from a fixed seed - a noisy gray
+background with a few saturated blobs standing in for birds - so runs
+on different machines see identical input. Recorded frames are loaded
+from a directory of camera captures and resized to each benchmark
+resolution.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def synthetic_frames(width, height, count=8, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        frame = np.full((height, width, 3), 120, dtype=np.uint8)
+        noise = rng.integers(-20, 20, size=(height, width, 3), dtype=np.int16)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+        for _ in range(int(rng.integers(0, 5))):
+            color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            axes = (int(rng.integers(width // 60 + 1, width // 12 + 2)),
+                    int(rng.integers(height // 60 + 1, height // 12 + 2)))
+            cv2.ellipse(frame, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(directory, width, height, limit=None):
+    names = sorted(name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS))
+    if limit:
+        names = names[:limit]
+
+    frames = []
+    for name in names:
+        frame = cv2.imread(os.path.join(directory, name))
+        if frame is None:
+            continue
+        if frame.shape[1] != width or frame.shape[0] != height:
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(frame)
+    return frames
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark harness for the CV detection path.
+
+Times YOLOv8.prepare_input, inference, process_output, utils.nms,
+draw_detections and the full /detect_birds_optimized HTTP path (through
+FastAPI's test client) over synthetic and recorded frame corpora at
+several resolutions and batch sizes. Results are written as JSON; with
+--baseline the run is compared against an earlier result file and exits
+non-zero on regressions.
+
+Usage (from cv-service/):
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --model ../models/yolov8l.onnx --recorded ../frames
+    python -m benchmarks.run --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+import onnxruntime
+
+from yolov8 import YOLOv8, utils
+from benchmarks.corpus import synthetic_frames, recorded_frames
+from benchmarks.tiny_model import build_tiny_model
+
+STAGES = ("prepare_input", "inference", "process_output", "nms", "draw_detections", "http")
+
+
+def parse_resolutions(value):
+    return [tuple(int(v) for v in item.lower().split('x')) for item in value.split(',') if item.strip()]
+
+
+def summarize(samples):
+    values = np.array(samples) * 1000
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "min_ms": round(float(values.min()), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+
+def measure(func, inputs, repeat, warmup):
+    """Call func on every input; warm-up calls are not recorded"""
+    for item in inputs[:warmup]:
+        func(item)
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            func(item)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def candidates_before_nms(detector, output):
+    """The first half of YOLOv8.process_output - boxes and scores that go into NMS"""
+    predictions = np.squeeze(output[0]).T
+    scores = np.max(predictions[:, 4:], axis=1)
+    predictions = predictions[scores > detector.conf_threshold, :]
+    scores = scores[scores > detector.conf_threshold]
+    return detector.extract_boxes(predictions), scores
+
+
+def bench_stages(detector, frames, batch_sizes, repeat, warmup):
+    """Per-stage timings for one set of equally sized frames"""
+    results = {}
+
+    results["prepare_input"] = measure(detector.prepare_input, frames, repeat, warmup)
+
+    tensors = [detector.prepare_input(frame) for frame in frames]
+    dynamic_batch = not isinstance(detector.input_shape[0], int)
+    for batch_size in batch_sizes:
+        if batch_size > 1 and not dynamic_batch:
+            continue
+        batches = [np.concatenate([tensors[(i + j) % len(tensors)] for j in range(batch_size)])
+                   for i in range(0, len(tensors), batch_size)]
+        samples = measure(detector.inference, batches, repeat, warmup)
+        # Per-frame cost, so batch sizes are comparable
+        results[("inference", batch_size)] = [s / batch_size for s in samples]
+
+    outputs = [detector.inference(tensor) for tensor in tensors]
+    detector.img_height, detector.img_width = frames[0].shape[:2]
+    results["process_output"] = measure(detector.process_output, outputs, repeat, warmup)
+
+    candidates = [candidates_before_nms(detector, output) for output in outputs]
+    results["nms"] = measure(lambda c: utils.nms(c[0], c[1], detector.iou_threshold), candidates, repeat, warmup)
+
+    detections = [(frame, detector.process_output(output)) for frame, output in zip(frames, outputs)]
+    results["draw_detections"] = measure(
+        lambda d: utils.draw_detections(d[0], *d[1], 0.4) if len(d[1][1]) else d[0],
+        detections, repeat, warmup
+    )
+
+    return results
+
+
+class HttpBench:
+    """The full /detect_birds_optimized path through FastAPI's test client"""
+
+    def __init__(self, model_path):
+        # Measure real work: no result cache, no cascade, short warm-up
+        os.environ['MODEL_PATH'] = model_path
+        os.environ['DETECTION_CACHE_ENABLED'] = 'false'
+        os.environ['CASCADE_ENABLED'] = 'false'
+        os.environ.setdefault('WARMUP_ITERATIONS', '1')
+
+        from fastapi.testclient import TestClient
+        import app
+
+        self.client = TestClient(app.app)
+        self.client.__enter__()
+        deadline = time.time() + 120
+        while self.client.get('/ready').status_code != 200:
+            if time.time() > deadline:
+                raise RuntimeError("cv-service did not become ready")
+            time.sleep(0.1)
+
+    def run(self, frames, repeat, warmup):
+        payloads = [cv2.imencode('.jpg', frame)[1].tobytes() for frame in frames]
+
+        def post(payload):
+            response = self.client.post('/detect_birds_optimized',
+                                        files={'file': ('frame.jpg', payload, 'image/jpeg')})
+            response.raise_for_status()
+
+        return measure(post, payloads, repeat, warmup)
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+
+def run_benchmarks(args):
+    model_path = args.model
+    if not model_path:
+        model_path = build_tiny_model(os.path.join(tempfile.mkdtemp(), 'tiny_yolov8.onnx'))
+
+    detector = YOLOv8(model_path, conf_thres=args.confidence, iou_thres=args.iou)
+    http = None if args.skip_http else HttpBench(model_path)
+
+    corpora = ["synthetic"] + (["recorded"] if args.recorded else [])
+    results = []
+    try:
+        for corpus in corpora:
+            for width, height in args.resolutions:
+                if corpus == "synthetic":
+                    frames = synthetic_frames(width, height, args.frames, seed=args.seed)
+                else:
+                    frames = recorded_frames(args.recorded, width, height, args.frames)
+                if not frames:
+                    continue
+
+                stage_results = bench_stages(detector, frames, args.batch_sizes, args.repeat, args.warmup)
+                if http is not None:
+                    stage_results["http"] = http.run(frames, args.repeat, args.warmup)
+
+                for key, samples in stage_results.items():
+                    name, batch_size = key if isinstance(key, tuple) else (key, 1)
+                    results.append({
+                        "benchmark": name,
+                        "corpus": corpus,
+                        "resolution": f"{width}x{height}",
+                        "batch_size": batch_size,
+                        **summarize(samples)
+                    })
+                print(f"  {corpus} {width}x{height}: done", file=sys.stderr)
+    finally:
+        if http is not None:
+            http.close()
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "model": os.path.basename(model_path) if args.model else "tiny (generated)",
+            "input_shape": [str(d) for d in detector.input_shape],
+            "providers": detector.session.get_providers(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "onnxruntime": onnxruntime.__version__,
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "frames": args.frames,
+            "repeat": args.repeat
+        },
+        "results": results
+    }
+
+
+def result_key(result):
+    return (result["benchmark"], result["corpus"], result["resolution"], result["batch_size"])
+
+
+def compare(report, baseline, tolerance):
+    """Return results whose median got slower than the baseline by more than tolerance"""
+    previous = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result_key(result))
+        if old is None or old["p50_ms"] <= 0:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1
+        if change > tolerance:
+            regressions.append({**dict(zip(("benchmark", "corpus", "resolution", "batch_size"), result_key(result))),
+                                "baseline_p50_ms": old["p50_ms"], "p50_ms": result["p50_ms"],
+                                "change": round(change, 3)})
+    return regressions
+
+
+def print_table(report):
+    print(f"{'benchmark':16} {'corpus':10} {'resolution':>10} {'batch':>5} {'p50':>10} {'p95':>10}")
+    for r in report["results"]:
+        print(f"{r['benchmark']:16} {r['corpus']:10} {r['resolution']:>10} {r['batch_size']:>5} "
+              f"{r['p50_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cv-service detection path")
+    parser.add_argument('--model', help="ONNX model (default: generated tiny model)")
+    parser.add_argument('--recorded', help="Directory with recorded camera frames")
+    parser.add_argument('--resolutions', type=parse_resolutions, default=parse_resolutions('640x360,1280x720,2560x1440'))
+    parser.add_argument('--batch-sizes', type=lambda v: [int(b) for b in v.split(',')], default=[1, 4])
+    parser.add_argument('--frames', type=int, default=8, help="Frames per corpus and resolution")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--confidence', type=float, default=0.25)
+    parser.add_argument('--iou', type=float, default=0.45)
+    parser.add_argument('--skip-http', action='store_true', help="Skip the HTTP path benchmark")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against an earlier JSON result")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p50 slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    print_table(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['benchmark']} {r['corpus']} {r['resolution']} batch {r['batch_size']}: "
+                  f"{r['baseline_p50_ms']:.2f}ms -> {r['p50_ms']:.2f}ms (+{r['change']:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Tiny YOLOv8-shaped ONNX model so the benchmarks run without real weights.
+
+The graph takes the usual (batch, 3, H, W) input and returns the YOLOv8
+output layout (batch, 84, anchors): box center/size in the first four
+channels, 80 class scores after that. Boxes sit on a 32px anchor grid and
+the scores are derived from the image - flat gray areas score low,
+saturated colored objects high - so postprocessing and NMS have
+realistic amounts of work to do.
+"""
+
+import numpy as np
+
+NUM_CLASSES = 80
+STRIDE = 32
+
+
+def build_tiny_model(path, input_size=640, dynamic_batch=True, seed=0):
+    """Write the tiny model to path and return the path"""
+    try:
+        import onnx
+        from onnx import helper, numpy_helper, TensorProto
+    except ImportError as e:
+        raise RuntimeError("Generating the tiny model needs the 'onnx' package "
+                           "(pip install -r benchmarks/requirements.txt)") from e
+
+    grid = input_size // STRIDE
+    anchors = grid * grid
+    rng = np.random.default_rng(seed)
+
+    # 1x1 conv over the pooled, zero-centered image: small box jitter, class logits from the colors
+    weights = np.zeros((4 + NUM_CLASSES, 3, 1, 1), dtype=np.float32)
+    weights[:4] = rng.normal(0, 4.0, (4, 3, 1, 1))
+    weights[4:] = rng.normal(0, 8.0, (NUM_CLASSES, 3, 1, 1))
+    bias = np.zeros(4 + NUM_CLASSES, dtype=np.float32)
+    bias[4:] = -3.0
+
+    # Anchor grid: centers in channels 0/1, a fixed box size in channels 2/3
+    centers = (np.arange(grid, dtype=np.float32) + 0.5) * STRIDE
+    cy, cx = np.meshgrid(centers, centers, indexing='ij')
+    offsets = np.zeros((1, 4 + NUM_CLASSES, anchors), dtype=np.float32)
+    offsets[0, 0] = cx.flatten()
+    offsets[0, 1] = cy.flatten()
+    offsets[0, 2:4] = STRIDE * 2
+
+    # Only the class channels go through the sigmoid
+    score_mask = np.zeros((1, 4 + NUM_CLASSES, 1), dtype=np.float32)
+    score_mask[0, 4:] = 1.0
+
+    batch = 'batch' if dynamic_batch else 1
+    nodes = [
+        helper.make_node('AveragePool', ['images'], ['pooled'], kernel_shape=[STRIDE, STRIDE], strides=[STRIDE, STRIDE]),
+        helper.make_node('Sub', ['pooled', 'center'], ['centered']),
+        helper.make_node('Conv', ['centered', 'W', 'B'], ['features']),
+        helper.make_node('Shape', ['images'], ['input_shape']),
+        helper.make_node('Slice', ['input_shape', 'start', 'end'], ['batch_dim']),
+        helper.make_node('Concat', ['batch_dim', 'tail_shape'], ['out_shape'], axis=0),
+        helper.make_node('Reshape', ['features', 'out_shape'], ['flat']),
+        helper.make_node('Sigmoid', ['flat'], ['sigmoid']),
+        # out = flat + mask * (sigmoid - flat) + offsets
+        helper.make_node('Sub', ['sigmoid', 'flat'], ['delta']),
+        helper.make_node('Mul', ['delta', 'mask'], ['masked']),
+        helper.make_node('Add', ['flat', 'masked'], ['mixed']),
+        helper.make_node('Add', ['mixed', 'offsets'], ['output0']),
+    ]
+    initializers = [
+        numpy_helper.from_array(weights, 'W'),
+        numpy_helper.from_array(bias, 'B'),
+        numpy_helper.from_array(np.array(0.5, dtype=np.float32), 'center'),
+        numpy_helper.from_array(np.array([0], dtype=np.int64), 'start'),
+        numpy_helper.from_array(np.array([1], dtype=np.int64), 'end'),
+        numpy_helper.from_array(np.array([4 + NUM_CLASSES, -1], dtype=np.int64), 'tail_shape'),
+        numpy_helper.from_array(score_mask, 'mask'),
+        numpy_helper.from_array(offsets, 'offsets'),
+    ]
+    graph = helper.make_graph(
+        nodes, 'tiny_yolov8',
+        [helper.make_tensor_value_info('images', TensorProto.FLOAT, [batch, 3, input_size, input_size])],
+        [helper.make_tensor_value_info('output0', TensorProto.FLOAT, [batch, 4 + NUM_CLASSES, anchors])],
+        initializers
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 13)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
@@ -0,0 +1,126 @@
+"""
+Two-stage cascade detection for the CV service.
+
+A small screening model looks at the whole frame with a low confidence
+threshold. Only if it finds bird candidates does the heavy confirmation
+model run - either on the full frame or only on padded regions around
+the candidates.
+"""
+
+import time
+import numpy as np
+
+from yolov8.utils import nms
+
+CASCADE_MODES = ("frame", "roi")
+
+
+class CascadeDetector:
+
+    def __init__(self, screen_detector, confirm_detector, candidate_class_ids,
+                 mode="roi", roi_padding=1.0, max_rois=4):
+        if mode not in CASCADE_MODES:
+            raise ValueError(f"Unknown cascade mode: {mode} (expected one of {CASCADE_MODES})")
+
+        self.screen_detector = screen_detector
+        self.confirm_detector = confirm_detector
+        self.candidate_class_ids = set(int(c) for c in candidate_class_ids)
+        self.mode = mode
+        self.roi_padding = roi_padding
+        self.max_rois = max_rois
+
+        # Details of the last call, reported alongside the detections
+        self.last_info = {}
+
+    def __call__(self, image):
+        return self.detect_objects(image)
+
+    def detect_objects(self, image):
+        start = time.perf_counter()
+        boxes, scores, class_ids = self.screen_detector(image)
+        screen_time = time.perf_counter() - start
+
+        candidates = [box for box, class_id in zip(boxes, class_ids)
+                      if int(class_id) in self.candidate_class_ids]
+
+        self.last_info = {
+            "mode": self.mode,
+            "screen_candidates": len(candidates),
+            "screen_time": screen_time,
+            "confirm_time": 0.0,
+            "rois": 0
+        }
+
+        # Nothing bird-like in the frame - the screening stage decides
+        if not candidates:
+            self.last_info["decided_by"] = "screen"
+            return [], [], []
+
+        start = time.perf_counter()
+        rois = self.candidate_rois(candidates, image.shape[1], image.shape[0])
+        if self.mode == "frame" or rois is None:
+            result = self.confirm_detector(image)
+        else:
+            self.last_info["rois"] = len(rois)
+            result = self.confirm_rois(image, rois)
+        self.last_info["confirm_time"] = time.perf_counter() - start
+        self.last_info["decided_by"] = "confirm"
+
+        return result
+
+    def candidate_rois(self, candidates, img_width, img_height):
+        """Build padded, model-sized crop regions around the candidates.
+
+        Returns None when the crops would not save work compared to running
+        the confirmation model on the whole frame.
+        """
+        if len(candidates) > self.max_rois:
+            return None
+
+        min_width = min(self.confirm_detector.input_width, img_width)
+        min_height = min(self.confirm_detector.input_height, img_height)
+
+        rois = []
+        for x1, y1, x2, y2 in candidates:
+            pad_x = (x2 - x1) * self.roi_padding
+            pad_y = (y2 - y1) * self.roi_padding
+            width = max(x2 - x1 + 2 * pad_x, min_width)
+            height = max(y2 - y1 + 2 * pad_y, min_height)
+            center_x = (x1 + x2) / 2
+            center_y = (y1 + y2) / 2
+
+            # Keep the crop inside the image, shifting instead of shrinking it
+            left = int(np.clip(center_x - width / 2, 0, max(img_width - width, 0)))
+            top = int(np.clip(center_y - height / 2, 0, max(img_height - height, 0)))
+            right = int(min(left + width, img_width))
+            bottom = int(min(top + height, img_height))
+            rois.append((left, top, right, bottom))
+
+        # Crops covering most of the frame are not cheaper than the frame itself
+        roi_area = sum((r - l) * (b - t) for l, t, r, b in rois)
+        if roi_area >= img_width * img_height:
+            return None
+
+        return rois
+
+    def confirm_rois(self, image, rois):
+        all_boxes, all_scores, all_class_ids = [], [], []
+        for left, top, right, bottom in rois:
+            boxes, scores, class_ids = self.confirm_detector(image[top:bottom, left:right])
+            if len(scores) == 0:
+                continue
+            # Map crop coordinates back to the original frame
+            all_boxes.append(boxes + np.array([left, top, left, top], dtype=np.float32))
+            all_scores.append(scores)
+            all_class_ids.append(class_ids)
+
+        if not all_scores:
+            return [], [], []
+
+        boxes = np.concatenate(all_boxes)
+        scores = np.concatenate(all_scores)
+        class_ids = np.concatenate(all_class_ids)
+
+        # Overlapping crops can report the same bird twice
+        indices = nms(boxes, scores, self.confirm_detector.iou_threshold)
+        return boxes[indices], scores[indices], class_ids[indices]
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Recall/latency report: cascade detection vs. single heavy model.
+
+Runs every frame of a corpus directory through the heavy model alone and
+through the cascade, treats the heavy model's birds as reference and
+reports how many of them the cascade keeps and what it costs.
+
+Usage:
+    python cascade_report.py --corpus ../frames --model ../models/yolov8l.onnx \
+        --screen-model ../models/yolov8n.onnx [--mode roi] [--output report.json]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from yolov8 import YOLOv8, utils
+from yolov8.utils import compute_iou
+from cascade import CascadeDetector, CASCADE_MODES
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def load_corpus(corpus_dir):
+    paths = sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir)
+                   if name.lower().endswith(IMAGE_EXTENSIONS))
+    for path in paths:
+        image = cv2.imread(path)
+        if image is not None:
+            yield path, image
+
+
+def bird_boxes(boxes, class_ids, bird_class_ids):
+    return [box for box, class_id in zip(boxes, class_ids) if int(class_id) in bird_class_ids]
+
+
+def count_matches(reference, candidates, iou_threshold):
+    """Count reference boxes matched by a candidate box (greedy, one-to-one)"""
+    if not reference or not candidates:
+        return 0
+    remaining = np.array(candidates, dtype=np.float32)
+    matched = 0
+    for box in reference:
+        if len(remaining) == 0:
+            break
+        ious = compute_iou(np.asarray(box, dtype=np.float32), remaining)
+        best = int(np.argmax(ious))
+        if ious[best] >= iou_threshold:
+            matched += 1
+            remaining = np.delete(remaining, best, axis=0)
+    return matched
+
+
+def latency_stats(samples):
+    if not samples:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+    values = np.array(samples) * 1000
+    return {
+        "mean_ms": round(float(values.mean()), 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "max_ms": round(float(values.max()), 2)
+    }
+
+
+def build_report(frames, single_detector, cascade_detector, bird_class_ids, iou_threshold=0.5):
+    single_times, cascade_times = [], []
+    reference_birds = matched_birds = extra_birds = 0
+    reference_frames = matched_frames = screened_out = 0
+    frame_count = 0
+
+    for _, image in frames:
+        frame_count += 1
+
+        start = time.perf_counter()
+        boxes, _, class_ids = single_detector(image)
+        single_times.append(time.perf_counter() - start)
+        reference = bird_boxes(boxes, class_ids, bird_class_ids)
+
+        start = time.perf_counter()
+        boxes, _, class_ids = cascade_detector(image)
+        cascade_times.append(time.perf_counter() - start)
+        candidates = bird_boxes(boxes, class_ids, bird_class_ids)
+
+        if cascade_detector.last_info.get("decided_by") == "screen":
+            screened_out += 1
+
+        matches = count_matches(reference, candidates, iou_threshold)
+        reference_birds += len(reference)
+        matched_birds += matches
+        extra_birds += len(candidates) - matches
+        if reference:
+            reference_frames += 1
+            if candidates:
+                matched_frames += 1
+
+    single_total = sum(single_times)
+    cascade_total = sum(cascade_times)
+
+    return {
+        "frames": frame_count,
+        "mode": cascade_detector.mode,
+        "iou_match_threshold": iou_threshold,
+        "recall": {
+            "bird_recall": round(matched_birds / reference_birds, 4) if reference_birds else 1.0,
+            "frame_recall": round(matched_frames / reference_frames, 4) if reference_frames else 1.0,
+            "reference_birds": reference_birds,
+            "matched_birds": matched_birds,
+            "extra_birds": extra_birds
+        },
+        "screened_out_frames": screened_out,
+        "latency": {
+            "single": latency_stats(single_times),
+            "cascade": latency_stats(cascade_times),
+            "speedup": round(single_total / cascade_total, 2) if cascade_total else 0.0
+        }
+    }
+
+
+def print_report(report):
+    recall = report["recall"]
+    latency = report["latency"]
+    print(f"Frames: {report['frames']} (cascade mode: {report['mode']})")
+    print(f"Screened out by small model: {report['screened_out_frames']}")
+    print(f"Bird recall:  {recall['bird_recall']:.2%} ({recall['matched_birds']}/{recall['reference_birds']})")
+    print(f"Frame recall: {recall['frame_recall']:.2%}")
+    print(f"Extra birds (not in single-model result): {recall['extra_birds']}")
+    print(f"{'':10} {'mean':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    for name in ("single", "cascade"):
+        stats = latency[name]
+        print(f"{name:10} {stats['mean_ms']:>8.1f}ms {stats['p50_ms']:>8.1f}ms "
+              f"{stats['p95_ms']:>8.1f}ms {stats['max_ms']:>8.1f}ms")
+    print(f"Speedup: {latency['speedup']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cascade detection against the single heavy model")
+    parser.add_argument('--corpus', required=True, help="Directory with frames (jpg/png)")
+    parser.add_argument('--model', default='../models/yolov8l.onnx', help="Heavy confirmation model")
+    parser.add_argument('--screen-model', default='../models/yolov8n.onnx', help="Small screening model")
+    parser.add_argument('--confidence', type=float, default=0.25, help="Heavy model confidence threshold")
+    parser.add_argument('--screen-confidence', type=float, default=0.1, help="Screening confidence threshold")
+    parser.add_argument('--iou', type=float, default=0.45, help="NMS IoU threshold")
+    parser.add_argument('--mode', choices=CASCADE_MODES, default='roi')
+    parser.add_argument('--roi-padding', type=float, default=1.0)
+    parser.add_argument('--match-iou', type=float, default=0.5, help="IoU needed to count a bird as recalled")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    bird_class_ids = {i for i, name in enumerate(utils.class_names) if name == 'bird'}
+
+    single_detector = YOLOv8(args.model, conf_thres=args.confidence, iou_thres=args.iou)
+    screen_detector = YOLOv8(args.screen_model, conf_thres=args.screen_confidence, iou_thres=args.iou)
+    cascade_detector = CascadeDetector(screen_detector, single_detector, bird_class_ids,
+                                       mode=args.mode, roi_padding=args.roi_padding)
+
+    report = build_report(load_corpus(args.corpus), single_detector, cascade_detector,
+                          bird_class_ids, args.match_iou)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Content-addressed cache for detection results.
+
+Local-image devices and stalled cameras send the same frame over and
+over. Results are keyed on a hash of the decoded pixels plus everything
+that influences the result (model, thresholds, class filter), kept in an
+LRU with a size bound and a TTL. With perceptual hashing enabled, frames
+whose dHash differs by only a few bits count as hits as well.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import cv2
+import numpy as np
+
+
+def content_hash(image):
+    """Hash of the decoded pixels and the image shape"""
+    digest = hashlib.sha1(np.ascontiguousarray(image).data)
+    digest.update(str(image.shape).encode())
+    return digest.hexdigest()
+
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash) - robust against noise and re-encoding"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class DetectionCache:
+
+    def __init__(self, max_entries=256, ttl=60.0, phash_enabled=False, phash_max_distance=4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.phash_enabled = phash_enabled
+        self.phash_max_distance = phash_max_distance
+
+        # (params, content hash) -> entry dict, oldest first
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, image, params):
+        return (params, content_hash(image))
+
+    def get(self, image, params):
+        """Return the cached value for this image and parameters, or None"""
+        key = self.make_key(image, params)
+        now = time.time()
+        phash = perceptual_hash(image) if self.phash_enabled else None
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.is_expired(entry, now):
+                self.remove(key)
+                entry = None
+
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"]
+
+            if phash is not None:
+                near_key = self.find_near_duplicate(params, image.shape, phash, now)
+                if near_key is not None:
+                    self.entries.move_to_end(near_key)
+                    self.phash_hits += 1
+                    return self.entries[near_key]["value"]
+
+            self.misses += 1
+            return None
+
+    def put(self, image, params, value):
+        key = self.make_key(image, params)
+        entry = {
+            "value": value,
+            "created": time.time(),
+            "shape": image.shape,
+            "phash": perceptual_hash(image) if self.phash_enabled else None
+        }
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def find_near_duplicate(self, params, shape, phash, now):
+        # Newest entries first - a frozen stream keeps matching its latest frame
+        for key in reversed(self.entries):
+            entry = self.entries[key]
+            if key[0] != params or entry["shape"] != shape or entry["phash"] is None:
+                continue
+            if self.is_expired(entry, now):
+                continue
+            if hamming_distance(entry["phash"], phash) <= self.phash_max_distance:
+                return key
+        return None
+
+    def is_expired(self, entry, now):
+        return self.ttl > 0 and now - entry["created"] > self.ttl
+
+    def remove(self, key):
+        del self.entries[key]
+        self.expirations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total_hits = self.hits + self.phash_hits
+            lookups = total_hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "phash_enabled": self.phash_enabled,
+                "phash_max_distance": self.phash_max_distance,
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0
+            }
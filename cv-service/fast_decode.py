@@ -0,0 +1,124 @@
+"""
+Reduced-scale JPEG decoding.
+
+Every frame is resized to the model input (640x640) before inference, so
+decoding a 2560x1440 camera JPEG at full resolution is mostly wasted
+work. libjpeg can scale by 1/2, 1/4 or 1/8 in the DCT domain while
+decoding (cv2.IMREAD_REDUCED_COLOR_*), which is several times faster and
+needs a fraction of the memory.
+
+The JPEG header is parsed first to get the full size; the largest factor
+that keeps the decoded image at least min_width x min_height is used.
+OpenCV applies the EXIF orientation on both paths, so for orientations
+5-8 (rotated by 90 degrees, as phones store portrait photos) the header
+size is swapped to match the decoded image.
+Boxes found on the reduced image are scaled back with the returned
+(scale_x, scale_y) - the reduced size is rounded up, so the factors are
+computed from the actual sizes rather than assumed to be exact.
+"""
+
+import struct
+
+import cv2
+import numpy as np
+
+REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Start-of-frame markers carrying the image size (not DHT/JPG/DAC)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+APP1 = 0xE1
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that rotate the image by 90 degrees (width and height swap)
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def exif_orientation(segment):
+    """Orientation tag (1-8) from an APP1 segment payload, 1 if it carries none"""
+    if segment[:6] != b'Exif\x00\x00':
+        return 1
+    tiff = segment[6:]
+    endian = {b'II': '<', b'MM': '>'}.get(bytes(tiff[:2]))
+    if endian is None:
+        return 1
+    try:
+        (offset,) = struct.unpack(endian + 'I', tiff[4:8])
+        (count,) = struct.unpack(endian + 'H', tiff[offset:offset + 2])
+        for entry in range(offset + 2, offset + 2 + count * 12, 12):
+            (tag,) = struct.unpack(endian + 'H', tiff[entry:entry + 2])
+            if tag == ORIENTATION_TAG:
+                (value,) = struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])
+                return value
+    except struct.error:
+        pass
+    return 1
+
+
+def jpeg_size(data):
+    """(width, height) of the decoded image from the JPEG header, or None if data is not a JPEG
+
+    Swapped when the EXIF orientation rotates the image by 90 degrees.
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+    position = 2
+    length = len(data)
+    orientation = 1
+    while position + 4 <= length:
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # fill byte
+            position += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # no payload
+            position += 2
+            continue
+        (segment_length,) = struct.unpack('>H', data[position + 2:position + 4])
+        if marker == APP1 and orientation == 1:
+            orientation = exif_orientation(data[position + 4:position + 2 + segment_length])
+        if marker in SOF_MARKERS:
+            if position + 9 > length:
+                return None
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return (height, width) if orientation in TRANSPOSED_ORIENTATIONS else (width, height)
+        position += 2 + segment_length
+    return None
+
+
+def reduction_factor(width, height, min_width, min_height):
+    """Largest libjpeg scale-down factor keeping at least min_width x min_height"""
+    for factor in (8, 4, 2):
+        if width // factor >= min_width and height // factor >= min_height:
+            return factor
+    return 1
+
+
+def decode_image(data, min_size=None):
+    """Decode image bytes, reduced in the DCT domain where possible
+
+    min_size: (width, height) the decoded image must at least have; None
+    decodes at full resolution.
+    Returns (image, (scale_x, scale_y), (width, height) of the full image).
+    """
+    buffer = np.frombuffer(data, np.uint8)
+    size = jpeg_size(data) if min_size else None
+    factor = reduction_factor(size[0], size[1], *min_size) if size else 1
+
+    image = cv2.imdecode(buffer, REDUCED_FLAGS[factor] if factor > 1 else cv2.IMREAD_COLOR)
+    if image is None:
+        return None, (1.0, 1.0), None
+    if factor == 1:
+        return image, (1.0, 1.0), (image.shape[1], image.shape[0])
+    return image, (size[0] / image.shape[1], size[1] / image.shape[0]), size
+
+
+def scale_boxes(boxes, scale):
+    """Map xyxy boxes from the reduced image back to full-image coordinates"""
+    if scale == (1.0, 1.0) or len(boxes) == 0:
+        return boxes
+    scale_x, scale_y = scale
+    return np.asarray(boxes, dtype=np.float32) * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
@@ -0,0 +1,355 @@
+"""
+Multi-process inference for the CV service.
+
+The service process runs the HTTP front: it accepts uploads, decodes them
+(cv2 releases the GIL, so decoding runs on executor threads) and checks
+the detection cache. Inference runs in INFERENCE_WORKERS separate worker
+processes, each pinned to its own set of cores and holding its own ONNX
+session with as many intra-op threads as it has cores. Preprocessing and
+NMS run in the workers too, so no Python-level work of the detector
+competes with the front for the GIL.
+
+Frames are not pickled: the pool owns a fixed number of shared memory
+slots. The front copies the decoded frame into a free slot and sends only
+(slot, shape, kind) over the worker's task queue; the worker reads the
+frame in place and writes the detections back into the end of the same
+slot as float32 rows (x1, y1, x2, y2, score, class_id). The front reads
+them from there, so the only data crossing the process boundary besides
+the frame are a few small tuples.
+
+A slot is busy until its result has been read, so the number of slots
+bounds the requests in flight in the workers. Frames larger than a slot
+are detected in the front process. A worker that dies is restarted and
+its in-flight requests fail; one that keeps dying while it loads its
+models is given up after MAX_START_ATTEMPTS and reported as failed.
+"""
+
+import asyncio
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+MAX_DETECTIONS = 300
+RESULT_BYTES = 8 + MAX_DETECTIONS * 6 * 4  # row count + rows of float32 (x1, y1, x2, y2, score, class_id)
+# Spawns of a worker that dies before reporting ready (e.g. killed for memory while loading the model)
+MAX_START_ATTEMPTS = 3
+# Seconds between checks for dead workers
+CHECK_INTERVAL = 1.0
+
+
+def parse_cpu_sets(value, workers):
+    """CPU sets per worker from '0-3;4-7' (';' between workers, ',' and ranges within)
+
+    Without a value, the cores available to this process are split evenly.
+    """
+    if value.strip():
+        cpu_sets = []
+        for item in value.split(';'):
+            cpus = set()
+            for part in item.split(','):
+                part = part.strip()
+                if not part:
+                    continue
+                first, _, last = part.partition('-')
+                cpus.update(range(int(first), int(last or first) + 1))
+            cpu_sets.append(sorted(cpus))
+        if len(cpu_sets) != workers:
+            raise ValueError(f"INFERENCE_CPU_SETS lists {len(cpu_sets)} sets for {workers} workers")
+        return cpu_sets
+
+    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    if workers >= len(available):
+        # More workers than cores - one core each, shared round-robin
+        return [[available[i % len(available)]] for i in range(workers)]
+    size = len(available) // workers
+    return [available[i * size:(i + 1) * size] for i in range(workers)]
+
+
+def build_detectors(config, threads, timings):
+    """Detectors of one worker: 'single' and, if configured, 'cascade'"""
+    from yolov8 import YOLOv8
+    from cascade import CascadeDetector
+
+    def callback(model):
+        return lambda stage, seconds: timings.append((stage, seconds, model))
+
+    main = YOLOv8(config['model_path'], conf_thres=config['conf_threshold'], iou_thres=config['iou_threshold'],
+                  stage_callback=callback(config['model_label']), intra_op_threads=threads)
+    detectors = {'single': main}
+    cascade = config.get('cascade')
+    if cascade:
+        screen = YOLOv8(cascade['screen_model_path'], conf_thres=cascade['screen_confidence'],
+                        iou_thres=config['iou_threshold'], stage_callback=callback(cascade['screen_model_label']),
+                        intra_op_threads=threads)
+        detectors['cascade'] = CascadeDetector(screen, main, cascade['bird_class_ids'],
+                                               mode=cascade['mode'], roi_padding=cascade['roi_padding'])
+    return detectors
+
+
+def write_result(buffer, boxes, scores, class_ids):
+    """Detections into the result region at the end of a slot; returns the row count"""
+    count = min(len(scores), MAX_DETECTIONS)
+    header = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=len(buffer) - RESULT_BYTES)
+    header[0] = count
+    if count:
+        rows = np.ndarray((count, 6), dtype=np.float32, buffer=buffer, offset=len(buffer) - RESULT_BYTES + 8)
+        rows[:, :4] = np.asarray(boxes, dtype=np.float32)[:count]
+        rows[:, 4] = np.asarray(scores, dtype=np.float32)[:count]
+        rows[:, 5] = np.asarray(class_ids, dtype=np.float32)[:count]
+    return count
+
+
+def read_result(buffer):
+    """boxes, scores, class_ids read back from a slot's result region"""
+    count = int(np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=len(buffer) - RESULT_BYTES)[0])
+    rows = np.ndarray((count, 6), dtype=np.float32, buffer=buffer, offset=len(buffer) - RESULT_BYTES + 8)
+    # The slot is reused once this returns - copy the (few hundred bytes of) rows out
+    return rows[:, :4].copy(), rows[:, 4].copy(), rows[:, 5].astype(np.int64)
+
+
+def worker_main(index, cpus, config, slot_names, tasks, results):
+    """Worker process: pinned to cpus, runs detections on frames in the shared slots"""
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    timings = []
+    try:
+        detectors = build_detectors(config, len(cpus) or None, timings)
+        warmup = {}
+        if config.get('warmup'):
+            from warmup import warm_up_detector
+            shapes, iterations, batch_sizes = config['warmup']
+            warmup['main'] = warm_up_detector(detectors['single'], shapes, iterations, batch_sizes)
+            if 'cascade' in detectors:
+                warmup['screen'] = warm_up_detector(detectors['cascade'].screen_detector, shapes, iterations,
+                                                    batch_sizes)
+        timings.clear()
+        results.put(('ready', index, warmup))
+    except Exception as e:
+        results.put(('failed', index, str(e)))
+        return
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        results.put(run_task(task, slots, detectors, timings))
+
+
+def run_task(task, slots, detectors, timings):
+    request_id, slot, shape, kind = task
+    started = time.perf_counter()
+    timings.clear()
+    try:
+        buffer = slots[slot].buf
+        image = np.ndarray(shape, dtype=np.uint8, buffer=buffer)
+        detector = detectors[kind]
+        boxes, scores, class_ids = detector(image)
+        info = dict(detector.last_info) if kind == 'cascade' else None
+        write_result(buffer, boxes, scores, class_ids)
+        return 'result', request_id, info, list(timings), time.perf_counter() - started, None
+    except Exception as e:
+        return 'result', request_id, None, list(timings), time.perf_counter() - started, str(e)
+
+
+def reap(processes, timeout=5.0):
+    """Wait for stopped workers to exit, terminating those that don't"""
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout)
+
+
+class Worker:
+
+    def __init__(self, index, cpus):
+        self.index = index
+        self.cpus = cpus
+        self.process = None
+        self.tasks = None
+        self.in_flight = set()  # request IDs sent to this worker
+        self.ready = False
+        self.start_attempts = 0  # spawns since the worker was last ready
+
+
+class InferencePool:
+
+    def __init__(self, workers, config, slot_bytes, cpu_sets, slots=None, timeout=30.0):
+        """config: model paths, thresholds, cascade settings and warm-up for the workers (see build_detectors)"""
+        self.config = config
+        self.frame_bytes = int(slot_bytes)
+        self.timeout = timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.workers = [Worker(i, cpus) for i, cpus in enumerate(cpu_sets[:workers])]
+        self.slot_count = slots or 2 * workers
+        self.slots = []
+        self.free_slots = None
+        self.requests = {}  # request_id -> (worker, slot, future)
+        self.request_ids = itertools.count()
+        self.results = None
+        self.loop = None
+        self.reader = None
+        self.closed = False
+        self.ready_lock = threading.Condition()
+        self.startup = {}  # worker index -> warm-up timings, or the error it failed with
+
+    def start(self, loop):
+        """Create the slots and start the workers (returns at once - see wait_ready)"""
+        self.loop = loop
+        self.slots = [shared_memory.SharedMemory(create=True, size=self.frame_bytes + RESULT_BYTES)
+                      for _ in range(self.slot_count)]
+        self.free_slots = asyncio.Queue()
+        for slot in range(self.slot_count):
+            self.free_slots.put_nowait(slot)
+        self.results = self.context.Queue()
+        for worker in self.workers:
+            self.spawn(worker)
+        self.reader = threading.Thread(target=self.read_results, name='inference-results', daemon=True)
+        self.reader.start()
+        print(f"Inference pool: {len(self.workers)} workers on cores "
+              f"{[worker.cpus for worker in self.workers]}, {self.slot_count} slots of "
+              f"{self.frame_bytes / 1e6:.1f} MB")
+
+    def spawn(self, worker):
+        worker.ready = False
+        worker.start_attempts += 1
+        worker.tasks = self.context.Queue()
+        worker.process = self.context.Process(
+            target=worker_main, name=f"inference-{worker.index}", daemon=True,
+            args=(worker.index, worker.cpus, self.config, [slot.name for slot in self.slots],
+                  worker.tasks, self.results)
+        )
+        worker.process.start()
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded and warmed up its models; returns their warm-up timings"""
+        with self.ready_lock:
+            if not self.ready_lock.wait_for(lambda: len(self.startup) == len(self.workers), timeout):
+                pending = [worker.index for worker in self.workers if worker.index not in self.startup]
+                raise TimeoutError(f"Inference workers {pending} did not start within {timeout:g}s")
+        errors = {index: result for index, result in self.startup.items() if isinstance(result, str)}
+        if errors:
+            raise RuntimeError(f"Inference workers failed to start: {errors}")
+        return dict(self.startup)
+
+    def fits(self, image):
+        return image.dtype == np.uint8 and image.nbytes <= self.frame_bytes
+
+    async def detect(self, kind, image):
+        """boxes, scores, class_ids, info of a frame detected in a worker ('single' or 'cascade')"""
+        slot = await self.free_slots.get()
+        try:
+            worker = min((w for w in self.workers if w.ready and w.process.is_alive()), key=lambda w: len(w.in_flight), default=None)
+            if worker is None:
+                raise RuntimeError("No inference worker available")
+            frame = np.ndarray(image.shape, dtype=np.uint8, buffer=self.slots[slot].buf)
+            frame[...] = image
+            request_id = next(self.request_ids)
+            future = self.loop.create_future()
+            self.requests[request_id] = (worker, slot, future)
+            worker.in_flight.add(request_id)
+            worker.tasks.put((request_id, slot, image.shape, kind))
+        except BaseException:
+            self.free_slots.put_nowait(slot)
+            raise
+        # On timeout the slot stays busy until the worker answers (or is found dead)
+        return await asyncio.wait_for(future, self.timeout)
+
+    def read_results(self):
+        """Result reader thread: hands results to the event loop and watches the workers"""
+        next_check = time.monotonic() + CHECK_INTERVAL
+        while not self.closed:
+            # On a fixed schedule - busy workers must not keep a dead one from being noticed
+            now = time.monotonic()
+            if now >= next_check:
+                self.loop.call_soon_threadsafe(self.check_workers)
+                next_check = now + CHECK_INTERVAL
+            try:
+                message = self.results.get(timeout=max(next_check - now, 0.0))
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if message[0] == 'result':
+                self.loop.call_soon_threadsafe(self.on_result, *message[1:])
+            else:
+                kind, index, detail = message
+                with self.ready_lock:
+                    self.startup[index] = detail
+                    self.ready_lock.notify_all()
+                if kind == 'ready':
+                    self.loop.call_soon_threadsafe(self.on_ready, index)
+                else:
+                    print(f"Inference worker {index} failed to start: {detail}")
+
+    def on_ready(self, index):
+        self.workers[index].ready = True
+        self.workers[index].start_attempts = 0
+
+    def on_result(self, request_id, info, timings, seconds, error):
+        entry = self.requests.pop(request_id, None)
+        if entry is None:
+            return
+        worker, slot, future = entry
+        worker.in_flight.discard(request_id)
+        try:
+            if future.done():
+                # Timed out or cancelled - nobody reads the result
+                pass
+            elif error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                boxes, scores, class_ids = read_result(self.slots[slot].buf)
+                future.set_result((boxes, scores, class_ids, info, timings, seconds))
+        finally:
+            self.free_slots.put_nowait(slot)
+
+    def check_workers(self):
+        """Restart dead workers and fail the requests they had"""
+        if self.closed:
+            return
+        for worker in self.workers:
+            if worker.process.is_alive():
+                continue
+            exitcode = worker.process.exitcode
+            if worker.ready:
+                print(f"Inference worker {worker.index} died (exit code {exitcode}), restarting")
+                for request_id in list(worker.in_flight):
+                    self.on_result(request_id, None, [], 0.0, "Inference worker died")
+                with self.ready_lock:
+                    self.startup.pop(worker.index, None)
+                self.spawn(worker)
+            elif worker.index not in self.startup and exitcode != 0:
+                # Died while loading - it never reports (a worker that reported 'failed' exits with 0)
+                if worker.start_attempts < MAX_START_ATTEMPTS:
+                    print(f"Inference worker {worker.index} died during startup (exit code {exitcode}), restarting")
+                    self.spawn(worker)
+                    continue
+                print(f"Inference worker {worker.index} died during startup {worker.start_attempts} times, giving up")
+                with self.ready_lock:
+                    self.startup[worker.index] = f"exited with code {exitcode} during startup"
+                    self.ready_lock.notify_all()
+
+    def close(self):
+        """Stop the pool without blocking - called on the event loop; the workers are reaped on a thread"""
+        self.closed = True
+        processes = [worker.process for worker in self.workers if worker.process is not None]
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.tasks.put(None)
+        threading.Thread(target=reap, args=(processes,), name='inference-reaper', daemon=True).start()
+        for request_id, (_, slot, future) in list(self.requests.items()):
+            if not future.done():
+                future.set_exception(RuntimeError("Inference pool closed"))
+        self.requests.clear()
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+        self.slots = []
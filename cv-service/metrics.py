@@ -0,0 +1,128 @@
+"""
+Prometheus metrics for the CV service hot path.
+
+Stage histograms cover decode, preprocess, inference, postprocess (incl.
+NMS), draw and encode. Per-endpoint request counters, latencies and
+in-flight gauges are recorded by the HTTP middleware in app.py, queue
+waits and slot usage per priority class by the scheduler; requests
+carrying a W3C traceparent header (hardware-monitor's patrol cycle
+traces) attach their trace ID to the latency histogram as an exemplar,
+visible when /metrics is scraped in the OpenMetrics format.
+Observations are a lock and a few additions, cheap enough to stay on in
+production.
+"""
+
+import re
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.openmetrics import exposition as openmetrics
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MEGAPIXEL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+BYTES_BUCKETS = (10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 2e6, 5e6, 10e6)
+
+STAGE_SECONDS = Histogram(
+    'cv_stage_duration_seconds', 'Duration of a detection pipeline stage',
+    ['stage', 'model'], buckets=STAGE_BUCKETS
+)
+REQUESTS = Counter(
+    'cv_requests_total', 'HTTP requests handled',
+    ['endpoint', 'model', 'status']
+)
+REQUEST_SECONDS = Histogram(
+    'cv_request_duration_seconds', 'End-to-end HTTP request duration',
+    ['endpoint', 'model'], buckets=STAGE_BUCKETS
+)
+IN_FLIGHT = Gauge(
+    'cv_requests_in_flight', 'HTTP requests currently being handled',
+    ['endpoint']
+)
+IMAGE_MEGAPIXELS = Histogram(
+    'cv_image_megapixels', 'Decoded size of submitted images',
+    ['endpoint'], buckets=MEGAPIXEL_BUCKETS
+)
+IMAGE_BYTES = Histogram(
+    'cv_image_bytes', 'Encoded size of submitted images',
+    ['endpoint'], buckets=BYTES_BUCKETS
+)
+DECODE_REDUCTIONS = Counter(
+    'cv_decode_reductions_total', 'Images decoded at a reduced scale',
+    ['endpoint', 'factor']
+)
+CACHE_LOOKUPS = Counter(
+    'cv_detection_cache_lookups_total', 'Detection cache lookups',
+    ['result']
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    'cv_scheduler_queue_wait_seconds', 'Time a detection waited for an inference slot',
+    ['priority'], buckets=STAGE_BUCKETS
+)
+QUEUED = Gauge(
+    'cv_scheduler_queued', 'Detections waiting for an inference slot',
+    ['priority']
+)
+EXPIRED = Counter(
+    'cv_scheduler_expired_total', 'Detections dropped because their deadline passed while queued',
+    ['priority']
+)
+RUNNING = Gauge(
+    'cv_scheduler_running', 'Detections holding an inference slot',
+    ['priority']
+)
+
+
+def observe_stage(stage, seconds, model):
+    STAGE_SECONDS.labels(stage=stage, model=model).observe(seconds)
+
+
+def stage_callback(model):
+    """Callback for YOLOv8.stage_callback reporting into the stage histogram"""
+    histograms = {}
+
+    def callback(stage, seconds):
+        # Cache the labelled child - labels() does a dict lookup under a lock
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = STAGE_SECONDS.labels(stage=stage, model=model)
+        histogram.observe(seconds)
+
+    return callback
+
+
+@contextmanager
+def stage_timer(stage, model):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, model)
+
+
+def observe_image(endpoint, image, encoded_size=None, full_size=None):
+    """full_size: (width, height) of the submitted image if it was decoded at a reduced scale"""
+    width, height = full_size or (image.shape[1], image.shape[0])
+    IMAGE_MEGAPIXELS.labels(endpoint=endpoint).observe(width * height / 1e6)
+    if full_size is not None and full_size[0] != image.shape[1]:
+        DECODE_REDUCTIONS.labels(endpoint=endpoint, factor=str(round(full_size[0] / image.shape[1]))).inc()
+    if encoded_size is not None:
+        IMAGE_BYTES.labels(endpoint=endpoint).observe(encoded_size)
+
+
+TRACEPARENT = re.compile(r'^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+
+def trace_exemplar(traceparent):
+    """{'trace_id': ...} from a W3C traceparent header, None if absent or malformed"""
+    match = TRACEPARENT.match((traceparent or '').strip().lower())
+    if match is None or match.group(1) == '0' * 32:
+        return None
+    return {'trace_id': match.group(1)}
+
+
+def render(accept=''):
+    """Metrics in the Prometheus text format, or OpenMetrics (with exemplars) if accepted"""
+    if 'application/openmetrics-text' in (accept or ''):
+        return openmetrics.generate_latest(REGISTRY), openmetrics.CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
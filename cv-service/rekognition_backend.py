@@ -0,0 +1,122 @@
+"""
+AWS Rekognition backend for the CV service.
+
+boto3 calls are blocking, so they run on a bounded thread pool instead of
+the event loop. The client gets a connection pool sized to that pool and
+adaptive retries, which back off client-side when Rekognition throttles.
+Images are downscaled before upload - bounding boxes come back relative
+to the image size, so results don't change - and results are cached by
+image content, since every call is billed.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import cv2
+import numpy as np
+from botocore.config import Config
+
+from detection_cache import DetectionCache
+
+# Rekognition rejects inline image bytes above 5 MB
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+def create_client(region, access_key=None, secret_key=None, max_pool_connections=8,
+                  max_attempts=5, connect_timeout=5, read_timeout=30):
+    """Create a Rekognition client with a tuned connection pool and adaptive retries
+
+    max_attempts counts the first call, so max_attempts - 1 retries at most.
+    """
+    config = Config(
+        region_name=region,
+        max_pool_connections=max_pool_connections,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={'total_max_attempts': max_attempts, 'mode': 'adaptive'}
+    )
+    if access_key and secret_key:
+        return boto3.client('rekognition', aws_access_key_id=access_key,
+                            aws_secret_access_key=secret_key, config=config)
+    # Use default AWS credentials (from environment, IAM role, etc.)
+    return boto3.client('rekognition', config=config)
+
+
+def downscale_image_bytes(image_bytes, max_side, jpeg_quality=90):
+    """Shrink an encoded image so its longer side is at most max_side
+
+    Returns (image bytes to upload, decoded image or None if it could not be decoded).
+    """
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return image_bytes, None
+
+    height, width = image.shape[:2]
+    scale = max_side / max(width, height) if max_side else 1.0
+    if scale >= 1.0 and len(image_bytes) <= MAX_IMAGE_BYTES:
+        return image_bytes, image
+
+    if scale < 1.0:
+        resized = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    else:
+        resized = image
+    success, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    if not success:
+        return image_bytes, image
+    return buffer.tobytes(), image
+
+
+class RekognitionBackend:
+
+    def __init__(self, client, max_concurrency=8, max_image_side=1280, cache_size=256, cache_ttl=300.0):
+        self.client = client
+        self.max_image_side = max_image_side
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='rekognition')
+        self.cache = DetectionCache(max_entries=cache_size, ttl=cache_ttl) if cache_size > 0 else None
+
+        self.calls = 0
+        self.uploaded_bytes = 0
+        self.saved_bytes = 0
+
+    async def detect_labels(self, image_bytes, max_labels=10, min_confidence=0.5):
+        """Call detect_labels for one image, off the event loop and cached by content"""
+        loop = asyncio.get_running_loop()
+        upload_bytes, image = await loop.run_in_executor(
+            self.executor, downscale_image_bytes, image_bytes, self.max_image_side
+        )
+
+        params = (max_labels, min_confidence)
+        if self.cache is not None and image is not None:
+            cached = self.cache.get(image, params)
+            if cached is not None:
+                return cached
+
+        response = await loop.run_in_executor(
+            self.executor, self.call_detect_labels, upload_bytes, max_labels, min_confidence
+        )
+        self.calls += 1
+        self.uploaded_bytes += len(upload_bytes)
+        self.saved_bytes += len(image_bytes) - len(upload_bytes)
+
+        if self.cache is not None and image is not None:
+            self.cache.put(image, params, response)
+        return response
+
+    def call_detect_labels(self, image_bytes, max_labels, min_confidence):
+        return self.client.detect_labels(
+            Image={'Bytes': image_bytes},
+            MaxLabels=max_labels,
+            MinConfidence=min_confidence
+        )
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "uploaded_bytes": self.uploaded_bytes,
+            "saved_bytes": self.saved_bytes,
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,180 @@
+"""
+Priority scheduling of detections.
+
+hardware-monitor's targeting frames (/detect_birds_optimized) decide
+whether a turret fires, while dashboard uploads (/detect) and bulk work
+can wait. Every detection that misses the cache takes one of `capacity`
+inference slots - one per inference worker, or a single one when the
+model runs in this process - and queues for it by priority class:
+
+- targeting: hardware-monitor's bird detection
+- interactive: dashboard uploads and WebSocket streams
+- batch: everything else (benchmarks, reports, /detect_birds_only)
+
+A free slot goes to the oldest waiter of the highest class that is below
+its concurrency quota. The quotas keep lower classes from occupying every
+slot, so a targeting frame waits for at most one running detection
+however many dashboard requests are queued - there is no preemption of a
+running inference. Queue wait, queue length and running detections are
+exported per class.
+
+The CPU work around inference - decoding uploads of the lower classes and
+rendering annotated dashboard images - runs on a few background threads
+with a raised nice value, so it cannot crowd out a targeting request's
+decode on a busy host either.
+
+Requests may carry a deadline (X-Deadline-Ms, the time budget left when
+the request arrives). A detection whose deadline passes while it is
+still queued is dropped with DeadlineExceeded instead of being run - a
+late answer is useless to a turret, and running it would only delay the
+frames behind it. Work that has started runs to completion.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import metrics
+
+PRIORITY_CLASSES = ("targeting", "interactive", "batch")
+
+# Deadline (time.monotonic()) of the request being served, set by the HTTP middleware
+current_deadline = ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def parse_deadline(value, received):
+    """Monotonic deadline from an X-Deadline-Ms header value, None if absent or malformed"""
+    try:
+        return received + float(value) / 1000 if value else None
+    except ValueError:
+        return None
+
+
+def default_quotas(capacity):
+    """Lower classes leave one slot free for targeting (if there is more than one)"""
+    return {
+        "targeting": capacity,
+        "interactive": max(1, capacity - 1),
+        "batch": max(1, capacity // 2)
+    }
+
+
+def parse_quotas(value, capacity):
+    """Per-class concurrency quotas from 'interactive:2,batch:1' on top of the defaults"""
+    quotas = default_quotas(capacity)
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, limit = item.partition(':')
+        name = name.strip().lower()
+        if name not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class in quotas: {name} (expected one of {PRIORITY_CLASSES})")
+        quotas[name] = max(1, min(capacity, int(limit)))
+    return quotas
+
+
+def lower_thread_priority(niceness):
+    """Executor thread initializer: run below the request-serving threads (Linux, best effort)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except (AttributeError, OSError):
+        pass
+
+
+class PriorityScheduler:
+
+    def __init__(self, capacity, quotas=None):
+        self.capacity = capacity
+        self.quotas = quotas or default_quotas(capacity)
+        self.running = {name: 0 for name in PRIORITY_CLASSES}
+        self.queued = {name: 0 for name in PRIORITY_CLASSES}
+        self.waiting = []  # heap of (class rank, sequence, class, future)
+        self.sequence = itertools.count()
+
+    @asynccontextmanager
+    async def slot(self, priority, deadline=None):
+        """Hold an inference slot for the duration of the block
+
+        deadline: time.monotonic() by which the slot must be granted (default:
+        the current request's); raises DeadlineExceeded once it has passed.
+        """
+        if deadline is None:
+            deadline = current_deadline.get()
+        start = time.perf_counter()
+        if deadline is not None and time.monotonic() >= deadline:
+            self.expired(priority)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiting, (PRIORITY_CLASSES.index(priority), next(self.sequence), priority, future))
+        self.queued[priority] += 1
+        metrics.QUEUED.labels(priority=priority).inc()
+        self.dispatch()
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(asyncio.shield(future), deadline - time.monotonic())
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just before the cancellation - hand the slot on
+                self.release(priority)
+            else:
+                future.cancel()
+                self.dequeued(priority)
+            if isinstance(e, asyncio.TimeoutError):
+                self.expired(priority)
+            raise
+        metrics.QUEUE_WAIT_SECONDS.labels(priority=priority).observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def dispatch(self):
+        """Grant free slots to the best waiters whose class is below its quota"""
+        free = self.capacity - sum(self.running.values())
+        deferred = []
+        while free > 0 and self.waiting:
+            entry = heapq.heappop(self.waiting)
+            _, _, priority, future = entry
+            if future.done():
+                continue
+            if self.running[priority] >= self.quotas[priority]:
+                deferred.append(entry)
+                continue
+            self.dequeued(priority)
+            self.running[priority] += 1
+            metrics.RUNNING.labels(priority=priority).inc()
+            future.set_result(None)
+            free -= 1
+        for entry in deferred:
+            heapq.heappush(self.waiting, entry)
+
+    def expired(self, priority):
+        metrics.EXPIRED.labels(priority=priority).inc()
+        raise DeadlineExceeded(f"Deadline passed before inference ({priority})")
+
+    def dequeued(self, priority):
+        self.queued[priority] -= 1
+        metrics.QUEUED.labels(priority=priority).dec()
+
+    def release(self, priority):
+        self.running[priority] -= 1
+        metrics.RUNNING.labels(priority=priority).dec()
+        self.dispatch()
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "quotas": dict(self.quotas),
+            "running": dict(self.running),
+            "queued": dict(self.queued)
+        }
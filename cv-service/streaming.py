@@ -0,0 +1,230 @@
+"""
+Continuous detection over a WebSocket.
+
+A session either receives frames pushed by the client (binary JPEG/PNG
+messages) or pulls them itself from an RTSP URL over one long-lived
+capture. Frames go into a single-slot buffer: when detection falls behind,
+a new frame replaces the one still waiting, so the stream stays at the
+newest frame instead of building a backlog. Detection runs at most at
+the target FPS and every result is sent back as soon as it is ready.
+"""
+
+import asyncio
+import json
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+from starlette.websockets import WebSocketDisconnect
+
+
+class LatestFrame:
+    """Single-slot frame buffer - a new frame replaces one not taken yet"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.frame_id = 0
+        self.timestamp = None
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self.lock:
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = frame
+            self.frame_id += 1
+            self.timestamp = time.time()
+            self.received += 1
+
+    def take(self):
+        with self.lock:
+            frame, self.frame = self.frame, None
+            return frame, self.frame_id, self.timestamp
+
+
+class RtspReader(threading.Thread):
+    """Keeps one RTSP capture open and feeds every frame into a LatestFrame"""
+
+    def __init__(self, rtsp_url, slot, open_timeout=10):
+        super().__init__(daemon=True)
+        self.rtsp_url = rtsp_url
+        self.slot = slot
+        self.open_timeout = open_timeout
+        self.stopped = threading.Event()
+        self.error = None
+
+    def run(self):
+        cap = cv2.VideoCapture(self.rtsp_url)
+        cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, self.open_timeout * 1000)
+        # Small internal buffer - we only ever want the newest frame
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        try:
+            if not cap.isOpened():
+                self.error = "Could not open RTSP stream"
+                return
+            failures = 0
+            while not self.stopped.is_set():
+                ret, frame = cap.read()
+                if not ret or frame is None:
+                    failures += 1
+                    if failures >= 50:
+                        self.error = "RTSP stream stopped delivering frames"
+                        return
+                    time.sleep(0.02)
+                    continue
+                failures = 0
+                self.slot.put(frame)
+        finally:
+            cap.release()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def decode_frame(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+async def receive_frames(websocket, slot, control):
+    """Push mode: binary messages are frames, text messages are control commands"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            control["stop"] = True
+            return
+        if message.get("bytes") is not None:
+            # Decoding is deferred until the frame is actually analysed
+            slot.put(message["bytes"])
+        elif message.get("text"):
+            handle_control(message["text"], control)
+
+
+async def receive_control(websocket, control):
+    """Pull mode: only control commands come from the client"""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            control["stop"] = True
+            return
+        if message.get("text"):
+            handle_control(message["text"], control)
+
+
+def parse_fps(value):
+    """Positive, finite FPS from a client value, None if it is not one"""
+    try:
+        fps = float(value)
+    except (TypeError, ValueError):
+        return None
+    return fps if math.isfinite(fps) and fps > 0 else None
+
+
+def handle_control(text, control):
+    """Apply a control command; malformed commands are ignored"""
+    try:
+        command = json.loads(text)
+    except ValueError:
+        return
+    if not isinstance(command, dict):
+        return
+    if command.get("type") == "stop":
+        control["stop"] = True
+    elif command.get("type") == "config" and "target_fps" in command:
+        fps = parse_fps(command["target_fps"])
+        if fps is not None:
+            control["target_fps"] = fps
+
+
+async def run_session(websocket, config, analyze, max_fps=30.0, executor=None):
+    """Run one streaming session until the client stops or disconnects
+
+    config: {"mode": "push" | "pull", "rtsp_url": ..., "target_fps": ...}
+    analyze: async function(image) -> result dict
+    executor: executor for decoding pushed frames (None: the loop's default)
+    """
+    mode = config.get("mode", "push")
+    target_fps = parse_fps(config.get("target_fps", 5))
+    if target_fps is None:
+        await websocket.send_json({"type": "error", "message": "target_fps must be a positive number"})
+        return
+    control = {"stop": False, "target_fps": target_fps}
+    slot = LatestFrame()
+    reader = None
+
+    if mode == "pull":
+        if not config.get("rtsp_url"):
+            await websocket.send_json({"type": "error", "message": "rtsp_url is required in pull mode"})
+            return
+        reader = RtspReader(config["rtsp_url"], slot, int(config.get("timeout", 10)))
+        reader.start()
+        receiver = asyncio.create_task(receive_control(websocket, control))
+    elif mode == "push":
+        receiver = asyncio.create_task(receive_frames(websocket, slot, control))
+    else:
+        await websocket.send_json({"type": "error", "message": f"Unknown mode: {mode}"})
+        return
+
+    await websocket.send_json({"type": "started", "mode": mode, "target_fps": control["target_fps"]})
+
+    processed = 0
+    next_tick = time.perf_counter()
+    try:
+        while not control["stop"]:
+            if receiver.done():
+                # Disconnected, or the receiver failed - either way nobody is listening any more
+                if not receiver.cancelled() and receiver.exception() is not None:
+                    print(f"Stream receiver failed: {receiver.exception()}")
+                break
+            if reader is not None and reader.error:
+                await websocket.send_json({"type": "error", "message": reader.error})
+                break
+
+            # Pace to the target FPS; the receiver fills the slot meanwhile
+            interval = 1.0 / min(max(control["target_fps"], 0.1), max_fps)
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            next_tick = max(next_tick + interval, time.perf_counter())
+
+            frame, frame_id, frame_timestamp = slot.take()
+            if frame is None:
+                continue
+            if isinstance(frame, (bytes, bytearray)):
+                frame = await asyncio.get_running_loop().run_in_executor(executor, decode_frame, frame)
+                if frame is None:
+                    await websocket.send_json({"type": "error", "frame_id": frame_id, "message": "Invalid image format"})
+                    continue
+
+            result = await analyze(frame)
+            processed += 1
+            await websocket.send_json({
+                "type": "detection",
+                "frame_id": frame_id,
+                "frame_timestamp": frame_timestamp,
+                "latency": time.time() - frame_timestamp,
+                "frames_received": slot.received,
+                "frames_dropped": slot.dropped,
+                "frames_processed": processed,
+                **result
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        if reader is not None:
+            reader.stop()
+
+    try:
+        await websocket.send_json({
+            "type": "stopped",
+            "frames_received": slot.received,
+            "frames_dropped": slot.dropped,
+            "frames_processed": processed
+        })
+    except Exception:
+        # Client is already gone
+        pass
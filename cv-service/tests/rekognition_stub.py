@@ -0,0 +1,72 @@
+"""
+Local stand-ins for AWS Rekognition, so the backend is tested without AWS.
+
+StubRekognitionClient replaces the boto3 client: it answers detect_labels
+with fixed labels and records the uploaded images. StubTransport keeps a
+real botocore client and only replaces its HTTP layer, answering each
+request with the next scripted response - the client's retry handling
+runs as it would against AWS.
+"""
+
+import json
+import threading
+
+import cv2
+import numpy as np
+from botocore.awsrequest import AWSResponse
+
+LABELS = [{
+    "Name": "Bird",
+    "Confidence": 97.5,
+    "Instances": [{"BoundingBox": {"Left": 0.25, "Top": 0.5, "Width": 0.1, "Height": 0.05}, "Confidence": 97.5}]
+}]
+
+
+class StubRekognitionClient:
+
+    def __init__(self, labels=LABELS):
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.calls = []  # (decoded upload, MaxLabels, MinConfidence)
+
+    def detect_labels(self, Image, MaxLabels, MinConfidence):
+        image = cv2.imdecode(np.frombuffer(Image['Bytes'], np.uint8), cv2.IMREAD_COLOR)
+        with self.lock:
+            self.calls.append((image, MaxLabels, MinConfidence))
+        return {"Labels": self.labels, "LabelModelVersion": "stub"}
+
+
+class StubBody:
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+def throttling():
+    return 400, {"__type": "ThrottlingException", "message": "Rate exceeded"}
+
+
+def success(labels=LABELS):
+    return 200, {"Labels": labels, "LabelModelVersion": "stub"}
+
+
+class StubTransport:
+    """Answers a botocore client's DetectLabels requests from a script
+
+    responses: (status, body) pairs, one per HTTP request; the last one
+    repeats once the script is used up.
+    """
+
+    def __init__(self, client, responses):
+        self.responses = list(responses)
+        self.requests = 0
+        client.meta.events.register('before-send.rekognition.DetectLabels', self.send)
+
+    def send(self, request, **kwargs):
+        status, body = self.responses[min(self.requests, len(self.responses) - 1)]
+        self.requests += 1
+        headers = {"Content-Type": "application/x-amz-json-1.1", "x-amzn-RequestId": f"stub-{self.requests}"}
+        return AWSResponse(request.url, status, headers, StubBody(json.dumps(body).encode()))
@@ -0,0 +1,51 @@
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+import fast_decode
+
+
+def jpeg(width, height, orientation=None):
+    """Camera-like JPEG, with an EXIF orientation tag if given (as phones write it)"""
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.rectangle(image, (width // 8, height // 8), (width // 4, height // 4), (255, 255, 255), -1)
+    data = cv2.imencode('.jpg', image)[1].tobytes()
+    if orientation is None:
+        return data
+    # Little-endian TIFF header, IFD0 with the single orientation entry
+    tiff = b'II*\x00' + struct.pack('<I', 8) + struct.pack('<H', 1)
+    tiff += struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0) + struct.pack('<I', 0)
+    payload = b'Exif\x00\x00' + tiff
+    return data[:2] + b'\xff\xe1' + struct.pack('>H', len(payload) + 2) + payload + data[2:]
+
+
+def test_jpeg_size_reads_the_header():
+    assert fast_decode.jpeg_size(jpeg(2560, 1440)) == (2560, 1440)
+    assert fast_decode.jpeg_size(b'not a jpeg') is None
+
+
+@pytest.mark.parametrize("orientation, size", [(1, (2560, 1440)), (3, (2560, 1440)),
+                                               (6, (1440, 2560)), (8, (1440, 2560))])
+def test_jpeg_size_follows_exif_orientation(orientation, size):
+    assert fast_decode.jpeg_size(jpeg(2560, 1440, orientation)) == size
+
+
+@pytest.mark.parametrize("orientation", [None, 1, 6, 8])
+def test_reduced_decode_matches_full_decode(orientation):
+    data = jpeg(2560, 1440, orientation)
+    full = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+    image, scale, size = fast_decode.decode_image(data, min_size=(640, 640))
+
+    assert size == (full.shape[1], full.shape[0])
+    assert image.shape[1] * scale[0] == pytest.approx(size[0])
+    assert image.shape[0] * scale[1] == pytest.approx(size[1])
+    assert scale == (2.0, 2.0)
+
+
+def test_boxes_are_scaled_back_to_the_full_image():
+    boxes = fast_decode.scale_boxes(np.array([[10, 20, 30, 40]]), (2.0, 2.0))
+
+    assert boxes.tolist() == [[20, 40, 60, 80]]
@@ -0,0 +1,106 @@
+import asyncio
+
+import cv2
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+
+import rekognition_backend
+from rekognition_backend import RekognitionBackend, create_client
+from rekognition_stub import LABELS, StubRekognitionClient, StubTransport, success, throttling
+
+
+def jpeg(width, height, seed=0):
+    image = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+
+def detect(backend, image_bytes, **kwargs):
+    return asyncio.run(backend.detect_labels(image_bytes, **kwargs))
+
+
+def stub_client(responses, max_attempts):
+    client = create_client('eu-central-1', access_key='stub', secret_key='stub', max_attempts=max_attempts)
+    return client, StubTransport(client, responses)
+
+
+def test_throttled_call_is_retried():
+    client, transport = stub_client([throttling(), throttling(), success()], max_attempts=3)
+    backend = RekognitionBackend(client, cache_size=0)
+
+    response = detect(backend, jpeg(320, 240))
+
+    assert response["Labels"] == LABELS
+    assert transport.requests == 3
+    assert backend.calls == 1
+
+
+def test_throttling_beyond_max_attempts_raises():
+    client, transport = stub_client([throttling()], max_attempts=2)
+    backend = RekognitionBackend(client, cache_size=0)
+
+    with pytest.raises(ClientError) as error:
+        detect(backend, jpeg(320, 240))
+
+    assert error.value.response["Error"]["Code"] == "ThrottlingException"
+    assert transport.requests == 2
+
+
+def test_large_image_is_downscaled_before_upload():
+    client = StubRekognitionClient()
+    backend = RekognitionBackend(client, max_image_side=1280, cache_size=0)
+    original = jpeg(2560, 1440)
+
+    response = detect(backend, original)
+
+    uploaded = client.calls[0][0]
+    assert uploaded.shape[:2] == (720, 1280)
+    # Bounding boxes are relative, the response is passed through unchanged
+    assert response["Labels"] == LABELS
+    assert backend.saved_bytes == len(original) - backend.uploaded_bytes > 0
+
+
+def test_small_image_is_uploaded_as_is():
+    original = jpeg(640, 480)
+
+    upload_bytes, image = rekognition_backend.downscale_image_bytes(original, 1280)
+
+    assert upload_bytes is original
+    assert image.shape[:2] == (480, 640)
+
+
+def test_undecodable_image_is_uploaded_as_is_and_not_cached():
+    client = StubRekognitionClient()
+    backend = RekognitionBackend(client)
+
+    detect(backend, b'not an image')
+    detect(backend, b'not an image')
+
+    assert backend.calls == 2
+
+
+def test_repeated_image_is_answered_from_cache():
+    client = StubRekognitionClient()
+    backend = RekognitionBackend(client)
+    image_bytes = jpeg(640, 480)
+
+    first = detect(backend, image_bytes)
+    second = detect(backend, image_bytes)
+
+    assert second == first
+    assert len(client.calls) == 1
+    assert backend.stats()["cache"]["hits"] == 1
+
+
+def test_cache_is_keyed_on_request_parameters():
+    client = StubRekognitionClient()
+    backend = RekognitionBackend(client)
+    image_bytes = jpeg(640, 480)
+
+    detect(backend, image_bytes, max_labels=10, min_confidence=0.5)
+    detect(backend, image_bytes, max_labels=20, min_confidence=0.3)
+    detect(backend, jpeg(640, 480, seed=1), max_labels=10, min_confidence=0.5)
+
+    assert [(max_labels, min_confidence) for _, max_labels, min_confidence in client.calls] == [
+        (10, 0.5), (20, 0.3), (10, 0.5)
+    ]
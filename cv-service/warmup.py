@@ -0,0 +1,75 @@
+"""
+Model warm-up for the CV service.
+
+ONNX Runtime initializes kernels lazily and grows its memory arena on the
+first runs, so the first real detection after startup is a multi-second
+outlier. Running a few dummy inferences at the expected shapes moves that
+cost into startup.
+"""
+
+import time
+import numpy as np
+
+
+def parse_shapes(value):
+    """Parse a list of image sizes like '1280x720,2560x1440' into (width, height) tuples"""
+    shapes = []
+    for item in value.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        width, height = item.split('x')
+        shapes.append((int(width), int(height)))
+    return shapes
+
+
+def parse_batch_sizes(value):
+    """Parse a list of batch sizes like '1,4'"""
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def warm_up_detector(detector, image_shapes, iterations=3, batch_sizes=(1,)):
+    """Run dummy inferences through a YOLOv8 detector.
+
+    Every image shape goes through the full detection path (resize,
+    inference, postprocessing). Batch sizes above 1 are only run directly
+    against the session, and only if the model has a dynamic batch axis.
+
+    Returns a dict with the duration of the first and last run per shape.
+    """
+    rng = np.random.default_rng(0)
+    timings = {}
+
+    for width, height in image_shapes:
+        image = rng.integers(0, 255, size=(height, width, 3), dtype=np.uint8)
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            detector(image)
+            durations.append(time.perf_counter() - start)
+        if durations:
+            timings[f"{width}x{height}"] = {
+                "first_ms": round(durations[0] * 1000, 2),
+                "last_ms": round(durations[-1] * 1000, 2)
+            }
+
+    if isinstance(detector.input_shape[0], int):
+        # Fixed batch axis - the runs above already covered it
+        return timings
+
+    for batch_size in batch_sizes:
+        if batch_size <= 1:
+            continue
+        tensor = rng.random((batch_size, 3, detector.input_height, detector.input_width), dtype=np.float32)
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            detector.inference(tensor)
+            durations.append(time.perf_counter() - start)
+        if durations:
+            timings[f"batch_{batch_size}"] = {
+                "first_ms": round(durations[0] * 1000, 2),
+                "last_ms": round(durations[-1] * 1000, 2)
+            }
+
+    return timings
@@ -8,10 +8,16 @@ from yolov8.utils import xywh2xyxy, nms, draw_detections
 
 class YOLOv8:
 
-    def __init__(self, path, conf_thres=0.7, iou_thres=0.5):
+    def __init__(self, path, conf_thres=0.7, iou_thres=0.5, stage_callback=None, intra_op_threads=None):
         self.conf_threshold = conf_thres
         self.iou_threshold = iou_thres
 
+        # Optional callback(stage, seconds) for preprocess/inference/postprocess timings
+        self.stage_callback = stage_callback
+
+        # Threads per inference (None = ONNX Runtime default, one per core)
+        self.intra_op_threads = intra_op_threads
+
         # Initialize model
         self.initialize_model(path)
 
@@ -19,7 +25,10 @@ class YOLOv8:
         return self.detect_objects(image)
 
     def initialize_model(self, path):
-        self.session = onnxruntime.InferenceSession(path,
+        options = onnxruntime.SessionOptions()
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        self.session = onnxruntime.InferenceSession(path, sess_options=options,
                                                     providers=['CUDAExecutionProvider',
                                                                'CPUExecutionProvider'])
         # Get model info
@@ -28,15 +37,23 @@ class YOLOv8:
         print("Used device: {}".format(onnxruntime.get_device()))
 
     def detect_objects(self, image):
+        start = time.perf_counter()
         input_tensor = self.prepare_input(image)
+        self.report_stage("preprocess", start)
 
         # Perform inference on the image
         outputs = self.inference(input_tensor)
 
+        start = time.perf_counter()
         self.boxes, self.scores, self.class_ids = self.process_output(outputs)
+        self.report_stage("postprocess", start)
 
         return self.boxes, self.scores, self.class_ids
 
+    def report_stage(self, stage, start):
+        if self.stage_callback is not None:
+            self.stage_callback(stage, time.perf_counter() - start)
+
     def prepare_input(self, image):
         self.img_height, self.img_width = image.shape[:2]
 
@@ -56,7 +73,7 @@ class YOLOv8:
         start = time.perf_counter()
         outputs = self.session.run(self.output_names, {self.input_names[0]: input_tensor})
 
-        print(f"Inference time: {(time.perf_counter() - start) * 1000:.2f} ms")
+        self.report_stage("inference", start)
         return outputs
 
     def process_output(self, output):
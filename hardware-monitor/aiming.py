@@ -0,0 +1,178 @@
+"""
+Closed-loop aiming for the turret.
+
+The open-loop aim (bbox offset -> angles -> one move) is only as good as
+the FOV assumption and the bird standing still. AimController makes the
+first move, then takes up to max_refinements quick looks at a small ROI
+around the image center (where the bird should now be), measures the
+remaining offset and corrects before firing. All of this runs within a
+fixed time budget: a refinement is skipped when it would not fit, so the
+time-to-shot is bounded.
+
+Hardware access goes through callbacks (move, capture, detect, fire), so
+the same controller drives the real turret over MQTT and the synthetic
+turret/camera in loadtest.aiming.
+"""
+
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tapo-like defaults, used when a device has no calibration
+DEFAULT_HFOV = 60.0
+DEFAULT_VFOV = 34.0
+
+
+class CameraModel:
+    """Pinhole camera with optional radial distortion (k1)
+
+    hfov/vfov are the full-sensor fields of view in degrees. A zoomed
+    frame is a center crop of the sensor, so pixel offsets map to the same
+    angles as in the full frame.
+    """
+
+    def __init__(self, hfov=DEFAULT_HFOV, vfov=DEFAULT_VFOV, k1=0.0):
+        self.hfov = float(hfov)
+        self.vfov = float(vfov)
+        self.k1 = float(k1)
+
+    @classmethod
+    def from_device(cls, device):
+        """Calibration from device.camera.calibration, defaults otherwise"""
+        calibration = (device.get('camera') or {}).get('calibration') or {}
+        return cls(
+            hfov=calibration.get('hfov', DEFAULT_HFOV),
+            vfov=calibration.get('vfov', DEFAULT_VFOV),
+            k1=calibration.get('k1', 0.0)
+        )
+
+    def pixel_to_angles(self, x, y, width, height, zoom=1.0):
+        """(rotation, tilt) offset in degrees of pixel (x, y) from the optical axis
+
+        width/height are the size of the frame the pixel belongs to (after
+        zoom cropping), zoom the crop factor relative to the full sensor.
+        """
+        fx = (width * zoom / 2) / math.tan(math.radians(self.hfov / 2))
+        fy = (height * zoom / 2) / math.tan(math.radians(self.vfov / 2))
+        nx = (x - width / 2) / fx
+        ny = (y - height / 2) / fy
+        if self.k1:
+            # First-order undistortion
+            scale = 1 + self.k1 * (nx * nx + ny * ny)
+            nx, ny = nx / scale, ny / scale
+        return math.degrees(math.atan(nx)), -math.degrees(math.atan(ny))
+
+    def bbox_to_angles(self, bbox, width, height, zoom=1.0):
+        cx = bbox.get('x', 0) + bbox.get('width', 0) / 2
+        cy = bbox.get('y', 0) + bbox.get('height', 0) / 2
+        return self.pixel_to_angles(cx, cy, width, height, zoom)
+
+    def angular_size(self, pixels, width, zoom=1.0):
+        """Approximate angle subtended by a pixel extent at the image center"""
+        return pixels * self.hfov / (width * zoom)
+
+
+def center_roi(frame_width, frame_height, size):
+    """Square ROI (x, y, w, h) of the given side around the frame center"""
+    w = int(min(size, frame_width))
+    h = int(min(size, frame_height))
+    return (frame_width - w) // 2, (frame_height - h) // 2, w, h
+
+
+class AimController:
+    """Move, re-detect in a small ROI, correct, fire - within a time budget
+
+    move(rotation, tilt): async, returns once the turret has settled
+    capture(): async, returns a full frame (numpy array) or None
+    detect(roi_frame): async, returns bird detections (CV service format)
+    fire(): async, triggers the shot
+    clock: time source, the simulation passes its virtual clock
+    """
+
+    def __init__(self, move, capture, detect, fire, camera_model,
+                 max_refinements=2, tolerance_deg=1.0, time_budget=4.0, roi_scale=4.0, min_roi=160,
+                 clock=time.monotonic):
+        self.move = move
+        self.capture = capture
+        self.detect = detect
+        self.fire = fire
+        self.camera_model = camera_model
+        self.max_refinements = max_refinements
+        self.tolerance_deg = tolerance_deg
+        self.time_budget = time_budget
+        self.roi_scale = roi_scale
+        self.min_roi = min_roi
+        self.clock = clock
+        # Running estimates of a look (capture + detect) and a correction move
+        self.look_estimate = 0.3
+        self.move_estimate = None
+
+    async def look(self, target_size_px):
+        """Capture, detect in the center ROI and return the residual offset in degrees"""
+        frame = await self.capture()
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        x, y, w, h = center_roi(width, height, max(self.min_roi, self.roi_scale * target_size_px))
+        detections = await self.detect(frame[y:y + h, x:x + w])
+        if not detections:
+            return None
+
+        # The bird we aimed at is the one closest to the ROI center
+        def distance(d):
+            bbox = d['bbox']
+            return math.hypot(bbox['x'] + bbox['width'] / 2 - w / 2, bbox['y'] + bbox['height'] / 2 - h / 2)
+
+        bbox = dict(min(detections, key=distance)['bbox'])
+        bbox['x'] += x
+        bbox['y'] += y
+        return self.camera_model.bbox_to_angles(bbox, width, height)
+
+    async def aim_and_fire(self, position, offset, target_size_px=40, velocity=(0.0, 0.0), lead_time=0.0):
+        """Aim from position (rotation, tilt) at position + offset (degrees) and fire
+
+        velocity: target motion in deg/s, lead_time: expected time until the
+        shot - the aim point is led by velocity * lead_time.
+        Returns a report with the final aim, refinements and time-to-shot.
+        """
+        start = self.clock()
+        rotation = position[0] + offset[0] + velocity[0] * lead_time
+        tilt = position[1] + offset[1] + velocity[1] * lead_time
+        await self.move(rotation, tilt)
+        # The aim move includes the settle time, so it bounds a small correction from above
+        if self.move_estimate is None:
+            self.move_estimate = self.clock() - start
+
+        refinements = []
+        for _ in range(self.max_refinements):
+            # Only look again if the look and a correction still fit into the budget
+            remaining = self.time_budget - (self.clock() - start)
+            if remaining < self.look_estimate + self.move_estimate:
+                break
+
+            look_start = self.clock()
+            residual = await self.look(target_size_px)
+            self.look_estimate = 0.7 * self.look_estimate + 0.3 * (self.clock() - look_start)
+            if residual is None:
+                refinements.append({"found": False})
+                break
+            refinements.append({"found": True, "residual": [round(residual[0], 2), round(residual[1], 2)]})
+            if math.hypot(*residual) <= self.tolerance_deg:
+                break
+
+            rotation += residual[0]
+            tilt += residual[1]
+            move_start = self.clock()
+            await self.move(rotation, tilt)
+            self.move_estimate = 0.7 * self.move_estimate + 0.3 * (self.clock() - move_start)
+
+        await self.fire()
+        report = {
+            "target": [rotation, tilt],
+            "refinements": refinements,
+            "time_to_shot": self.clock() - start
+        }
+        logger.info(f"🎯 Aim complete: {len(refinements)} refinement(s), time to shot {report['time_to_shot']:.2f}s")
+        return report
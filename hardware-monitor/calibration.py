@@ -0,0 +1,142 @@
+"""
+Per-device camera calibration cache for angle computation.
+
+A Calibration holds the lens model (FOV, radial distortion) of one
+device/stream at one resolution together with pixel->angle lookup
+tables, built once. Many bboxes are mapped to
+pan/tilt offsets in one vectorized call, which keeps multi-bird
+targeting cheap. Zoomed frames are center crops of the full frame, so
+their pixels are shifted into full-frame coordinates before the lookup.
+
+CalibrationStore keys calibrations by (device, stream) and rebuilds an
+entry when the camera configuration or the frame resolution changes.
+"""
+
+import json
+import math
+
+import numpy as np
+
+from aiming import CameraModel
+
+# Camera config fields that change the image geometry
+GEOMETRY_FIELDS = ('type', 'calibration', 'rtspUrl', 'directUrl', 'useLocalImage', 'localImagePath')
+
+
+def stream_key(camera_config):
+    """Which stream of the device the frames come from"""
+    if camera_config.get('useLocalImage'):
+        return 'local'
+    if camera_config.get('type') == 'tapo':
+        return (camera_config.get('tapo') or {}).get('stream', 'stream1')
+    return 'direct'
+
+
+def config_fingerprint(camera_config):
+    fields = {name: camera_config.get(name) for name in GEOMETRY_FIELDS}
+    tapo = camera_config.get('tapo') or {}
+    fields['tapo'] = {'ip': tapo.get('ip'), 'stream': tapo.get('stream')}
+    return json.dumps(fields, sort_keys=True, default=str)
+
+
+class Calibration:
+    """Lens model plus lookup tables for one full-frame resolution
+
+    Without distortion, rotation depends only on the column and tilt only
+    on the row, so two 1-D tables of angles cover the whole frame. With
+    distortion (k1) the mapping is not separable and is computed directly
+    from the normalized coordinates.
+    """
+
+    def __init__(self, model: CameraModel, width: int, height: int):
+        self.model = model
+        self.width = width
+        self.height = height
+        self.fx = (width / 2) / math.tan(math.radians(model.hfov / 2))
+        self.fy = (height / 2) / math.tan(math.radians(model.vfov / 2))
+        self.grid_x = np.arange(width + 1, dtype=np.float64)
+        self.grid_y = np.arange(height + 1, dtype=np.float64)
+        self.lut_rotation = np.degrees(np.arctan((self.grid_x - width / 2) / self.fx))
+        self.lut_tilt = -np.degrees(np.arctan((self.grid_y - height / 2) / self.fy))
+        self.degrees_per_pixel = model.hfov / width
+
+    def direct_angles(self, xs, ys):
+        nx = (xs - self.width / 2) / self.fx
+        ny = (ys - self.height / 2) / self.fy
+        if self.model.k1:
+            # First-order undistortion, as in CameraModel.pixel_to_angles
+            scale = 1 + self.model.k1 * (nx * nx + ny * ny)
+            nx, ny = nx / scale, ny / scale
+        return np.degrees(np.arctan(nx)), -np.degrees(np.arctan(ny))
+
+    def points_to_angles(self, xs, ys, frame_width=None, frame_height=None):
+        """(rotation, tilt) offsets in degrees for arrays of pixel coordinates
+
+        frame_width/frame_height: size of the frame the points belong to, if it
+        is a (zoomed) center crop of the calibrated full frame.
+        """
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        if frame_width is not None:
+            xs = xs + (self.width - frame_width) // 2
+        if frame_height is not None:
+            ys = ys + (self.height - frame_height) // 2
+
+        if self.model.k1:
+            return self.direct_angles(xs, ys)
+
+        rotation = np.interp(xs, self.grid_x, self.lut_rotation)
+        tilt = np.interp(ys, self.grid_y, self.lut_tilt)
+        # The tables end at the frame border (np.interp clamps) - compute points outside directly
+        outside = (xs < 0) | (xs > self.width) | (ys < 0) | (ys > self.height)
+        if outside.any():
+            rotation[outside], tilt[outside] = self.direct_angles(xs[outside], ys[outside])
+        return rotation, tilt
+
+    def bboxes_to_angles(self, bboxes, frame_width=None, frame_height=None):
+        """Vectorized: N bbox dicts (or an Nx4 x/y/w/h array) -> Nx2 array of (rotation, tilt)"""
+        if len(bboxes) == 0:
+            return np.zeros((0, 2))
+        if isinstance(bboxes[0], dict):
+            boxes = np.array([[b.get('x', 0), b.get('y', 0), b.get('width', 0), b.get('height', 0)] for b in bboxes],
+                             dtype=np.float64)
+        else:
+            boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+        rotation, tilt = self.points_to_angles(boxes[:, 0] + boxes[:, 2] / 2, boxes[:, 1] + boxes[:, 3] / 2,
+                                               frame_width, frame_height)
+        return np.stack([rotation, tilt], axis=1)
+
+    def bbox_to_angles(self, bbox, width=None, height=None):
+        """Single bbox -> (rotation, tilt); same interface as CameraModel for AimController"""
+        rotation, tilt = self.bboxes_to_angles([bbox], width, height)[0]
+        return float(rotation), float(tilt)
+
+    def angular_size(self, pixels):
+        """Approximate angle subtended by a pixel extent at the image center"""
+        return pixels * self.degrees_per_pixel
+
+
+class CalibrationStore:
+    """Calibrations keyed by (device, stream), rebuilt when the camera changes"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, device, width, height) -> Calibration:
+        """Calibration for the device's current stream at the given full-frame size"""
+        camera_config = device.get('camera') or {}
+        key = (device.get('_id') or device.get('deviceId'), stream_key(camera_config))
+        fingerprint = (config_fingerprint(camera_config), width, height)
+
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != fingerprint:
+            entry = (fingerprint, Calibration(CameraModel.from_device(device), width, height))
+            self.entries[key] = entry
+        return entry[1]
+
+    def invalidate(self, device_id=None):
+        if device_id is None:
+            self.entries.clear()
+        else:
+            for key in [k for k in self.entries if k[0] == device_id]:
+                del self.entries[key]
@@ -0,0 +1,151 @@
+"""
+Persistent camera streams.
+
+capture_frame() opens the RTSP stream for every single frame, which
+costs a connection setup per capture and gives no way to watch the image
+settle after a move. A CameraStream keeps one connection open and reads
+it continuously on a background thread (which also keeps the decoder
+buffer drained, so the latest frame is current). Callers await the next
+frame newer than a given time.
+
+Streams close themselves after idle_timeout seconds without a reader, so
+cameras are only decoded around patrol stops: the stream is opened when
+the move command is sent (connection setup overlaps the movement) and
+stays up through stabilization and capture. Keep the idle timeout above
+the route dwell time to reuse the connection across stops, at the cost of
+decoding the stream in between.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+MAX_READ_FAILURES = 25
+
+
+def resolve(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+class CameraStream:
+
+    def __init__(self, url, on_close, idle_timeout=30.0, open_capture=cv2.VideoCapture):
+        self.url = url
+        self.on_close = on_close
+        self.idle_timeout = idle_timeout
+        self.open_capture = open_capture
+        self.lock = threading.Lock()
+        self.frame = None
+        self.timestamp = 0.0
+        self.frames_read = 0
+        self.closed = False
+        self.waiters = []  # (loop, future) awaiting the next frame
+        self.last_used = time.monotonic()
+        self.thread = threading.Thread(target=self.read_loop, name='camera-stream', daemon=True)
+        self.thread.start()
+
+    async def next_frame(self, after, timeout):
+        """(timestamp, frame) of the first frame newer than `after`, None on timeout or closed stream"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            self.last_used = time.monotonic()
+            if self.frame is not None and self.timestamp > after:
+                return self.timestamp, self.frame
+            if self.closed:
+                return None
+            self.waiters.append((loop, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            with self.lock:
+                self.waiters = [w for w in self.waiters if w[1] is not future]
+
+    def read_loop(self):
+        capture = self.open_capture(self.url)
+        # Keep the driver buffer small so frames are current, not queued
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        failures = 0
+        try:
+            if not capture.isOpened():
+                logger.warning("❌ Could not open camera stream")
+                return
+            while failures < MAX_READ_FAILURES:
+                if time.monotonic() - self.last_used > self.idle_timeout:
+                    logger.debug("Camera stream idle, closing")
+                    return
+                ret, frame = capture.read()
+                if not ret or frame is None:
+                    failures += 1
+                    time.sleep(0.05)
+                    continue
+                failures = 0
+                # Frames are shared between readers
+                frame.setflags(write=False)
+                with self.lock:
+                    self.frame = frame
+                    self.timestamp = time.time()
+                    self.frames_read += 1
+                    waiters, self.waiters = self.waiters, []
+                for loop, future in waiters:
+                    loop.call_soon_threadsafe(resolve, future, (self.timestamp, frame))
+            logger.warning(f"❌ Camera stream stopped after {MAX_READ_FAILURES} failed reads")
+        finally:
+            capture.release()
+            self.close()
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            # Stops the reader at its next frame
+            self.last_used = float('-inf')
+            waiters, self.waiters = self.waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(resolve, future, None)
+        self.on_close(self)
+
+
+class CameraStreams:
+    """One persistent stream per camera URL"""
+
+    def __init__(self, idle_timeout=30.0, open_capture=cv2.VideoCapture):
+        self.idle_timeout = idle_timeout
+        self.open_capture = open_capture
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def open(self, url) -> CameraStream:
+        """The running stream for url, started if necessary (returns immediately)"""
+        with self.lock:
+            stream = self.streams.get(url)
+            if stream is None or stream.closed:
+                stream = self.streams[url] = CameraStream(url, self.discard, self.idle_timeout, self.open_capture)
+            else:
+                stream.last_used = time.monotonic()
+            return stream
+
+    def get(self, url):
+        with self.lock:
+            stream = self.streams.get(url)
+            return stream if stream is not None and not stream.closed else None
+
+    def discard(self, stream):
+        with self.lock:
+            if self.streams.get(stream.url) is stream:
+                del self.streams[stream.url]
+
+    def close_all(self):
+        with self.lock:
+            streams = list(self.streams.values())
+        for stream in streams:
+            stream.close()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Offline simulation of the aiming loop.
+
+A synthetic turret (pan/tilt speeds, settle time, integer-degree
+commands) carries a synthetic camera (true FOV and lens distortion,
+which may differ from what the aiming code assumes). Birds sit at random
+angles in the field of view, optionally moving. Frames are rendered and
+birds are found by a simple blob detector with pixel noise, so the
+controller sees what it would see from the CV service. Time is virtual:
+moves, captures and detections advance a clock instead of sleeping, so
+thousands of trials take seconds.
+
+Each trial runs aiming.AimController in open-loop (no refinement) and
+closed-loop mode from the same start and reports hit rate, final aim
+error and time-to-shot.
+
+Usage (from hardware-monitor/):
+    python -m loadtest.aiming --trials 500
+    python -m loadtest.aiming --fov-error 0.15 --k1 -0.1 --bird-speed 3 --output aim.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+
+import cv2
+import numpy as np
+
+from aiming import AimController, CameraModel
+
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class SyntheticTurret:
+    """Pan/tilt head that moves at fixed speeds to integer-degree positions"""
+
+    def __init__(self, clock, pan_speed=60.0, tilt_speed=30.0, settle_time=0.5):
+        self.clock = clock
+        self.pan_speed = pan_speed
+        self.tilt_speed = tilt_speed
+        self.settle_time = settle_time
+        self.rotation = 0.0
+        self.tilt = 0.0
+
+    async def move(self, rotation, tilt):
+        rotation, tilt = round(rotation), round(tilt)
+        duration = max(abs(rotation - self.rotation) / self.pan_speed, abs(tilt - self.tilt) / self.tilt_speed)
+        self.clock.advance(duration + self.settle_time)
+        self.rotation, self.tilt = float(rotation), float(tilt)
+
+
+class SyntheticBird:
+    """A bird at absolute angles, drifting with a constant angular velocity"""
+
+    def __init__(self, clock, rotation, tilt, velocity=(0.0, 0.0), size_deg=1.5):
+        self.clock = clock
+        self.start = (rotation, tilt)
+        self.start_time = clock()
+        self.velocity = velocity
+        self.size_deg = size_deg
+
+    def position(self):
+        dt = self.clock() - self.start_time
+        return self.start[0] + self.velocity[0] * dt, self.start[1] + self.velocity[1] * dt
+
+
+class SyntheticCamera:
+    """Renders the bird as a dark blob through a distorted pinhole model"""
+
+    def __init__(self, clock, turret, bird, model, width=1280, height=720, capture_time=0.15):
+        self.clock = clock
+        self.turret = turret
+        self.bird = bird
+        self.model = model
+        self.width = width
+        self.height = height
+        self.capture_time = capture_time
+
+    def angles_to_pixel(self, rotation, tilt):
+        """Inverse of CameraModel.pixel_to_angles for the true camera"""
+        fx = (self.width / 2) / math.tan(math.radians(self.model.hfov / 2))
+        fy = (self.height / 2) / math.tan(math.radians(self.model.vfov / 2))
+        nx = math.tan(math.radians(rotation))
+        ny = -math.tan(math.radians(tilt))
+        if self.model.k1:
+            # Distort: solve n_u = n_d / (1 + k1 * |n_d|^2) by fixed-point iteration
+            nx_d, ny_d = nx, ny
+            for _ in range(5):
+                scale = 1 + self.model.k1 * (nx_d * nx_d + ny_d * ny_d)
+                nx_d, ny_d = nx * scale, ny * scale
+            nx, ny = nx_d, ny_d
+        return self.width / 2 + nx * fx, self.height / 2 + ny * fy
+
+    def render(self):
+        frame = np.full((self.height, self.width, 3), 200, dtype=np.uint8)
+        bird_rotation, bird_tilt = self.bird.position()
+        x, y = self.angles_to_pixel(bird_rotation - self.turret.rotation, bird_tilt - self.turret.tilt)
+        radius = max(2, int(self.bird.size_deg / self.model.hfov * self.width / 2))
+        if -radius <= x < self.width + radius and -radius <= y < self.height + radius:
+            cv2.ellipse(frame, (int(round(x)), int(round(y))), (radius, int(radius * 0.7)), 0, 0, 360, (40, 40, 40), -1)
+        return frame
+
+    async def capture(self):
+        self.clock.advance(self.capture_time)
+        return self.render()
+
+
+class BlobDetector:
+    """Stand-in for the CV service: dark blobs become bird detections"""
+
+    def __init__(self, clock, rng, latency=0.1, pixel_noise=2.0, miss_rate=0.0):
+        self.clock = clock
+        self.rng = rng
+        self.latency = latency
+        self.pixel_noise = pixel_noise
+        self.miss_rate = miss_rate
+
+    async def detect(self, frame):
+        self.clock.advance(self.latency)
+        if self.rng.random() < self.miss_rate:
+            return []
+        mask = (frame[:, :, 0] < 100).astype(np.uint8)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        detections = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            nx, ny = self.rng.normal(0, self.pixel_noise, 2)
+            detections.append({
+                "class": "bird",
+                "confidence": 0.9,
+                "bbox": {"x": float(x + nx), "y": float(y + ny), "width": float(w), "height": float(h)}
+            })
+        return detections
+
+
+async def run_trial(args, seed, max_refinements):
+    rng = np.random.default_rng(seed)
+    clock = VirtualClock()
+    true_model = CameraModel(args.hfov, args.vfov, args.k1)
+    assumed_model = CameraModel(args.hfov * (1 + args.fov_error), args.vfov * (1 + args.fov_error), 0.0)
+
+    turret = SyntheticTurret(clock, args.pan_speed, args.tilt_speed, args.settle_time)
+    angle = rng.uniform(0, 2 * math.pi)
+    speed = args.bird_speed * rng.random()
+    bird = SyntheticBird(
+        clock,
+        rng.uniform(-0.4, 0.4) * args.hfov,
+        rng.uniform(-0.4, 0.4) * args.vfov,
+        (speed * math.cos(angle), speed * math.sin(angle))
+    )
+    camera = SyntheticCamera(clock, turret, bird, true_model, args.width, args.height, args.capture_time)
+    detector = BlobDetector(clock, rng, args.cv_latency, args.pixel_noise, args.miss_rate)
+
+    # The initial detection, as the patrol loop would deliver it
+    detections = await detector.detect(await camera.capture())
+    if not detections:
+        return None
+    bbox = detections[0]["bbox"]
+
+    shot = {}
+
+    async def fire():
+        bird_rotation, bird_tilt = bird.position()
+        shot["error"] = math.hypot(bird_rotation - turret.rotation, bird_tilt - turret.tilt)
+
+    controller = AimController(
+        turret.move, camera.capture, detector.detect, fire, assumed_model,
+        max_refinements=max_refinements, tolerance_deg=args.tolerance,
+        time_budget=args.time_budget, clock=clock
+    )
+    offset = assumed_model.bbox_to_angles(bbox, args.width, args.height)
+    report = await controller.aim_and_fire((turret.rotation, turret.tilt), offset, max(bbox["width"], bbox["height"]))
+    return {
+        "error": shot["error"],
+        "hit": shot["error"] <= args.hit_radius,
+        "time_to_shot": report["time_to_shot"],
+        "refinements": len(report["refinements"])
+    }
+
+
+def summarize(results):
+    results = [r for r in results if r is not None]
+    if not results:
+        return {"trials": 0}
+    errors = np.array([r["error"] for r in results])
+    times = np.array([r["time_to_shot"] for r in results])
+    return {
+        "trials": len(results),
+        "hit_rate": round(float(np.mean([r["hit"] for r in results])), 3),
+        "error_deg_p50": round(float(np.percentile(errors, 50)), 2),
+        "error_deg_p95": round(float(np.percentile(errors, 95)), 2),
+        "time_to_shot_p50": round(float(np.percentile(times, 50)), 2),
+        "time_to_shot_p95": round(float(np.percentile(times, 95)), 2),
+        "time_to_shot_max": round(float(times.max()), 2),
+        "mean_refinements": round(float(np.mean([r["refinements"] for r in results])), 2)
+    }
+
+
+async def run(args):
+    report = {"config": vars(args), "modes": {}}
+    for name, refinements in (("open_loop", 0), ("closed_loop", args.max_refinements)):
+        results = [await run_trial(args, args.seed + i, refinements) for i in range(args.trials)]
+        report["modes"][name] = summarize(results)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate open- vs closed-loop aiming")
+    parser.add_argument('--trials', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--hfov', type=float, default=60.0, help="True horizontal FOV (deg)")
+    parser.add_argument('--vfov', type=float, default=34.0, help="True vertical FOV (deg)")
+    parser.add_argument('--k1', type=float, default=0.0, help="True radial distortion of the lens")
+    parser.add_argument('--fov-error', type=float, default=0.1, help="Relative error of the assumed FOV")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--bird-speed', type=float, default=0.0, help="Max bird speed (deg/s)")
+    parser.add_argument('--pan-speed', type=float, default=60.0)
+    parser.add_argument('--tilt-speed', type=float, default=30.0)
+    parser.add_argument('--settle-time', type=float, default=0.5)
+    parser.add_argument('--capture-time', type=float, default=0.15)
+    parser.add_argument('--cv-latency', type=float, default=0.1)
+    parser.add_argument('--pixel-noise', type=float, default=2.0)
+    parser.add_argument('--miss-rate', type=float, default=0.05, help="Chance the detector misses the bird")
+    parser.add_argument('--max-refinements', type=int, default=2)
+    parser.add_argument('--tolerance', type=float, default=1.0, help="Residual (deg) below which no correction is made")
+    parser.add_argument('--time-budget', type=float, default=4.0)
+    parser.add_argument('--hit-radius', type=float, default=1.5, help="Aim error (deg) that still counts as a hit")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for name, summary in report["modes"].items():
+        print(f"{name:12} hit rate={summary.get('hit_rate')}  error p50={summary.get('error_deg_p50')}° "
+              f"p95={summary.get('error_deg_p95')}°  time to shot p50={summary.get('time_to_shot_p50')}s "
+              f"max={summary.get('time_to_shot_max')}s  refinements={summary.get('mean_refinements')}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Minimal in-process MQTT broker stand-in.
+
+Speaks enough MQTT 3.1.1 for paho clients (CONNECT, PUBLISH with QoS 0/1,
+SUBSCRIBE, UNSUBSCRIBE, PINGREQ, DISCONNECT) and lets in-process code
+subscribe and publish directly, so simulated turrets don't need their
+own MQTT connections. No retained messages, no persistence, no auth.
+"""
+
+import asyncio
+import logging
+import struct
+
+logger = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQTT wildcard matching for '+' and '#'"""
+    pattern_parts = pattern.split('/')
+    topic_parts = topic.split('/')
+    for i, part in enumerate(pattern_parts):
+        if part == '#':
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != '+' and part != topic_parts[i]:
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+def encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        encoded.append(byte)
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(value: bytes) -> bytes:
+    return struct.pack('!H', len(value)) + value
+
+
+def publish_packet(topic: str, payload: bytes) -> bytes:
+    body = encode_string(topic.encode()) + payload
+    return bytes([PUBLISH << 4]) + encode_length(len(body)) + body
+
+
+class MqttSession:
+
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.subscriptions = set()
+
+    async def read_packet(self):
+        header = await self.reader.readexactly(1)
+        multiplier, length = 1, 0
+        while True:
+            byte = (await self.reader.readexactly(1))[0]
+            length += (byte & 0x7F) * multiplier
+            if not byte & 0x80:
+                break
+            multiplier *= 128
+        body = await self.reader.readexactly(length) if length else b''
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    def send(self, data: bytes):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    async def run(self):
+        try:
+            while True:
+                packet_type, flags, body = await self.read_packet()
+                if packet_type == CONNECT:
+                    self.send(bytes([CONNACK << 4, 2, 0, 0]))
+                elif packet_type == PUBLISH:
+                    self.handle_publish(flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self.handle_subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.handle_unsubscribe(body)
+                elif packet_type == PINGREQ:
+                    self.send(bytes([PINGRESP << 4, 0]))
+                elif packet_type == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.broker.sessions.discard(self)
+            self.writer.close()
+
+    def handle_publish(self, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic_length = struct.unpack('!H', body[:2])[0]
+        topic = body[2:2 + topic_length].decode()
+        offset = 2 + topic_length
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            self.send(bytes([PUBACK << 4, 2]) + packet_id)
+        self.broker.publish(topic, body[offset:])
+
+    def handle_subscribe(self, body):
+        packet_id, offset, granted = body[:2], 2, bytearray()
+        while offset < len(body):
+            length = struct.unpack('!H', body[offset:offset + 2])[0]
+            self.subscriptions.add(body[offset + 2:offset + 2 + length].decode())
+            offset += 2 + length + 1  # skip requested QoS
+            granted.append(0)
+        self.send(bytes([SUBACK << 4]) + encode_length(2 + len(granted)) + packet_id + bytes(granted))
+
+    def handle_unsubscribe(self, body):
+        packet_id, offset = body[:2], 2
+        while offset < len(body):
+            length = struct.unpack('!H', body[offset:offset + 2])[0]
+            self.subscriptions.discard(body[offset + 2:offset + 2 + length].decode())
+            offset += 2 + length
+        self.send(bytes([UNSUBACK << 4, 2]) + packet_id)
+
+
+class MqttBroker:
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.sessions = set()
+        self.local_subscriptions = []  # (pattern, callback(topic, payload))
+        self.server = None
+        self.messages = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"MQTT broker stand-in listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for session in list(self.sessions):
+            session.writer.close()
+
+    async def handle_client(self, reader, writer):
+        session = MqttSession(self, reader, writer)
+        self.sessions.add(session)
+        await session.run()
+
+    def subscribe(self, pattern: str, callback):
+        """Subscribe in-process code; callback(topic, payload) runs on the event loop"""
+        self.local_subscriptions.append((pattern, callback))
+
+    def publish(self, topic: str, payload):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.messages += 1
+
+        packet = None
+        for session in list(self.sessions):
+            if any(topic_matches(pattern, topic) for pattern in session.subscriptions):
+                packet = packet or publish_packet(topic, payload)
+                session.send(packet)
+
+        for pattern, callback in self.local_subscriptions:
+            if topic_matches(pattern, topic):
+                callback(topic, payload)
@@ -0,0 +1,63 @@
+"""
+Simulated device fleet: device documents as the API returns them, plus
+synthetic local-image frames for their cameras.
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+OWNER_ID = 'loadtest-user'
+
+
+def device_ip(index: int) -> str:
+    return f"10.77.{index // 250}.{index % 250 + 1}"
+
+
+def write_frames(directory: str, count: int, width: int = 1280, height: int = 720, seed: int = 0):
+    """Write synthetic camera frames (gray sky with a few blobs) and return their paths"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for index in range(count):
+        frame = np.full((height, width, 3), (200, 170, 140), dtype=np.uint8)
+        noise = rng.integers(-15, 15, size=(height, width, 3), dtype=np.int16)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        for _ in range(int(rng.integers(1, 4))):
+            center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+            axes = (int(rng.integers(10, 40)), int(rng.integers(8, 25)))
+            cv2.ellipse(frame, center, axes, 0, 0, 360, (60, 60, 70), -1)
+
+        path = os.path.join(directory, f"frame_{index:04d}.jpg")
+        cv2.imwrite(path, frame)
+        paths.append(path)
+    return paths
+
+
+def make_device(index: int, image_path: str, route_points: int = 4) -> dict:
+    coordinates = [
+        {'rotation': int(360 * point / route_points) % 360, 'tilt': 10 + 5 * (point % 3), 'zoom': 1.0}
+        for point in range(route_points)
+    ]
+    return {
+        '_id': f"loadtest-{index:04d}",
+        'deviceId': f"loadtest-{index:04d}",
+        'name': f"Loadtest {index}",
+        'owner': OWNER_ID,
+        'status': 'online',
+        'monitorStatus': 'running',
+        'taubenschiesser': {'ip': device_ip(index)},
+        'camera': {
+            'useLocalImage': True,
+            'localImagePath': image_path,
+            'tapo': {'stream': 'stream1'}
+        },
+        'actions': {
+            'mode': 'route',
+            'route': {'coordinates': coordinates}
+        }
+    }
+
+
+def make_fleet(size: int, frame_paths, route_points: int = 4):
+    return [make_device(index, frame_paths[index % len(frame_paths)], route_points) for index in range(size)]
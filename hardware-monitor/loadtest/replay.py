@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Replay a recorded monitor session (RECORD_PATH, see recorder.py) offline.
+
+A real HardwareMonitor runs against local stand-ins fed from the
+recording: the API stub serves the recorded device lists, the broker
+stand-in plays the turrets - after the monitor's n-th command to a
+device it publishes the status messages recorded after the n-th
+recorded command, at the recorded delays (messages before the first
+command at their recorded offsets) - the CV stub answers with the recorded responses (matched to the
+analysed frame by perceptual hash, recorded latency included),
+camera captures return the recorded frames per source in order and
+camera stabilization takes as long as it did when recorded.
+
+--fast runs the event loop on a virtual clock that jumps over idle
+waits (patrol sleeps, movement timeouts, stub latencies), so an hour of
+recording replays in seconds with the same timing as seen by the
+monitor. Without it the replay runs at 1x wall-clock speed.
+
+The report lists the commands the monitor published plus the cycle and
+detection-latency figures of loadtest.run; --expect compares the command
+sequence against an earlier report for regression testing.
+
+Usage (from hardware-monitor/):
+    RECORD_PATH=session.tbox python main.py          # record
+    python -m loadtest.replay session.tbox --fast --output replay.json
+    python -m loadtest.replay session.tbox --fast --expect replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+from aiohttp import web
+
+from loadtest import stubs
+from loadtest.broker import MqttBroker
+from loadtest.run import step_report
+from loadtest.stubs import ApiStub, start_site
+from recorder import perceptual_hash, read_recording
+
+logger = logging.getLogger('loadtest.replay')
+
+# Hamming distance up to which a frame counts as the recorded one
+MATCH_DISTANCE = 6
+
+
+class IdleSkippingSelector:
+    """Selector proxy: after `idle` seconds without I/O, jump the loop clock to the next timer"""
+
+    def __init__(self, selector, loop):
+        self.selector = selector
+        self.loop = loop
+
+    def select(self, timeout=None):
+        loop = self.loop
+        if loop.busy or (timeout is not None and timeout <= loop.idle):
+            return self.selector.select(timeout)
+        events = self.selector.select(loop.idle)
+        if events:
+            return events
+        if timeout is None:
+            return self.selector.select(None)
+        loop.offset += timeout - loop.idle
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+
+class FastForwardLoop(asyncio.SelectorEventLoop):
+    """Event loop on a virtual clock that skips idle time
+
+    Waits are skipped only while no executor job is running and nothing
+    arrived for `idle` real seconds, so local I/O (stubs, broker, MQTT
+    client thread) still completes before timeouts are reached.
+    """
+
+    def __init__(self, idle=0.05):
+        super().__init__()
+        self.idle = idle
+        self.offset = 0.0
+        self.busy = 0
+        self._selector = IdleSkippingSelector(self._selector, self)
+
+    def time(self):
+        return super().time() + self.offset
+
+    def run_in_executor(self, executor, func, *args):
+        future = super().run_in_executor(executor, func, *args)
+        self.busy += 1
+        future.add_done_callback(self.executor_done)
+        return future
+
+    def executor_done(self, _):
+        self.busy -= 1
+
+
+class VirtualTime:
+    """Stand-in for the time module in replayed modules, following the loop clock"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.base = time.time() - loop.time()
+
+    def time(self):
+        return self.base + self.loop.time()
+
+    def monotonic(self):
+        return self.loop.time()
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+def virtual_datetime(clock):
+    class VirtualDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.fromtimestamp(clock.time(), tz)
+    return VirtualDatetime
+
+
+class Recording:
+    """A recording split by kind, with times relative to the monitor start"""
+
+    def __init__(self, path):
+        records = read_recording(path)
+        if not records:
+            raise ValueError(f"{path} contains no records")
+        start = next((m["t"] for m, _ in records if m["kind"] == 'start'), records[0][0]["t"])
+
+        self.devices = []    # (offset, devices)
+        self.mqtt = []       # (offset, topic, payload) before a device's first command
+        self.replies = defaultdict(list)  # device ip -> per command [(delay, topic, payload)]
+        self.frames = defaultdict(deque)   # source -> jpeg bytes
+        self.bursts = defaultdict(deque)   # source -> (timestamps, [jpeg bytes])
+        self.stabilizations = defaultdict(deque)  # source -> stabilizer reports
+        self.cv = []         # recorded CV responses in order
+        last_command = {}
+        for metadata, blobs in records:
+            offset = metadata["t"] - start
+            kind = metadata["kind"]
+            if kind == 'devices':
+                self.devices.append((offset, metadata["devices"]))
+            elif kind == 'command':
+                self.replies[metadata["topic"].split('/')[1]].append([])
+                last_command[metadata["topic"].split('/')[1]] = offset
+            elif kind == 'mqtt':
+                ip = status_device(metadata["topic"], blobs[0])
+                if ip in last_command:
+                    self.replies[ip][-1].append((offset - last_command[ip], metadata["topic"], blobs[0]))
+                else:
+                    self.mqtt.append((offset, metadata["topic"], blobs[0]))
+            elif kind == 'frame':
+                self.frames[metadata["source"]].append(blobs[0])
+            elif kind == 'burst':
+                self.bursts[metadata["source"]].append((metadata["timestamps"], blobs))
+            elif kind == 'stabilize':
+                self.stabilizations[metadata["source"]].append(metadata)
+            elif kind == 'cv':
+                self.cv.append({**metadata, "used": False})
+        self.duration = records[-1][0]["t"] - start
+
+    def next_frame(self, source):
+        """Next recorded frame of a source; the last one repeats once they run out"""
+        frames = self.frames.get(source)
+        if not frames:
+            return None
+        return frames.popleft() if len(frames) > 1 else frames[0]
+
+    def next_stabilization(self, source):
+        """Next recorded stabilization report of a source, None if there are no more"""
+        reports = self.stabilizations.get(source)
+        return reports.popleft() if reports else None
+
+    def next_burst(self, source):
+        bursts = self.bursts.get(source)
+        return bursts.popleft() if bursts else ([], [])
+
+
+def status_device(topic, payload):
+    """Device IP of a status message: taubenschiesser/{ip}/info or the payload of taubenschiesser/info"""
+    parts = topic.split('/')
+    if len(parts) == 3:
+        return parts[1]
+    try:
+        return json.loads(payload).get('ip')
+    except ValueError:
+        return None
+
+
+def decode(jpeg):
+    return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+class ReplayCvStub:
+    """Answers with recorded CV responses, matched by perceptual hash of the frame"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = 0
+        self.traced = 0  # requests carrying a traceparent header
+        self.matched = 0
+        self.unmatched = 0
+        self.max_in_flight = 0
+        self.in_flight = 0
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/detect_birds_optimized', self.detect_birds_optimized)
+        self.app.router.add_get('/ready', self.ready)
+
+    async def ready(self, request):
+        return web.json_response({'ready': True})
+
+    def pick(self, dhash):
+        unused = [r for r in self.responses if not r["used"]]
+        # The earliest unused response for this frame keeps the recorded order per scene
+        for response in unused:
+            if hamming_distance(response["dhash"], dhash) <= MATCH_DISTANCE:
+                self.matched += 1
+                return response
+        self.unmatched += 1
+        if unused:
+            return unused[0]
+        return self.responses[-1] if self.responses else None
+
+    async def detect_birds_optimized(self, request):
+        self.requests += 1
+        self.traced += 'traceparent' in request.headers
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            data = await request.post()
+            upload = data.get('file')
+            image = decode(upload.file.read()) if upload is not None else None
+            response = self.pick(perceptual_hash(image)) if image is not None else None
+            if response is None:
+                return web.json_response({'detail': 'No recorded CV response'}, status=500)
+            response["used"] = True
+            await asyncio.sleep(response["latency"])
+            if response["status"] != 200:
+                return web.json_response({'detail': 'Recorded failure'}, status=response["status"])
+            return web.json_response(response["result"])
+        finally:
+            self.in_flight -= 1
+
+
+def make_monitor_class(recording):
+    import main
+
+    class ReplayMonitor(main.HardwareMonitor):
+        """HardwareMonitor whose cameras return the recorded frames"""
+
+        async def capture_frame(self, rtsp_url):
+            jpeg = recording.next_frame(main.source_key(rtsp_url))
+            if jpeg is None:
+                return None
+            return await asyncio.get_running_loop().run_in_executor(None, decode, jpeg)
+
+        async def capture_frames(self, rtsp_url, count, interval):
+            timestamps, jpegs = recording.next_burst(main.source_key(rtsp_url))
+            frames = await asyncio.get_running_loop().run_in_executor(None, lambda: [decode(j) for j in jpegs])
+            now = main.time.time()
+            return [(now + t - timestamps[0], frame) for t, frame in zip(timestamps, frames)][:count]
+
+        def open_camera_stream(self, device):
+            pass
+
+        async def measure_stability(self, device_ip, rtsp_url):
+            report = recording.next_stabilization(main.source_key(rtsp_url))
+            if report is None:
+                # Recorded before stabilization was measured: the old fixed wait
+                report = {'stable': False, 'waited': self.stabilizer.timeout, 'bound': self.stabilizer.timeout,
+                          'frames': 0, 'motion': None, 'sharpness': None}
+            await asyncio.sleep(report['waited'])
+            return report
+
+        async def load_local_image(self, image_path, consumer=None):
+            jpeg = recording.next_frame(main.source_key(image_path, consumer))
+            if jpeg is None:
+                return None
+            return await asyncio.get_running_loop().run_in_executor(None, decode, jpeg)
+
+    return main, ReplayMonitor
+
+
+async def replay(args):
+    loop = asyncio.get_running_loop()
+    recording = Recording(args.recording)
+    if not recording.devices:
+        raise ValueError("Recording has no device list - record at least one control loop pass")
+
+    if args.fast:
+        # Everything the monitor and the stubs timestamp follows the virtual clock
+        import main
+        import patrol
+        clock = VirtualTime(loop)
+        for module in (main, patrol, stubs):
+            module.time = clock
+        main.datetime = virtual_datetime(clock)
+
+    broker = MqttBroker()
+    await broker.start()
+    commands = []
+    sent = defaultdict(int)
+    start = loop.time()
+
+    def on_command(topic, payload):
+        commands.append({"t": round(loop.time() - start, 2), "topic": topic, "command": json.loads(payload)})
+        ip = topic.split('/')[1]
+        index = sent[ip]
+        sent[ip] += 1
+        replies = recording.replies.get(ip, [])
+        if index < len(replies):
+            for delay, reply_topic, reply_payload in replies[index]:
+                loop.call_later(delay, broker.publish, reply_topic, reply_payload)
+
+    broker.subscribe('taubenschiesser/+', on_command)
+
+    api = ApiStub(recording.devices[0][1], {
+        'enabled': True, 'broker': broker.host, 'port': broker.port, 'username': '', 'password': ''
+    })
+    cv = ReplayCvStub(recording.cv)
+    runners = []
+    runner, api_url = await start_site(api.app)
+    runners.append(runner)
+    runner, cv_url = await start_site(cv.app)
+    runners.append(runner)
+
+    def set_devices(devices):
+        api.devices = devices
+        api.active_devices = len(devices)
+
+    for offset, devices in recording.devices[1:]:
+        loop.call_at(start + offset, set_devices, devices)
+    for offset, topic, payload in recording.mqtt:
+        loop.call_at(start + offset, broker.publish, topic, payload)
+
+    os.environ.pop('RECORD_PATH', None)
+    os.environ['API_URL'] = api_url
+    os.environ['CV_SERVICE_URL'] = cv_url
+    os.environ['OUTBOX_DIR'] = tempfile.mkdtemp(prefix='replay-outbox-')
+    main, ReplayMonitor = make_monitor_class(recording)
+    monitor = ReplayMonitor()
+
+    wall_start = time.time()
+    report_start = stubs.time.time()
+    monitor_task = asyncio.create_task(monitor.start())
+    try:
+        await asyncio.sleep(recording.duration + args.tail)
+    finally:
+        monitor_task.cancel()
+        await asyncio.gather(monitor_task, return_exceptions=True)
+        for client in monitor.mqtt_clients.values():
+            client.loop_stop()
+            client.disconnect()
+        await broker.stop()
+        for runner in runners:
+            await runner.cleanup()
+
+    report = step_report(api, cv, [], len(api.devices), report_start, stubs.time.time(), {})
+    return {
+        "recording": args.recording,
+        "mode": "fast" if args.fast else "1x",
+        "recorded_duration": round(recording.duration, 1),
+        "wall_time": round(time.time() - wall_start, 1),
+        "cv": {"requests": cv.requests, "matched": cv.matched, "unmatched": cv.unmatched},
+        "commands": commands,
+        **{k: report[k] for k in ("cycle_time_s", "detection_latency_s", "events", "event_types", "detections_saved")}
+    }
+
+
+def command_key(command):
+    return command["topic"], json.dumps(command["command"], sort_keys=True)
+
+
+def compare(expected, actual):
+    """First difference between two command sequences, or None"""
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        if command_key(a) != command_key(b):
+            return f"command #{index + 1} differs: expected {a['command']} on {a['topic']} at {a['t']}s, " \
+                   f"got {b['command']} on {b['topic']} at {b['t']}s"
+    if len(expected) != len(actual):
+        return f"expected {len(expected)} commands, got {len(actual)}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded hardware-monitor session against local stubs")
+    parser.add_argument('recording', help="Recording file written with RECORD_PATH")
+    parser.add_argument('--fast', action='store_true', help="Skip idle time on a virtual clock instead of 1x wall clock")
+    parser.add_argument('--tail', type=float, default=5.0, help="Seconds to keep running after the last record")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--expect', help="Earlier report whose command sequence must be reproduced")
+    parser.add_argument('--verbose', action='store_true', help="Keep hardware-monitor's info logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        logging.getLogger('main').setLevel(logging.WARNING)
+
+    if args.fast:
+        loop = FastForwardLoop()
+        asyncio.set_event_loop(loop)
+        try:
+            report = loop.run_until_complete(replay(args))
+        finally:
+            loop.close()
+    else:
+        report = asyncio.run(replay(args))
+
+    latency = report["detection_latency_s"]
+    print(f"replayed {report['recorded_duration']}s in {report['wall_time']}s ({report['mode']}): "
+          f"{len(report['commands'])} commands, {report['cv']['requests']} CV requests "
+          f"({report['cv']['unmatched']} unmatched), cv latency p50={latency['p50']} p95={latency['p95']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+    if args.expect:
+        with open(args.expect) as f:
+            expected = json.load(f)
+        difference = compare(expected["commands"], report["commands"])
+        if difference:
+            print(f"Replay diverged: {difference}", file=sys.stderr)
+            sys.exit(1)
+        print("Command sequence matches", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Load generator / soak test for the hardware-monitor <-> cv-service pipeline.
+
+Runs a real HardwareMonitor against local stand-ins: an MQTT broker with
+N simulated turrets, a stub of the Node API endpoints and either the
+real cv-service or a CV stub with fixed latency. Devices use local-image
+cameras pointing at generated frames. The fleet grows step by step
+and each step reports patrol cycle time, detection latency and event
+throughput, so you can see where cycles start slipping. With --trace the
+monitor exports its patrol cycle spans to a collector stand-in and each
+step also breaks the cycle down by span.
+
+Usage (from hardware-monitor/):
+    python -m loadtest.run --fleet 1,4,16 --step-duration 120
+    python -m loadtest.run --fleet 1,8 --cv-url http://localhost:8000 --output soak.json
+    python -m loadtest.run --fleet 1,4 --trace
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from loadtest.broker import MqttBroker
+from loadtest.fleet import device_ip, make_fleet, write_frames
+from loadtest.stubs import ApiStub, CollectorStub, CvStub, start_site
+from loadtest.turret import SimulatedTurret
+
+logger = logging.getLogger('loadtest')
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    array = np.array(values)
+    return {
+        "count": len(values),
+        "p50": round(float(np.percentile(array, 50)), 3),
+        "p95": round(float(np.percentile(array, 95)), 3),
+        "max": round(float(array.max()), 3)
+    }
+
+
+def span_report(collector: CollectorStub, start: float, end: float):
+    """Duration percentiles per span name, for spans started within the step"""
+    durations = defaultdict(list)
+    for span_start, _, name, duration, _ in collector.spans:
+        if start <= span_start < end:
+            durations[name].append(duration)
+    return {name: percentiles(values) for name, values in sorted(durations.items())}
+
+
+def step_report(api: ApiStub, cv: CvStub, turrets, fleet_size: int, start: float, end: float, request_counts,
+                collector: CollectorStub = None):
+    """Compute cycle time, detection latency and throughput for one fleet step"""
+    events = [e for e in api.events if start <= e[0] < end]
+    duration = end - start
+
+    moves = defaultdict(list)
+    analyzing = {}
+    detection_latencies = []
+    for timestamp, device_id, event_type, _ in events:
+        if event_type == 'device_moving':
+            moves[device_id].append(timestamp)
+        elif event_type == 'analyzing':
+            analyzing[device_id] = timestamp
+        elif event_type in ('cv_analysis_complete', 'error') and device_id in analyzing:
+            detection_latencies.append(timestamp - analyzing.pop(device_id))
+
+    # Cycle time: time between two consecutive patrol moves of the same device
+    cycle_times = []
+    for timestamps in moves.values():
+        cycle_times.extend(b - a for a, b in zip(timestamps, timestamps[1:]))
+
+    event_types = defaultdict(int)
+    for _, _, event_type, _ in events:
+        event_types[event_type] += 1
+
+    saved = [d for d in api.detections if start <= d[0] < end]
+    requests = {name: count - request_counts.get(name, 0) for name, count in api.requests.items()}
+
+    return {
+        "fleet_size": fleet_size,
+        "duration": round(duration, 1),
+        "devices_moved": len(moves),
+        "cycle_time_s": percentiles(cycle_times),
+        "detection_latency_s": percentiles(detection_latencies),
+        "events": len(events),
+        "events_per_s": round(len(events) / duration, 2),
+        "event_types": dict(event_types),
+        "detections_saved": len(saved),
+        "detection_payload_bytes": sum(d[2] for d in saved),
+        "api_requests": requests,
+        "api_requests_per_s": round(sum(requests.values()) / duration, 2),
+        "cv_max_in_flight": cv.max_in_flight if cv else None,
+        "cv_traced_requests": cv.traced if cv else None,
+        "spans_s": span_report(collector, start, end) if collector else None,
+        "turret_moves": sum(t.moves for t in turrets[:fleet_size]),
+        "turret_shots": sum(t.shots for t in turrets[:fleet_size])
+    }
+
+
+def print_step(report):
+    cycle = report["cycle_time_s"]
+    latency = report["detection_latency_s"]
+    fmt = lambda v: f"{v:.2f}s" if v is not None else "-"
+    print(f"fleet={report['fleet_size']:>4}  moved={report['devices_moved']:>4}  "
+          f"cycle p50={fmt(cycle['p50'])} p95={fmt(cycle['p95'])}  "
+          f"cv latency p50={fmt(latency['p50'])} p95={fmt(latency['p95'])}  "
+          f"events/s={report['events_per_s']}  api req/s={report['api_requests_per_s']}")
+    for name, stats in (report.get("spans_s") or {}).items():
+        print(f"    {name:<14} n={stats['count']:<5} p50={fmt(stats['p50'])} p95={fmt(stats['p95'])}")
+
+
+async def run(args):
+    max_fleet = max(args.fleet)
+    frame_dir = tempfile.mkdtemp(prefix='loadtest-frames-')
+    frame_paths = write_frames(frame_dir, min(max_fleet, 16), *args.frame_size)
+    devices = make_fleet(max_fleet, frame_paths, args.route_points)
+
+    broker = MqttBroker()
+    await broker.start()
+    turrets = [SimulatedTurret(broker, device_ip(i), args.pan_speed, args.tilt_speed, heartbeat=args.heartbeat)
+               for i in range(max_fleet)]
+
+    api = ApiStub(devices, {
+        'enabled': True, 'broker': broker.host, 'port': broker.port, 'username': '', 'password': ''
+    }, latency=args.api_latency)
+    runners = []
+    runner, api_url = await start_site(api.app)
+    runners.append(runner)
+
+    cv = None
+    cv_url = args.cv_url
+    if not cv_url:
+        cv = CvStub(args.cv_latency, args.bird_probability, max_birds=args.max_birds)
+        runner, cv_url = await start_site(cv.app)
+        runners.append(runner)
+
+    collector = None
+    if args.trace:
+        collector = CollectorStub()
+        runner, os.environ['TRACE_OTLP_URL'] = await start_site(collector.app)
+        runners.append(runner)
+
+    os.environ['API_URL'] = api_url
+    os.environ['CV_SERVICE_URL'] = cv_url
+    # Fake detections must never reach the real outbox (and from there the real API)
+    os.environ['OUTBOX_DIR'] = tempfile.mkdtemp(prefix='loadtest-outbox-')
+    from main import HardwareMonitor
+    monitor = HardwareMonitor()
+    monitor_task = asyncio.create_task(monitor.start())
+
+    steps = []
+    active = 0
+    try:
+        for fleet_size in args.fleet:
+            for turret in turrets[active:fleet_size]:
+                turret.start()
+            active = max(active, fleet_size)
+            api.active_devices = fleet_size
+            if cv:
+                cv.max_in_flight = 0
+                cv.traced = 0
+
+            request_counts = dict(api.requests)
+            start = time.time()
+            await asyncio.sleep(args.step_duration)
+            report = step_report(api, cv, turrets, fleet_size, start, time.time(), request_counts, collector)
+            steps.append(report)
+            print_step(report)
+    finally:
+        monitor_task.cancel()
+        for client in monitor.mqtt_clients.values():
+            client.loop_stop()
+            client.disconnect()
+        for turret in turrets:
+            turret.stop()
+        await broker.stop()
+        for runner in runners:
+            await runner.cleanup()
+
+    # A step slips when its cycle time is clearly above the single smallest fleet's
+    baseline = steps[0]["cycle_time_s"]["p50"] if steps else None
+    for report in steps:
+        p50 = report["cycle_time_s"]["p50"]
+        report["cycle_slip"] = round(p50 / baseline, 2) if baseline and p50 else None
+
+    return {
+        "config": {
+            "fleet": args.fleet,
+            "step_duration": args.step_duration,
+            "cv": args.cv_url or f"stub ({args.cv_latency}s, p(bird)={args.bird_probability})",
+            "api_latency": args.api_latency,
+            "route_points": args.route_points,
+            "frame_size": f"{args.frame_size[0]}x{args.frame_size[1]}"
+        },
+        "steps": steps
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test hardware-monitor with simulated turrets")
+    parser.add_argument('--fleet', type=lambda v: [int(n) for n in v.split(',')], default=[1, 2, 4, 8],
+                        help="Fleet sizes to step through, e.g. 1,4,16")
+    parser.add_argument('--step-duration', type=float, default=120, help="Seconds per fleet size")
+    parser.add_argument('--cv-url', help="Real cv-service URL (default: built-in CV stub)")
+    parser.add_argument('--cv-latency', type=float, default=0.15, help="CV stub latency in seconds")
+    parser.add_argument('--bird-probability', type=float, default=0.2, help="CV stub chance of reporting a bird")
+    parser.add_argument('--max-birds', type=int, default=1, help="CV stub flock size (1..n birds per positive frame)")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="Added latency of the API stub")
+    parser.add_argument('--route-points', type=int, default=4)
+    parser.add_argument('--pan-speed', type=float, default=60.0, help="Simulated pan speed (deg/s)")
+    parser.add_argument('--tilt-speed', type=float, default=30.0, help="Simulated tilt speed (deg/s)")
+    parser.add_argument('--heartbeat', type=float, default=0.0, help="Periodic info messages per turret (s, 0 = off)")
+    parser.add_argument('--frame-size', type=lambda v: tuple(int(n) for n in v.split('x')), default=(1280, 720))
+    parser.add_argument('--trace', action='store_true', help="Collect patrol cycle spans and report them per step")
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--verbose', action='store_true', help="Keep hardware-monitor's info logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if not args.verbose:
+        logging.getLogger('main').setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
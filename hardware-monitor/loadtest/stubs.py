@@ -0,0 +1,168 @@
+"""
+Local stand-ins for the Node API and the CV service.
+
+The API stub serves the endpoints hardware-monitor talks to and records
+every monitor event with a timestamp, which is what the load test
+reports are computed from. The CV stub answers /detect_birds_optimized
+after a configurable latency. The collector stub accepts OTLP/JSON trace
+exports (TRACE_OTLP_URL) and keeps the spans for the per-step breakdown.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+async def start_site(app: web.Application, host: str = '127.0.0.1', port: int = 0):
+    """Run an aiohttp app in the current loop, return (runner, base url)"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+class ApiStub:
+
+    def __init__(self, devices, mqtt_settings, latency: float = 0.0):
+        self.devices = devices
+        self.active_devices = len(devices)
+        self.mqtt_settings = mqtt_settings
+        self.latency = latency
+
+        self.events = []      # (timestamp, device_id, event_type, data)
+        self.detections = []  # (timestamp, device_id, payload bytes)
+        self.requests = Counter()
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_get('/api/devices', self.get_devices)
+        self.app.router.add_put('/api/devices/{device_id}', self.update_device)
+        self.app.router.add_post('/api/devices/{device_id}/status', self.update_status)
+        self.app.router.add_get('/api/users/{user_id}/settings', self.get_user_settings)
+        self.app.router.add_post('/api/hardware/monitor-event', self.monitor_event)
+        self.app.router.add_post('/api/hardware/detection', self.detection)
+        self.app.router.add_post('/api/cv/detect', self.cv_detect)
+
+    async def handle(self, name):
+        self.requests[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def health(self, request):
+        return web.json_response({'status': 'ok'})
+
+    async def get_devices(self, request):
+        await self.handle('GET /api/devices')
+        return web.json_response(self.devices[:self.active_devices])
+
+    async def update_device(self, request):
+        await self.handle('PUT /api/devices/:id')
+        return web.json_response({})
+
+    async def update_status(self, request):
+        await self.handle('POST /api/devices/:id/status')
+        return web.json_response({})
+
+    async def get_user_settings(self, request):
+        await self.handle('GET /api/users/:id/settings')
+        return web.json_response({'settings': {'mqtt': self.mqtt_settings}})
+
+    async def monitor_event(self, request):
+        await self.handle('POST /api/hardware/monitor-event')
+        event = await request.json()
+        self.events.append((time.time(), event.get('deviceId'), event.get('eventType'), event.get('data', {})))
+        return web.json_response({'success': True})
+
+    async def detection(self, request):
+        await self.handle('POST /api/hardware/detection')
+        body = await request.read()
+        detection = json.loads(body)
+        self.detections.append((time.time(), detection.get('deviceId'), len(body)))
+        return web.json_response({'success': True, 'detection_count': 1})
+
+    async def cv_detect(self, request):
+        await self.handle('POST /api/cv/detect')
+        await request.read()
+        return web.json_response({'detections': []})
+
+
+class CvStub:
+
+    def __init__(self, latency: float = 0.15, bird_probability: float = 0.2, seed: int = 0, max_birds: int = 1):
+        self.latency = latency
+        self.bird_probability = bird_probability
+        self.max_birds = max_birds
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.traced = 0  # requests carrying a traceparent header
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/detect_birds_optimized', self.detect_birds_optimized)
+        self.app.router.add_get('/ready', self.ready)
+
+    async def ready(self, request):
+        return web.json_response({'ready': True})
+
+    async def detect_birds_optimized(self, request):
+        self.requests += 1
+        self.traced += 'traceparent' in request.headers
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            start = time.time()
+            await request.read()
+            await asyncio.sleep(self.latency)
+
+            detections = []
+            if self.random.random() < self.bird_probability:
+                for _ in range(self.random.randint(1, self.max_birds)):
+                    x, y = self.random.uniform(0, 1100), self.random.uniform(0, 600)
+                    detections.append({
+                        'class': 'bird',
+                        'confidence': round(self.random.uniform(0.4, 0.95), 2),
+                        'position': {'center_x': x + 40, 'center_y': y + 30, 'width': 80, 'height': 60},
+                        'bbox': {'x': x, 'y': y, 'width': 80, 'height': 60}
+                    })
+
+            return web.json_response({
+                'success': True,
+                'birds_found': bool(detections),
+                'bird_count': len(detections),
+                'should_activate_taubenschiesser': bool(detections),
+                'confidence_level': max((d['confidence'] for d in detections), default=0.0),
+                'detections': detections,
+                'processing_time': time.time() - start,
+                'timestamp': time.time(),
+                'service': 'cv-stub'
+            }, headers={'Server-Timing': f"app;dur={(time.time() - start) * 1000:.1f}"})
+        finally:
+            self.in_flight -= 1
+
+
+class CollectorStub:
+    """OpenTelemetry collector stand-in: receives OTLP/JSON spans on /v1/traces"""
+
+    def __init__(self):
+        self.spans = []  # (start, trace_id, name, duration in s, attributes)
+
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self.app.router.add_post('/v1/traces', self.traces)
+
+    async def traces(self, request):
+        body = await request.json()
+        for resource_spans in body.get('resourceSpans', []):
+            for scope_spans in resource_spans.get('scopeSpans', []):
+                for span in scope_spans.get('spans', []):
+                    start = int(span['startTimeUnixNano'])
+                    attributes = {a['key']: next(iter(a['value'].values())) for a in span.get('attributes', [])}
+                    self.spans.append((start / 1e9, span['traceId'], span['name'],
+                                       (int(span['endTimeUnixNano']) - start) / 1e9, attributes))
+        return web.json_response({})
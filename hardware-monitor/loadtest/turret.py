@@ -0,0 +1,99 @@
+"""
+Simulated Taubenschiesser turret.
+
+Listens for commands on taubenschiesser/{ip} through the broker stand-in
+and reports its state on taubenschiesser/{ip}/info like the ESP32
+firmware does: once when a movement starts and once when it is done.
+Travel time follows a simple pan/tilt speed model.
+"""
+
+import asyncio
+import json
+import time
+
+
+class SimulatedTurret:
+
+    def __init__(self, broker, ip: str, pan_speed: float = 60.0, tilt_speed: float = 30.0,
+                 settle_time: float = 0.2, heartbeat: float = 0.0):
+        self.broker = broker
+        self.ip = ip
+        self.pan_speed = pan_speed    # degrees per second
+        self.tilt_speed = tilt_speed  # degrees per second
+        self.settle_time = settle_time
+        self.heartbeat = heartbeat
+
+        self.rotation = 0.0
+        self.tilt = 0.0
+        self.moving = False
+        self.move_task = None
+        self.heartbeat_task = None
+
+        self.commands = 0
+        self.moves = 0
+        self.shots = 0
+        self.last_shot_at = None
+
+    def start(self):
+        self.broker.subscribe(f"taubenschiesser/{self.ip}", self.on_command)
+        if self.heartbeat > 0:
+            self.heartbeat_task = asyncio.get_running_loop().create_task(self.send_heartbeats())
+
+    def stop(self):
+        for task in (self.move_task, self.heartbeat_task):
+            if task:
+                task.cancel()
+
+    def travel_time(self, rotation: float, tilt: float) -> float:
+        pan = abs(rotation - self.rotation) / self.pan_speed
+        tilt_time = abs(tilt - self.tilt) / self.tilt_speed
+        # Both axes move at the same time
+        return max(pan, tilt_time) + self.settle_time
+
+    def on_command(self, topic: str, payload: bytes):
+        try:
+            command = json.loads(payload)
+        except ValueError:
+            return
+        self.commands += 1
+
+        command_type = command.get('type')
+        position = command.get('position', {})
+        if command_type == 'move':
+            self.move_to(float(position.get('rot', self.rotation)), float(position.get('tilt', self.tilt)))
+        elif command_type == 'impulse':
+            self.move_to(self.rotation + float(position.get('rot', 0)), self.tilt + float(position.get('tilt', 0)))
+        elif command_type == 'shoot':
+            self.shots += 1
+            self.last_shot_at = time.time()
+
+    def move_to(self, rotation: float, tilt: float):
+        if self.move_task and not self.move_task.done():
+            self.move_task.cancel()
+        self.moves += 1
+        duration = self.travel_time(rotation, tilt)
+        self.moving = True
+        self.publish_info()
+        self.move_task = asyncio.get_running_loop().create_task(self.finish_move(rotation, tilt, duration))
+
+    async def finish_move(self, rotation: float, tilt: float, duration: float):
+        await asyncio.sleep(duration)
+        self.rotation = rotation
+        self.tilt = tilt
+        self.moving = False
+        self.publish_info()
+
+    async def send_heartbeats(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self.publish_info()
+
+    def publish_info(self):
+        self.broker.publish(f"taubenschiesser/{self.ip}/info", json.dumps({
+            'ip': self.ip,
+            'Rot': round(self.rotation),
+            'Tilt': round(self.tilt),
+            'moving': self.moving,
+            'watertank': True,
+            'Cam': True
+        }))
@@ -0,0 +1,126 @@
+"""
+Local image source for devices with camera.useLocalImage.
+
+Staging and load-test devices read their "camera" frame from disk every
+cycle. Files are memory-mapped and decoded once; the decoded frame is
+cached until the file's mtime or size changes, so an unchanged image
+costs a stat() per cycle. A directory is served as a looping replay:
+each call returns the next image (sorted by name) for that consumer.
+
+Cached frames are shared between callers and marked read-only - copy
+before drawing on them.
+"""
+
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def decode_file(path):
+    """Decode an image through a read-only memory map (no intermediate bytes copy)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            buffer = np.frombuffer(mapped, dtype=np.uint8)
+            try:
+                return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            finally:
+                # Release the buffer export before the map is closed
+                del buffer
+
+
+class LocalImageSource:
+    """Decoded-frame cache (bounded by max_bytes) plus directory replay cursors"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.frames = OrderedDict()  # path -> ((mtime_ns, size), frame)
+        self.cached_bytes = 0
+        self.listings = {}  # directory -> (mtime_ns, [files])
+        self.cursors = {}   # (directory, consumer) -> next index
+        self.stats = {"hits": 0, "decodes": 0}
+
+    def list_directory(self, directory):
+        mtime = os.stat(directory).st_mtime_ns
+        with self.lock:
+            listing = self.listings.get(directory)
+            if listing is not None and listing[0] == mtime:
+                return listing[1]
+        files = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        with self.lock:
+            self.listings[directory] = (mtime, files)
+        return files
+
+    def next_in_directory(self, directory, consumer=None):
+        files = self.list_directory(directory)
+        if not files:
+            return None
+        with self.lock:
+            index = self.cursors.get((directory, consumer), 0) % len(files)
+            self.cursors[(directory, consumer)] = index + 1
+        return files[index]
+
+    def load(self, path, consumer=None):
+        """Frame for a file, or the next frame of a directory replay; None if unreadable
+
+        consumer: replay cursor key, e.g. the device, so devices sharing a
+        directory each walk through all of it.
+        """
+        if os.path.isdir(path):
+            path = self.next_in_directory(path, consumer)
+            if path is None:
+                return None
+
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            cached = self.frames.get(path)
+            if cached is not None and cached[0] == version:
+                self.frames.move_to_end(path)
+                self.stats["hits"] += 1
+                return cached[1]
+
+        frame = decode_file(path)
+        if frame is None:
+            return None
+        frame.setflags(write=False)
+        height, width = frame.shape[:2]
+        logger.info(f"✅ Loaded local image: {width}x{height} pixels from {path}")
+
+        with self.lock:
+            self.stats["decodes"] += 1
+            previous = self.frames.pop(path, None)
+            if previous is not None:
+                self.cached_bytes -= previous[1].nbytes
+            self.frames[path] = (version, frame)
+            self.cached_bytes += frame.nbytes
+            while self.cached_bytes > self.max_bytes and len(self.frames) > 1:
+                _, (_, evicted) = self.frames.popitem(last=False)
+                self.cached_bytes -= evicted.nbytes
+        return frame
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.frames.clear()
+                self.listings.clear()
+                self.cached_bytes = 0
+            else:
+                entry = self.frames.pop(path, None)
+                if entry is not None:
+                    self.cached_bytes -= entry[1].nbytes
+                self.listings.pop(path, None)
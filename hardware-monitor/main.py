@@ -9,6 +9,7 @@ import aiohttp
 import json
 import logging
 import os
+import signal
 import time
 from datetime import datetime
 from typing import Dict, List, Optional
@@ -17,7 +18,20 @@ import numpy as np
 from threading import Lock
 import paho.mqtt.client as mqtt
 import threading
-import base64
+from tracker import BirdTracker, xywh_to_bbox
+from aiming import AimController
+from calibration import CalibrationStore
+from shot_planner import plan_shots
+from patrol import PatrolScheduler
+from route_optimizer import optimize_route
+from outbox import Outbox
+from renditions import MIME_TYPES, ImageProducts, data_url
+from local_source import LocalImageSource
+from recorder import Recorder, source_key
+from tracing import Tracer, server_time_ms
+from camera_streams import CameraStreams
+from stabilizer import Stabilizer
+from sharding import Shard
 
 # Configure logging
 logging.basicConfig(
@@ -26,10 +40,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Status reported by request_cv_analysis when the result missed its deadline (also what cv-service answers)
+CV_DEADLINE_EXCEEDED = 504
+
 class HardwareMonitor:
     def __init__(self):
         self.api_url = os.getenv('API_URL', 'http://localhost:5001')
         self.cv_service_url = os.getenv('CV_SERVICE_URL', 'http://localhost:8000')
+        # Seconds from frame capture until a CV result is useless (0 = no deadline). The remaining
+        # budget goes to cv-service as X-Deadline-Ms; results arriving later are discarded.
+        self.cv_deadline = float(os.getenv('CV_DEADLINE', '3.0'))
         self.service_token = os.getenv('SERVICE_TOKEN', 'hardware-monitor-service-token')
         
         # MQTT management
@@ -44,6 +64,100 @@ class HardwareMonitor:
         self.device_movement_start = {}  # Track when movement started
         self.last_position_update = {}  # Track last position update time for throttling
         
+        # Route point selection: 'round_robin' (configured order) or 'adaptive' (bird activity)
+        self.patrol_mode = os.getenv('PATROL_SCHEDULER', 'round_robin')
+        self.patrol = PatrolScheduler(
+            half_life=float(os.getenv('PATROL_HALF_LIFE_HOURS', '72')) * 3600,
+            max_revisit=float(os.getenv('PATROL_MAX_REVISIT', '600')),
+            bucket_hours=int(os.getenv('PATROL_BUCKET_HOURS', '2')),
+            state_file=os.getenv('PATROL_STATE_FILE') or None
+        )
+        self.device_bird_counts = {}  # Birds found in the last analysis per device
+        
+        # Round-robin routes visited in travel-optimized order instead of configured order
+        self.route_optimize = os.getenv('ROUTE_OPTIMIZE', 'false').lower() == 'true'
+        self.route_rotation_wrap = float(os.getenv('ROUTE_ROTATION_WRAP', '360')) or None
+        # Seconds per stop besides travel (stabilization, capture, CV, inactivity wait) - only for the report
+        self.route_dwell_time = float(os.getenv('ROUTE_DWELL_TIME', '22'))
+        self.route_plans = {}      # device_ip -> (coordinates fingerprint, optimized order)
+        self.route_positions = {}  # device_ip -> position within the optimized order
+        
+        # Camera stabilization after a move: 'measured' watches the camera's persistent stream
+        # until the image is steady (learned per-device cap, STABILIZE_TIMEOUT fallback),
+        # 'fixed' always waits STABILIZE_TIMEOUT
+        self.stabilize_mode = os.getenv('STABILIZE_MODE', 'measured')
+        self.stabilizer = Stabilizer(
+            timeout=float(os.getenv('STABILIZE_TIMEOUT', '2.0')),
+            motion_threshold=float(os.getenv('STABILIZE_MOTION_THRESHOLD', '2.0')),
+            sharpness_ratio=float(os.getenv('STABILIZE_SHARPNESS_RATIO', '0.8')),
+            stable_frames=int(os.getenv('STABILIZE_FRAMES', '2')),
+            margin=float(os.getenv('STABILIZE_BOUND_MARGIN', '1.5'))
+        )
+        # Persistent camera connections, closed after CAMERA_STREAM_IDLE seconds without a reader
+        self.camera_streams = CameraStreams(idle_timeout=float(os.getenv('CAMERA_STREAM_IDLE', '30')))
+        
+        # Target tracking: short burst of frames after a detection, tracker per device
+        self.device_trackers = {}
+        self.tracking_burst_frames = int(os.getenv('TRACKING_BURST_FRAMES', '3'))
+        self.tracking_burst_interval = float(os.getenv('TRACKING_BURST_INTERVAL', '0.2'))
+        # Expected time from aiming decision to shot, used to lead moving birds
+        self.tracking_aim_lead = float(os.getenv('TRACKING_AIM_LEAD', '1.0'))
+        
+        # Camera calibration per device/stream and size of the last analysed frames per device
+        self.calibrations = CalibrationStore()
+        self.device_image_info = {}
+        
+        # Closed-loop aiming: ROI re-detections after the aim move, bounded time-to-shot
+        self.aim_max_refinements = int(os.getenv('AIM_MAX_REFINEMENTS', '2'))
+        self.aim_tolerance = float(os.getenv('AIM_TOLERANCE_DEG', '1.0'))
+        self.aim_time_budget = float(os.getenv('AIM_TIME_BUDGET', '4.0'))
+        self.aim_settle_time = float(os.getenv('AIM_SETTLE_TIME', '0.5'))
+        
+        # Shot planning over all birds of a frame: turret speeds (deg/s), shot and water limits
+        self.turret_pan_speed = float(os.getenv('TURRET_PAN_SPEED', '60'))
+        self.turret_tilt_speed = float(os.getenv('TURRET_TILT_SPEED', '30'))
+        self.shot_max_per_stop = int(os.getenv('SHOT_MAX_PER_STOP', '3'))
+        self.shot_duration_ms = int(os.getenv('SHOT_DURATION_MS', '300'))
+        water_budget = os.getenv('SHOT_WATER_BUDGET_MS')
+        self.shot_water_budget_ms = float(water_budget) if water_budget else None
+        
+        # Image renditions: thumbnails for events, medium for stored detections,
+        # full resolution only for confirmed hits
+        self.image_products = ImageProducts.from_env(os.getenv)
+        self.full_image_min_confidence = float(os.getenv('IMAGE_FULL_MIN_CONFIDENCE', '0.7'))
+        self.full_image_min_hits = int(os.getenv('IMAGE_FULL_MIN_HITS', '2'))
+        
+        # Decoded local images (useLocalImage devices), reloaded only when the file changes
+        self.local_images = LocalImageSource(
+            max_bytes=int(float(os.getenv('LOCAL_IMAGE_CACHE_MB', '256')) * 1024 * 1024)
+        )
+        
+        # Optional recording of devices, MQTT, frames and CV responses for offline replay
+        record_path = os.getenv('RECORD_PATH')
+        self.recorder = Recorder(
+            record_path,
+            jpeg_quality=int(os.getenv('RECORD_JPEG_QUALITY', '90')),
+            max_bytes=int(float(os.getenv('RECORD_MAX_MB', '2048')) * 1024 * 1024)
+        ) if record_path else None
+        
+        # Sharding: with SHARD_STORE set, this instance only drives the devices it holds a lease for
+        self.shard = Shard.from_env(os.getenv)
+        
+        # Span tree per patrol cycle, exported to TRACE_FILE and/or TRACE_OTLP_URL
+        self.tracer = Tracer.from_env(os.getenv)
+        
+        # Detections are spooled to disk and uploaded in the background, so a slow
+        # or unreachable API never stalls the control loop and nothing is lost
+        self.outbox = Outbox(
+            os.getenv('OUTBOX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'outbox')),
+            self.upload_detections,
+            max_bytes=int(float(os.getenv('OUTBOX_MAX_MB', '512')) * 1024 * 1024),
+            segment_bytes=int(float(os.getenv('OUTBOX_SEGMENT_MB', '16')) * 1024 * 1024),
+            batch_size=int(os.getenv('OUTBOX_BATCH_SIZE', '8')),
+            retry_base=float(os.getenv('OUTBOX_RETRY_BASE', '1.0')),
+            retry_max=float(os.getenv('OUTBOX_RETRY_MAX', '300'))
+        )
+        
         # Thread safety
         self.camera_lock = Lock()
         
@@ -100,6 +214,8 @@ class HardwareMonitor:
             client.on_connect = self.on_mqtt_connect
             client.on_message = self.on_mqtt_message
             client.on_disconnect = self.on_mqtt_disconnect
+            if self.recorder:
+                client.publish = self.recorder.wrap_publish(client.publish)
             
             # Connect to MQTT broker
             client.connect(broker, port, 60)
@@ -124,8 +240,11 @@ class HardwareMonitor:
         tasks = [
             asyncio.create_task(self.monitor_devices()),
             asyncio.create_task(self.process_camera_streams()),
-            asyncio.create_task(self.taubenschiesser_control_loop())
+            asyncio.create_task(self.taubenschiesser_control_loop()),
+            asyncio.create_task(self.outbox.run())
         ]
+        if self.shard:
+            tasks.append(asyncio.create_task(self.shard.run()))
         
         await asyncio.gather(*tasks)
     
@@ -159,6 +278,8 @@ class HardwareMonitor:
             
             payload = json.loads(payload_str)
             logger.info(f"📨 MQTT message received on {topic}: {payload_str[:100]}...")
+            if self.recorder:
+                self.recorder.mqtt(topic, msg.payload)
             
             # Extract device IP from topic: taubenschiesser/{IP}/info or taubenschiesser/info
             if topic == "taubenschiesser/info":
@@ -240,6 +361,10 @@ class HardwareMonitor:
                         if response.status == 200:
                             devices = await response.json()
                             logger.info(f"Found {len(devices)} devices")
+                            if self.recorder:
+                                self.recorder.devices(devices)
+                            if self.shard:
+                                devices = self.shard.filter(devices)
                             
                             # Load user MQTT settings for each device owner (only once)
                             for device in devices:
@@ -370,10 +495,23 @@ class HardwareMonitor:
             mode = actions.get('mode', 'impulse')
             route_coordinates = actions.get('route', {}).get('coordinates', [])
             
-            if mode == 'route' and route_coordinates:
-                await self.move_device_route(device, time_since_last_seen)
-            else:
-                await self.move_device_step(device, time_since_last_seen)
+            device_id = device.get('_id') or device.get('deviceId')
+            if self.shard:
+                # The device list may be older than the last lease change
+                if not self.shard.owns(device_id):
+                    logger.info(f"🧩 Device {device_ip} is not leased to this instance, skipping")
+                    return
+                self.shard.begin_cycle(device_id)
+            
+            try:
+                with self.tracer.cycle('patrol_cycle', device_ip=device_ip, device_id=str(device_id), mode=mode):
+                    if mode == 'route' and route_coordinates:
+                        await self.move_device_route(device, time_since_last_seen)
+                    else:
+                        await self.move_device_step(device, time_since_last_seen)
+            finally:
+                if self.shard:
+                    self.shard.end_cycle(device_id)
                 
         except Exception as e:
             logger.error(f"Error moving device: {e}")
@@ -418,10 +556,13 @@ class HardwareMonitor:
             mqtt_client = await self.get_mqtt_client_for_user(owner_id)
             
             if mqtt_client:
-                mqtt_client.publish(topic, json.dumps(command))
+                with self.tracer.span('move_command'):
+                    mqtt_client.publish(topic, json.dumps(command))
                 # Mark device as moving and set start time
                 self.device_moving[device_ip] = True
                 self.device_movement_start[device_ip] = datetime.now()
+                # Connect to the camera while the turret moves
+                self.open_camera_stream(device)
                 logger.info(f"✅ Sent MQTT command to topic '{topic}': {json.dumps(command)}")
             else:
                 logger.warning(f"No MQTT client available for user {owner_id}, skipping command")
@@ -433,20 +574,15 @@ class HardwareMonitor:
                 logger.info(f"📍 Sent impulse command to device {device_ip}: {step_size} steps (user: {owner_id})")
             
             # Wait for movement to complete before analyzing
-            await self.wait_for_movement_complete(device_ip)
+            with self.tracer.span('movement_wait'):
+                await self.wait_for_movement_complete(device_ip)
             
             # Send movement complete event
             await self.send_monitor_event(device, 'device_stopped', {
                 'message': 'Device hat Bewegung beendet'
             })
             
-            # Wait additional 2 seconds for camera/device to stabilize
-            logger.info(f"⏱️ Waiting 2s for device {device_ip} to stabilize...")
-            await self.send_monitor_event(device, 'device_stabilizing', {
-                'message': 'Warte 2s bis Kamera stabilisiert...',
-                'wait_time': 2
-            })
-            await asyncio.sleep(2)
+            await self.stabilize_camera(device, device_ip)
             await self.analyze_after_movement(device)
             
         except Exception as e:
@@ -470,9 +606,22 @@ class HardwareMonitor:
                 logger.warning(f"No route coordinates configured for device {device_ip}")
                 return
             
-            # Get current route position (this would need to be tracked)
-            route_index = self.movement_queue.get(device_ip, 0)
+            device_id = device.get('_id') or device.get('deviceId')
+            if self.patrol_mode == 'adaptive':
+                # Next point by bird activity; movement_queue holds the point we are at
+                route_index = self.patrol.next_point(device_id, len(route_coordinates), self.movement_queue.get(device_ip))
+                self.movement_queue[device_ip] = route_index
+            elif self.route_optimize:
+                # Walk the route in travel-optimized order; movement_queue keeps the configured index
+                order = self.get_route_order(device_ip, route_coordinates)
+                position = self.route_positions.get(device_ip, 0) % len(order)
+                route_index = order[position]
+                self.movement_queue[device_ip] = route_index
+            else:
+                # Get current route position (this would need to be tracked)
+                route_index = self.movement_queue.get(device_ip, 0) % len(route_coordinates)
             route_item = route_coordinates[route_index]
+            self.tracer.set_cycle_attributes(route_point=route_index, route_points=len(route_coordinates))
             
             # Send movement event
             await self.send_monitor_event(device, 'device_moving', {
@@ -501,10 +650,13 @@ class HardwareMonitor:
             mqtt_client = await self.get_mqtt_client_for_user(owner_id)
             
             if mqtt_client:
-                mqtt_client.publish(topic, json.dumps(command))
+                with self.tracer.span('move_command'):
+                    mqtt_client.publish(topic, json.dumps(command))
                 # Mark device as moving and set start time
                 self.device_moving[device_ip] = True
                 self.device_movement_start[device_ip] = datetime.now()
+                # Connect to the camera while the turret moves
+                self.open_camera_stream(device)
             else:
                 logger.warning(f"No MQTT client available for user {owner_id}, skipping command")
             
@@ -515,28 +667,46 @@ class HardwareMonitor:
                 logger.info(f"📍 Sent route command to device {device_ip}: rotation={route_item.get('rotation')}, tilt={route_item.get('tilt')} (user: {owner_id})")
             
             # Wait for movement to complete before analyzing
-            await self.wait_for_movement_complete(device_ip)
+            with self.tracer.span('movement_wait'):
+                await self.wait_for_movement_complete(device_ip)
             
             # Send movement complete event
             await self.send_monitor_event(device, 'device_stopped', {
                 'message': f'Device erreichte Route-Punkt {route_index + 1}'
             })
             
-            # Wait additional 2 seconds for camera/device to stabilize
-            logger.info(f"⏱️ Waiting 2s for device {device_ip} to stabilize...")
-            await self.send_monitor_event(device, 'device_stabilizing', {
-                'message': 'Warte 2s bis Kamera stabilisiert...',
-                'wait_time': 2
-            })
-            await asyncio.sleep(2)
+            await self.stabilize_camera(device, device_ip)
+            self.device_bird_counts[device_ip] = 0
             await self.analyze_after_movement(device)
             
-            # Update route index AFTER analysis is complete
-            self.movement_queue[device_ip] = (route_index + 1) % len(route_coordinates)
+            if self.patrol_mode == 'adaptive':
+                self.patrol.record_visit(device_id, route_index, self.device_bird_counts.get(device_ip, 0))
+            elif self.route_optimize:
+                self.route_positions[device_ip] = self.route_positions.get(device_ip, 0) + 1
+            else:
+                # Update route index AFTER analysis is complete
+                self.movement_queue[device_ip] = (route_index + 1) % len(route_coordinates)
             
         except Exception as e:
             logger.error(f"Error moving device route: {e}")
     
+    def get_route_order(self, device_ip: str, route_coordinates: List[Dict]) -> List[int]:
+        """Travel-optimized visiting order, recomputed when the route changes"""
+        fingerprint = json.dumps(route_coordinates, sort_keys=True, default=str)
+        plan = self.route_plans.get(device_ip)
+        if plan is None or plan[0] != fingerprint:
+            result = optimize_route(
+                route_coordinates, self.turret_pan_speed, self.turret_tilt_speed,
+                self.aim_settle_time, self.route_dwell_time, self.route_rotation_wrap
+            )
+            plan = (fingerprint, result['order'])
+            self.route_plans[device_ip] = plan
+            self.route_positions[device_ip] = 0
+            logger.info(f"🧭 Route for device {device_ip} optimized: order {[i + 1 for i in result['order']]}, "
+                        f"cycle {result['before']['cycle_time']}s -> {result['after']['cycle_time']}s "
+                        f"(travel {result['before']['travel_time']}s -> {result['after']['travel_time']}s)")
+        return plan[1]
+    
     async def wait_for_movement_complete(self, device_ip: str, timeout: int = 30):
         """Wait for device to complete movement via MQTT or timeout"""
         try:
@@ -566,6 +736,71 @@ class HardwareMonitor:
         except Exception as e:
             logger.error(f"Error waiting for movement complete: {e}")
     
+    def camera_stream_url(self, device: Dict) -> Optional[str]:
+        """RTSP URL of the device camera (direct or Tapo), None for local images or no camera"""
+        camera_config = device.get('camera', {})
+        if camera_config.get('useLocalImage', False) and camera_config.get('localImagePath'):
+            return None
+        rtsp_url = camera_config.get('rtspUrl')
+        if not rtsp_url and camera_config.get('type') == 'tapo':
+            tapo_config = camera_config.get('tapo') or {}
+            if tapo_config.get('ip') and tapo_config.get('username') and tapo_config.get('password'):
+                rtsp_url = (f"rtsp://{tapo_config['username']}:{tapo_config['password']}@{tapo_config['ip']}:554/"
+                            f"{tapo_config.get('stream', 'stream1')}")
+        return rtsp_url or None
+    
+    def open_camera_stream(self, device: Dict):
+        """Start (or keep) the persistent stream used for stabilization and capture"""
+        if self.stabilize_mode != 'measured':
+            return
+        rtsp_url = self.camera_stream_url(device)
+        if rtsp_url:
+            self.camera_streams.open(rtsp_url)
+    
+    async def stabilize_camera(self, device: Dict, device_ip: str):
+        """Wait after a move until the camera image is steady"""
+        rtsp_url = self.camera_stream_url(device)
+        bound = self.stabilizer.bound(device_ip)
+        with self.tracer.span('stabilize', mode=self.stabilize_mode) as span:
+            if self.stabilize_mode != 'measured':
+                logger.info(f"⏱️ Waiting {bound:.1f}s for device {device_ip} to stabilize...")
+                await self.send_monitor_event(device, 'device_stabilizing', {
+                    'message': f'Warte {bound:.1f}s bis Kamera stabilisiert...',
+                    'wait_time': bound
+                })
+                await asyncio.sleep(bound)
+                return
+            if not rtsp_url:
+                # Local images don't shake
+                span.set(stable=True, waited_ms=0)
+                return
+            
+            await self.send_monitor_event(device, 'device_stabilizing', {
+                'message': f'Warte bis Kamera stabilisiert (max. {bound:.1f}s)...',
+                'wait_time': bound
+            })
+            report = await self.measure_stability(device_ip, rtsp_url)
+            span.set(stable=report['stable'], waited_ms=round(report['waited'] * 1000), bound_ms=round(report['bound'] * 1000),
+                     frames=report['frames'])
+            if report['stable']:
+                logger.info(f"📷 Camera of device {device_ip} stable after {report['waited']:.2f}s "
+                            f"({report['frames']} frames, motion={report['motion']})")
+            else:
+                logger.info(f"⏱️ Camera of device {device_ip} not stable within {report['bound']:.1f}s "
+                            f"({report['frames']} frames, motion={report['motion']}), capturing anyway")
+    
+    async def measure_stability(self, device_ip: str, rtsp_url: str) -> Dict:
+        """Watch the persistent stream until the image is steady, returns the stabilizer report"""
+        stream = self.camera_streams.open(rtsp_url)
+        loop = asyncio.get_running_loop()
+        report = await self.stabilizer.wait(
+            device_ip, stream.next_frame,
+            lambda fn, *args: loop.run_in_executor(None, fn, *args)
+        )
+        if self.recorder:
+            self.recorder.stabilized(source_key(rtsp_url), report)
+        return report
+    
     async def send_monitor_event(self, device: Dict, event_type: str, data: Dict):
         """Send live monitoring event to server"""
         try:
@@ -666,7 +901,9 @@ class HardwareMonitor:
                     'source': 'local',
                     'path': local_image_path
                 })
-                original_frame = await self.load_local_image(local_image_path)
+                with self.tracer.span('capture', source='local'):
+                    original_frame = await self.load_local_image(local_image_path, device_ip)
+                rtsp_url = None
             else:
                 # Use camera/RTSP stream
                 rtsp_url = camera_config.get('rtspUrl')
@@ -704,20 +941,24 @@ class HardwareMonitor:
                 await self.send_monitor_event(device, 'capturing_image', {
                     'message': 'Capturing image from camera'
                 })
-                original_frame = await self.capture_frame(rtsp_url)
+                with self.tracer.span('capture', source='camera'):
+                    original_frame = await self.capture_frame(rtsp_url)
             
             if original_frame is not None:
+                capture_time = time.time()
                 height, width = original_frame.shape[:2]
                 logger.info(f"✅ Frame captured successfully: {width}x{height} pixels")
                 
-                # Send original image
-                _, buffer = cv2.imencode('.jpg', original_frame)
-                original_image_base64 = base64.b64encode(buffer).decode('utf-8')
+                # Send original image (thumbnail - live view only)
+                loop = asyncio.get_running_loop()
+                original_products = self.image_products.for_frame(original_frame)
+                with self.tracer.span('encode', rendition='thumbnail'):
+                    thumbnail = await loop.run_in_executor(None, original_products.data_url, 'thumbnail')
                 
                 await self.send_monitor_event(device, 'image_captured', {
                     'width': width,
                     'height': height,
-                    'image': f"data:image/jpeg;base64,{original_image_base64}"
+                    'image': thumbnail
                 })
                 
                 # Apply zoom if in route mode
@@ -725,22 +966,26 @@ class HardwareMonitor:
                 
                 # Send zoomed image if different
                 if zoomed_frame is not original_frame:
+                    zoomed_products = self.image_products.for_frame(zoomed_frame)
                     zoom_height, zoom_width = zoomed_frame.shape[:2]
-                    _, zoom_buffer = cv2.imencode('.jpg', zoomed_frame)
-                    zoomed_image_base64 = base64.b64encode(zoom_buffer).decode('utf-8')
+                    with self.tracer.span('encode', rendition='thumbnail'):
+                        thumbnail = await loop.run_in_executor(None, zoomed_products.data_url, 'thumbnail')
                     
                     await self.send_monitor_event(device, 'image_zoomed', {
                         'width': zoom_width,
                         'height': zoom_height,
                         'zoom_factor': round(width / zoom_width, 2) if zoom_width > 0 else 1,
-                        'image': f"data:image/jpeg;base64,{zoomed_image_base64}"
+                        'image': thumbnail
                     })
+                else:
+                    zoomed_products = original_products
                 
                 # Analyze with CV service (using zoomed frame for better detection)
                 await self.send_monitor_event(device, 'analyzing', {
                     'message': 'Analyzing image with CV service'
                 })
-                await self.analyze_frame_for_birds(device, original_frame, zoomed_frame)
+                await self.analyze_frame_for_birds(device, original_frame, zoomed_frame, rtsp_url, capture_time,
+                                                   images=(original_products, zoomed_products))
             else:
                 logger.warning(f"❌ Could not capture frame from device {device_ip}")
                 await self.send_monitor_event(device, 'error', {
@@ -850,7 +1095,99 @@ class HardwareMonitor:
             logger.error(f"Error applying zoom to frame: {e}")
             return frame
     
-    async def analyze_frame_for_birds(self, device: Dict, original_frame: np.ndarray, zoomed_frame: np.ndarray):
+    async def request_cv_analysis(self, frame: np.ndarray, captured: float = None) -> tuple:
+        """Send a frame to the CV service, returns (HTTP status, result)
+        
+        The result must arrive within cv_deadline of the capture time; a
+        request that runs out of time is abandoned and a late result
+        discarded, both reported as CV_DEADLINE_EXCEEDED.
+        """
+        deadline = (captured or time.time()) + self.cv_deadline if self.cv_deadline > 0 else None
+        with self.tracer.span('encode', rendition='cv') as span:
+            _, buffer = cv2.imencode('.jpg', frame)
+            span.set(bytes=len(buffer))
+        start = time.time()
+        
+        with self.tracer.span('cv_roundtrip') as span:
+            # The trace ID travels to cv-service, so its request metrics can be tied to this cycle
+            traceparent = span.traceparent()
+            headers = {'traceparent': traceparent} if traceparent else {}
+            timeout = aiohttp.ClientTimeout()
+            if deadline is not None:
+                remaining = deadline - start
+                if remaining <= 0:
+                    span.set(deadline_exceeded=True)
+                    return CV_DEADLINE_EXCEEDED, None
+                # Relative, so the hosts' clocks need not agree; cv-service drops the frame if it can't start in time
+                headers['X-Deadline-Ms'] = str(int(remaining * 1000))
+                timeout = aiohttp.ClientTimeout(total=remaining)
+            
+            try:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    data = aiohttp.FormData()
+                    data.add_field('file', buffer.tobytes(), filename='camera.jpg', content_type='image/jpeg')
+                    
+                    async with session.post(
+                        f"{self.cv_service_url}/detect_birds_optimized",
+                        data=data,
+                        headers=headers or None
+                    ) as response:
+                        status = response.status
+                        result = await response.json() if status == 200 else None
+                        span.set(http_status=status, server_ms=server_time_ms(response.headers.get('Server-Timing')))
+            except asyncio.TimeoutError:
+                status, result = CV_DEADLINE_EXCEEDED, None
+            
+            if status == 200 and deadline is not None and time.time() > deadline:
+                # The birds have moved on - this result must not aim a shot
+                status, result = CV_DEADLINE_EXCEEDED, None
+            if status == CV_DEADLINE_EXCEEDED:
+                span.set(deadline_exceeded=True)
+            if result:
+                span.set(processing_time_ms=round(result.get('processing_time', 0) * 1000, 1),
+                         birds=result.get('bird_count', 0))
+            if self.recorder:
+                self.recorder.cv_response(frame, status, result, time.time() - start)
+            return status, result
+    
+    async def track_birds(self, device: Dict, rtsp_url: str, first_result: Dict, frame: np.ndarray,
+                          capture_time: float) -> Optional[BirdTracker]:
+        """Follow the detected birds over a short burst of frames
+        
+        The first frame's detections start the tracks; the burst frames are
+        zoomed like the first one and the tracks followed into them by
+        template matching (no further CV service requests), so each track
+        gets a velocity estimate for leading the shot.
+        """
+        taubenschiesser_config = device.get('taubenschiesser', {})
+        device_ip = taubenschiesser_config.get('ip') if isinstance(taubenschiesser_config, dict) else None
+        
+        tracker = BirdTracker()
+        birds = [d for d in first_result.get('detections', []) if d.get('class') == 'bird']
+        tracker.update(birds, capture_time)
+        self.device_trackers[device_ip] = tracker
+        
+        if not rtsp_url or self.tracking_burst_frames <= 0 or not tracker.tracks:
+            return tracker
+        
+        try:
+            frames = await self.capture_frames(rtsp_url, self.tracking_burst_frames, self.tracking_burst_interval)
+            loop = asyncio.get_running_loop()
+            previous = frame
+            for timestamp, burst_frame in frames:
+                zoomed = await self.apply_zoom_to_frame(device, burst_frame)
+                await loop.run_in_executor(None, tracker.follow, previous, zoomed, timestamp)
+                previous = zoomed
+            
+            for track in tracker.tracks:
+                logger.info(f"🛰️ Track {track.id}: hits={track.hits}, velocity=({track.state[4]:.1f}, {track.state[5]:.1f}) px/s")
+        except Exception as e:
+            logger.error(f"Error tracking birds: {e}")
+        
+        return tracker
+    
+    async def analyze_frame_for_birds(self, device: Dict, original_frame: np.ndarray, zoomed_frame: np.ndarray,
+                                      rtsp_url: str = None, capture_time: float = None, images: tuple = None):
         """Analyze frame for birds and trigger shoot if found"""
         try:
             # Get IP from taubenschiesser.ip (nested structure)
@@ -858,88 +1195,100 @@ class HardwareMonitor:
             device_ip = taubenschiesser_config.get('ip') if isinstance(taubenschiesser_config, dict) else None
             device_id = device.get('_id') or device.get('deviceId')
             
-            # Use zoomed frame for better detection
-            _, buffer = cv2.imencode('.jpg', zoomed_frame)
-            
             logger.info(f"🔍 Sending frame to CV service for analysis (device: {device_ip})")
             
-            # Send to CV service
-            async with aiohttp.ClientSession() as session:
-                data = aiohttp.FormData()
-                data.add_field('file', buffer.tobytes(), filename='camera.jpg', content_type='image/jpeg')
+            # Send to CV service (zoomed frame for better detection)
+            status, result = await self.request_cv_analysis(zoomed_frame, capture_time)
+            if status == 200:
+                # Log CV service response details
+                bird_count = result.get('bird_count', 0)
+                self.device_bird_counts[device_ip] = bird_count
+                detections = result.get('detections', [])
+                processing_time = result.get('processing_time', 0)
                 
-                async with session.post(
-                    f"{self.cv_service_url}/detect_birds_optimized",
-                    data=data
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        
-                        # Log CV service response details
-                        bird_count = result.get('bird_count', 0)
-                        detections = result.get('detections', [])
-                        processing_time = result.get('processing_time', 0)
-                        
-                        # Count all objects (not just birds)
-                        all_objects = {}
-                        for detection in detections:
-                            obj_class = detection.get('class', 'unknown')
-                            if obj_class in all_objects:
-                                all_objects[obj_class] += 1
-                            else:
-                                all_objects[obj_class] = 1
-                        
-                        # Send CV analysis result event
-                        await self.send_monitor_event(device, 'cv_analysis_complete', {
-                            'bird_count': bird_count,
-                            'detections': detections,
-                            'processing_time': processing_time,
-                            'birds_found': result.get('birds_found', False),
-                            'confidence_level': result.get('confidence_level', 0),
-                            'total_objects': len(detections),
-                            'objects_by_class': all_objects
-                        })
-                        
-                        # Log detections only if objects found
-                        if detections:
-                            logger.info(f"🤖 CV Analysis: {bird_count} birds found, processing time: {processing_time:.2f}s")
-                            for idx, detection in enumerate(detections, 1):
-                                obj_class = detection.get('class', 'unknown')
-                                confidence = detection.get('confidence', 0)
-                                logger.info(f"  Detection #{idx}: {obj_class} (confidence: {confidence:.2f})")
-                        else:
-                            logger.info(f"🤖 CV Analysis: No objects detected (processing time: {processing_time:.2f}s)")
-                        
-                        if result.get('birds_found', False):
-                            confidence = result.get('confidence_level', 0)
-                            
-                            logger.info(f"🦅 BIRDS DETECTED on device {device_ip}: {bird_count} birds, max confidence: {confidence:.2f}")
-                            
-                            # Send bird detection event
-                            await self.send_monitor_event(device, 'birds_detected', {
-                                'bird_count': bird_count,
-                                'confidence': confidence,
-                                'message': f'{bird_count} birds detected with confidence {confidence:.2f}'
-                            })
-                            
-                            # Save detection to database with both images and detailed info
-                            target_bird = await self.save_detection_to_db(device, original_frame, zoomed_frame, result)
-                            
-                            # Trigger shoot with targeting
-                            await self.trigger_shoot(device, target_bird=target_bird)
+                # Count all objects (not just birds)
+                all_objects = {}
+                for detection in detections:
+                    obj_class = detection.get('class', 'unknown')
+                    if obj_class in all_objects:
+                        all_objects[obj_class] += 1
                     else:
-                        logger.error(f"❌ CV analysis failed for device {device_ip}: HTTP {response.status}")
-                        await self.send_monitor_event(device, 'error', {
-                            'message': f'CV analysis failed: HTTP {response.status}'
-                        })
-                        
+                        all_objects[obj_class] = 1
+                
+                # Send CV analysis result event
+                await self.send_monitor_event(device, 'cv_analysis_complete', {
+                    'bird_count': bird_count,
+                    'detections': detections,
+                    'processing_time': processing_time,
+                    'birds_found': result.get('birds_found', False),
+                    'confidence_level': result.get('confidence_level', 0),
+                    'total_objects': len(detections),
+                    'objects_by_class': all_objects
+                })
+                
+                # Log detections only if objects found
+                if detections:
+                    logger.info(f"🤖 CV Analysis: {bird_count} birds found, processing time: {processing_time:.2f}s")
+                    for idx, detection in enumerate(detections, 1):
+                        obj_class = detection.get('class', 'unknown')
+                        confidence = detection.get('confidence', 0)
+                        logger.info(f"  Detection #{idx}: {obj_class} (confidence: {confidence:.2f})")
+                else:
+                    logger.info(f"🤖 CV Analysis: No objects detected (processing time: {processing_time:.2f}s)")
+                
+                if result.get('birds_found', False):
+                    confidence = result.get('confidence_level', 0)
+                    
+                    logger.info(f"🦅 BIRDS DETECTED on device {device_ip}: {bird_count} birds, max confidence: {confidence:.2f}")
+                    
+                    # Send bird detection event
+                    await self.send_monitor_event(device, 'birds_detected', {
+                        'bird_count': bird_count,
+                        'confidence': confidence,
+                        'message': f'{bird_count} birds detected with confidence {confidence:.2f}'
+                    })
+                    
+                    # Follow the birds over a short burst to estimate their motion
+                    with self.tracer.span('track'):
+                        tracker = await self.track_birds(device, rtsp_url, result, zoomed_frame, capture_time or time.time())
+                    
+                    # Save detection to database with both images and detailed info
+                    with self.tracer.span('db_save'):
+                        target_bird = await self.save_detection_to_db(device, original_frame, zoomed_frame, result, tracker, images)
+                    
+                    # All birds of the frame (live tracks if we tracked) are candidates for the shot plan
+                    if tracker:
+                        targets = [{**t.detection, 'track': t.to_dict()} for t in tracker.tracks if t.misses == 0]
+                    else:
+                        targets = [d for d in detections if d.get('class') == 'bird']
+                    
+                    if self.shard and not self.shard.owns(device_id):
+                        logger.warning(f"🧩 Lease for device {device_ip} lost during the cycle, not shooting")
+                        return
+                    
+                    # Trigger shoot with targeting
+                    with self.tracer.span('shoot', targets=len(targets)):
+                        await self.trigger_shoot(device, target_bird=target_bird, rtsp_url=rtsp_url, targets=targets)
+            elif status == CV_DEADLINE_EXCEEDED:
+                # Shedding under load - a stale frame is skipped, the next stop brings a fresh one
+                logger.warning(f"⏱️ CV result for device {device_ip} missed its {self.cv_deadline:.1f}s deadline, discarded")
+                await self.send_monitor_event(device, 'cv_deadline_exceeded', {
+                    'message': f'CV result missed its {self.cv_deadline:.1f}s deadline'
+                })
+            else:
+                logger.error(f"❌ CV analysis failed for device {device_ip}: HTTP {status}")
+                await self.send_monitor_event(device, 'error', {
+                    'message': f'CV analysis failed: HTTP {status}'
+                })
+                
         except Exception as e:
             logger.error(f"Error analyzing frame for birds: {e}")
             await self.send_monitor_event(device, 'error', {
                 'message': f'CV analysis error: {str(e)}'
             })
     
-    async def save_detection_to_db(self, device: Dict, original_frame: np.ndarray, zoomed_frame: np.ndarray, cv_result: Dict):
+    async def save_detection_to_db(self, device: Dict, original_frame: np.ndarray, zoomed_frame: np.ndarray, cv_result: Dict,
+                                   tracker: BirdTracker = None, images: tuple = None):
         """Save detection to database via API with both images and detailed detection info"""
         try:
             device_id = device.get('_id') or device.get('deviceId')
@@ -947,12 +1296,11 @@ class HardwareMonitor:
             taubenschiesser_config = device.get('taubenschiesser', {})
             device_ip = taubenschiesser_config.get('ip') if isinstance(taubenschiesser_config, dict) else None
             
-            # Encode both frames as JPEG
-            _, original_buffer = cv2.imencode('.jpg', original_frame)
-            _, zoomed_buffer = cv2.imencode('.jpg', zoomed_frame)
-            
-            original_image_base64 = base64.b64encode(original_buffer).decode('utf-8')
-            zoomed_image_base64 = base64.b64encode(zoomed_buffer).decode('utf-8')
+            if images:
+                original_products, zoomed_products = images
+            else:
+                original_products = self.image_products.for_frame(original_frame)
+                zoomed_products = self.image_products.for_frame(zoomed_frame)
             
             # Get zoom factor for context
             zoom_factor = 1.0
@@ -965,10 +1313,14 @@ class HardwareMonitor:
                 if route_index < len(route_coordinates):
                     zoom_factor = route_coordinates[route_index].get('zoom', 1.0)
             
-            # Find target bird (highest confidence bird)
+            # Find target bird: the most reliable track if we tracked, else highest confidence bird
             detections = cv_result.get('detections', [])
             target_bird = None
-            if detections:
+            best_track = tracker.best_track() if tracker else None
+            if best_track:
+                target_bird = {**best_track.detection, 'track': best_track.to_dict()}
+                logger.info(f"🎯 Target bird selected: track {best_track.id}, hits={best_track.hits}, bbox={target_bird['track']['bbox']}")
+            elif detections:
                 birds = [d for d in detections if d.get('class') == 'bird']
                 if birds:
                     # Sort by confidence and take the highest
@@ -986,13 +1338,25 @@ class HardwareMonitor:
                     "height": zoomed_frame.shape[0]
                 }
             }
-            self.last_image_info = image_info
-            
-            # Prepare detailed detection data
+            self.device_image_info[device_ip] = image_info
+            
+            # Dashboard renditions always; the full-resolution original only for confirmed hits
+            confirmed = (best_track is not None and best_track.hits >= self.full_image_min_hits) or \
+                cv_result.get('confidence_level', 0) >= self.full_image_min_confidence
+            loop = asyncio.get_running_loop()
+            image_names = ['original_image', 'zoomed_image']
+            blobs = [
+                await loop.run_in_executor(None, original_products.get, 'medium'),
+                await loop.run_in_executor(None, zoomed_products.get, 'medium')
+            ]
+            if confirmed:
+                image_names.append('full_image')
+                blobs.append(await loop.run_in_executor(None, original_products.get, 'full'))
+            
+            # Prepare detailed detection data; the images travel as raw blobs
+            # through the outbox and are attached when uploading
             detection_data = {
                 "deviceId": device_id,
-                "original_image": f"data:image/jpeg;base64,{original_image_base64}",
-                "zoomed_image": f"data:image/jpeg;base64,{zoomed_image_base64}",
                 "detections": cv_result.get('detections', []),
                 "target_bird": target_bird,  # Which bird was targeted for shooting
                 "bird_count": cv_result.get('bird_count', 0),
@@ -1000,26 +1364,14 @@ class HardwareMonitor:
                 "processing_time": cv_result.get('processing_time', 0),
                 "zoom_factor": zoom_factor,
                 "image_info": image_info,
+                "image_format": self.image_products.format,
+                "images": image_names,
                 "timestamp": datetime.now().isoformat()
             }
             
-            # Send to internal API endpoint for hardware monitor
-            headers = {'Authorization': f'Bearer {self.service_token}'}
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_url}/api/hardware/detection",
-                    json=detection_data,
-                    headers=headers
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Detection saved to database for device {device_ip}: {result.get('detection_count', 0)} objects, zoom: {zoom_factor}x")
-                        
-                        # Update device last detection time
-                        await self.update_device_last_detection(device_id)
-                        
-                    else:
-                        logger.error(f"Failed to save detection to database for device {device_ip}: {response.status}")
+            self.outbox.put(detection_data, blobs)
+            logger.info(f"Detection queued for upload for device {device_ip}: {len(detection_data['detections'])} objects, "
+                        f"zoom: {zoom_factor}x, {sum(len(b) for b in blobs) // 1024} KB{' incl. full image' if confirmed else ''}")
             
             return target_bird
                         
@@ -1027,6 +1379,38 @@ class HardwareMonitor:
             logger.error(f"Error saving detection to database: {e}")
             return None
     
+    async def upload_detections(self, records: List[tuple]) -> int:
+        """Upload a batch of outbox records; returns how many were handled, in order"""
+        headers = {'Authorization': f'Bearer {self.service_token}'}
+        handled = 0
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+            for metadata, blobs in records:
+                metadata = dict(metadata)
+                names = metadata.pop('images', ['original_image', 'zoomed_image'])
+                mime = MIME_TYPES.get(metadata.get('image_format'), 'image/jpeg')
+                detection_data = {**metadata, **{name: data_url(blob, mime) for name, blob in zip(names, blobs)}}
+                try:
+                    async with session.post(
+                        f"{self.api_url}/api/hardware/detection",
+                        json=detection_data,
+                        headers=headers
+                    ) as response:
+                        if response.status == 200:
+                            result = await response.json()
+                            logger.info(f"Detection saved to database for device {metadata.get('deviceId')}: {result.get('detection_count', 0)} objects")
+                            await self.update_device_last_detection(metadata.get('deviceId'))
+                        elif 400 <= response.status < 500 and response.status not in (408, 429):
+                            # Retrying won't change the answer - drop the record instead of blocking the outbox
+                            logger.error(f"Detection rejected by API for device {metadata.get('deviceId')}: {response.status}, dropping it")
+                        else:
+                            logger.warning(f"Failed to save detection for device {metadata.get('deviceId')}: {response.status}, will retry")
+                            return handled
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Error uploading detection for device {metadata.get('deviceId')}: {e}, will retry")
+                    return handled
+                handled += 1
+        return handled
+    
     async def update_device_last_detection(self, device_id: str):
         """Update device last detection time"""
         try:
@@ -1045,43 +1429,8 @@ class HardwareMonitor:
         except Exception as e:
             logger.error(f"Error updating device last detection: {e}")
     
-    def calculate_angle_adjustment(self, bbox: Dict, image_width: int, image_height: int, zoom_factor: float = 1.0) -> tuple:
-        """Calculate rotation and tilt adjustment needed to center the target"""
-        try:
-            # Get bbox center in pixels
-            bbox_center_x = bbox.get('x', 0) + bbox.get('width', 0) / 2
-            bbox_center_y = bbox.get('y', 0) + bbox.get('height', 0) / 2
-            
-            # Image center
-            image_center_x = image_width / 2
-            image_center_y = image_height / 2
-            
-            # Calculate pixel offset from center
-            offset_x = bbox_center_x - image_center_x
-            offset_y = bbox_center_y - image_center_y
-            
-            # Convert pixel offset to degrees
-            # Assuming: 1280x720 image ≈ 60° horizontal FOV, 34° vertical FOV (typical for Tapo)
-            # Adjust for zoom - higher zoom = narrower FOV
-            horizontal_fov = 60.0 / zoom_factor
-            vertical_fov = 34.0 / zoom_factor
-            
-            degrees_per_pixel_x = horizontal_fov / image_width
-            degrees_per_pixel_y = vertical_fov / image_height
-            
-            rotation_adjustment = offset_x * degrees_per_pixel_x
-            tilt_adjustment = -offset_y * degrees_per_pixel_y  # Negative because y increases downward
-            
-            logger.info(f"📐 Angle calculation: offset=({offset_x:.1f}, {offset_y:.1f})px, adjustment=({rotation_adjustment:.2f}°, {tilt_adjustment:.2f}°)")
-            
-            return rotation_adjustment, tilt_adjustment
-            
-        except Exception as e:
-            logger.error(f"Error calculating angle adjustment: {e}")
-            return 0, 0
-    
-    async def trigger_shoot(self, device: Dict, target_bird: Dict = None):
-        """Trigger shoot on device, optionally aiming at target bird first"""
+    async def trigger_shoot(self, device: Dict, target_bird: Dict = None, rtsp_url: str = None, targets: List[Dict] = None):
+        """Trigger shoot on device, optionally aiming at target bird (or all targets) first"""
         try:
             # Get IP from taubenschiesser.ip (nested structure)
             taubenschiesser_config = device.get('taubenschiesser', {})
@@ -1095,9 +1444,12 @@ class HardwareMonitor:
             
             topic = f"taubenschiesser/{device_ip}"
             
-            # If we have a target bird, aim at it first
-            if target_bird and target_bird.get('bbox'):
-                logger.info(f"🎯 Aiming at target bird before shooting...")
+            # Aim at the target bird - or plan a sequence over all birds of the frame
+            if targets is None:
+                targets = [target_bird] if target_bird else []
+            targets = [t for t in targets if t.get('bbox')]
+            if targets:
+                logger.info(f"🎯 Aiming at {len(targets)} target bird(s) before shooting...")
                 
                 # Get current position from device state
                 # TODO: We need to track current position - for now use route position
@@ -1105,63 +1457,112 @@ class HardwareMonitor:
                 if actions.get('mode') == 'route':
                     route_coordinates = actions.get('route', {}).get('coordinates', [])
                     route_index = self.movement_queue.get(device_ip, 0) if device_ip else 0
-                    if route_index < len(route_coordinates):
+                    # Size of the frames the bbox came from, recorded when the detection was saved
+                    image_info = self.device_image_info.get(device_ip)
+                    if route_index < len(route_coordinates) and image_info:
                         current_pos = route_coordinates[route_index]
                         current_rotation = current_pos.get('rotation', 0)
                         current_tilt = current_pos.get('tilt', 0)
-                        zoom_factor = current_pos.get('zoom', 1.0)
                         
-                        # Calculate adjustment needed
-                        # BBox is from zoomed image
-                        camera_config = device.get('camera', {})
-                        use_local = camera_config.get('useLocalImage', False)
+                        # BBox is relative to the zoomed image (a center crop of the full frame)
+                        original_size = image_info['original_size']
+                        img_width = image_info['zoomed_size']['width']
+                        img_height = image_info['zoomed_size']['height']
+                        calibration = self.calibrations.get(device, original_size['width'], original_size['height'])
+                        tracker = self.device_trackers.get(device_ip)
                         
-                        # Get image dimensions (zoomed image dimensions)
-                        # For zoom 3x on 1280x720: zoomed is ~426x240
-                        # But bbox is relative to zoomed image
-                        image_info = getattr(self, 'last_image_info', {})
-                        zoomed_size = image_info.get('zoomed_size', {})
-                        img_width = zoomed_size.get('width', 426)
-                        img_height = zoomed_size.get('height', 240)
+                        def aim_point(target):
+                            """Current bbox and angular velocity of a target, led by its track if tracked"""
+                            track_info = target.get('track')
+                            track = tracker.get(track_info['track_id']) if track_info and tracker else None
+                            if track:
+                                velocity = (calibration.angular_size(track.state[4]),
+                                            -calibration.angular_size(track.state[5]))
+                                return xywh_to_bbox(*track.position_at(time.time())), velocity
+                            return target['bbox'], (0.0, 0.0)
                         
-                        rot_adjust, tilt_adjust = self.calculate_angle_adjustment(
-                            target_bird['bbox'], 
-                            img_width, 
-                            img_height,
-                            zoom_factor
+                        # Absolute angles of all birds in one vectorized call
+                        offsets = calibration.bboxes_to_angles([aim_point(t)[0] for t in targets], img_width, img_height)
+                        candidates = [
+                            {**target, 'angles': (current_rotation + offset[0], current_tilt + offset[1])}
+                            for target, offset in zip(targets, offsets)
+                        ]
+                        plan = plan_shots(
+                            (current_rotation, current_tilt), candidates,
+                            pan_speed=self.turret_pan_speed, tilt_speed=self.turret_tilt_speed,
+                            settle_time=self.aim_settle_time, max_shots=self.shot_max_per_stop,
+                            water_budget_ms=self.shot_water_budget_ms, shot_duration_ms=self.shot_duration_ms
                         )
+                        logger.info(f"🗺️ Shot plan: {len(plan['shots'])} shot(s), {len(plan['skipped'])} skipped, "
+                                    f"expected {plan['total_time']:.1f}s")
                         
-                        # Calculate new position
-                        target_rotation = current_rotation + rot_adjust
-                        target_tilt = current_tilt + tilt_adjust
+                        async def move(rotation, tilt):
+                            aim_command = {
+                                "type": "move",
+                                "position": {
+                                    "rot": int(round(rotation)),
+                                    "tilt": int(round(tilt))
+                                },
+                                "speed": 1
+                            }
+                            mqtt_client.publish(topic, json.dumps(aim_command))
+                            self.device_moving[device_ip] = True
+                            await self.wait_for_movement_complete(device_ip, timeout=10)
+                            await asyncio.sleep(self.aim_settle_time)  # Brief stabilization
                         
-                        logger.info(f"🎯 Moving from ({current_rotation}°, {current_tilt}°) to ({target_rotation:.1f}°, {target_tilt:.1f}°)")
+                        async def capture():
+                            return await self.capture_frame(rtsp_url) if rtsp_url else None
                         
-                        # Move to target
-                        aim_command = {
-                            "type": "move",
-                            "position": {
-                                "rot": int(target_rotation),
-                                "tilt": int(target_tilt)
-                            },
-                            "speed": 1
-                        }
-                        mqtt_client.publish(topic, json.dumps(aim_command))
-                        self.device_moving[device_ip] = True
+                        async def detect(roi_frame):
+                            status, result = await self.request_cv_analysis(roi_frame)
+                            if status != 200:
+                                return []
+                            return [d for d in result.get('detections', []) if d.get('class') == 'bird']
                         
-                        # Wait for movement
-                        await self.wait_for_movement_complete(device_ip, timeout=10)
-                        await asyncio.sleep(0.5)  # Brief stabilization
+                        async def fire():
+                            shoot_command = {
+                                "type": "shoot",
+                                "duration": self.shot_duration_ms
+                            }
+                            mqtt_client.publish(topic, json.dumps(shoot_command))
+                            logger.info(f"💥 Shot fired at target bird!")
                         
-                        # Shoot
-                        shoot_command = {
-                            "type": "shoot",
-                            "duration": 300
-                        }
-                        mqtt_client.publish(topic, json.dumps(shoot_command))
-                        logger.info(f"💥 Shot fired at target bird!")
+                        # Re-detect around the aim point after the move (camera streams only)
+                        controller = AimController(
+                            move, capture, detect, fire, calibration,
+                            max_refinements=self.aim_max_refinements if rtsp_url else 0,
+                            tolerance_deg=self.aim_tolerance,
+                            time_budget=self.aim_time_budget
+                        )
+                        
+                        position = (current_rotation, current_tilt)
+                        for shot_number, shot in enumerate(plan['shots'], 1):
+                            target_bbox, velocity = aim_point(shot)
+                            rotation, tilt = calibration.bbox_to_angles(target_bbox, img_width, img_height)
+                            offset = (current_rotation + rotation - position[0], current_tilt + tilt - position[1])
+                            target_size = max(target_bbox.get('width', 0), target_bbox.get('height', 0))
+                            logger.info(f"🎯 Shot {shot_number}/{len(plan['shots'])}: aiming from ({position[0]:.1f}°, {position[1]:.1f}°), "
+                                        f"offset=({offset[0]:.2f}°, {offset[1]:.2f}°)")
+                            
+                            aim_report = await controller.aim_and_fire(
+                                position, offset, target_size,
+                                velocity=velocity, lead_time=self.tracking_aim_lead
+                            )
+                            await self.send_monitor_event(device, 'shot_fired', {
+                                'message': f"Schuss {shot_number}/{len(plan['shots'])} nach {aim_report['time_to_shot']:.1f}s "
+                                           f"({len(aim_report['refinements'])} Korrekturen)",
+                                'shot': shot_number,
+                                'planned_shots': len(plan['shots']),
+                                'target': aim_report['target'],
+                                'refinements': aim_report['refinements'],
+                                'time_to_shot': aim_report['time_to_shot']
+                            })
+                            position = tuple(aim_report['target'])
+                            
+                            # Let the shot finish before the next move
+                            await asyncio.sleep(self.shot_duration_ms / 1000)
                         
-                        await asyncio.sleep(1.5)  # Wait for shoot to complete
+                        await asyncio.sleep(1.2)  # Wait for the last shot to complete
                         
                         # Return to original position
                         return_command = {
@@ -1199,6 +1600,8 @@ class HardwareMonitor:
                     async with session.get(f"{self.api_url}/api/devices") as response:
                         if response.status == 200:
                             devices = await response.json()
+                            if self.shard:
+                                devices = self.shard.filter(devices)
                             
                             for device in devices:
                                 await self.check_device_status(device)
@@ -1265,6 +1668,8 @@ class HardwareMonitor:
                     async with session.get(f"{self.api_url}/api/devices") as response:
                         if response.status == 200:
                             devices = await response.json()
+                            if self.shard:
+                                devices = self.shard.filter(devices)
                             
                             for device in devices:
                                 if device.get('camera', {}).get('rtspUrl'):
@@ -1295,6 +1700,17 @@ class HardwareMonitor:
     async def capture_frame(self, rtsp_url: str) -> Optional[np.ndarray]:
         """Capture a frame from RTSP stream"""
         try:
+            # A frame from the persistent stream if it is up - no reconnect, and newer than this call
+            stream = self.camera_streams.get(rtsp_url)
+            if stream:
+                item = await stream.next_frame(time.time(), 2.0)
+                if item is not None:
+                    frame = item[1]
+                    if self.recorder:
+                        self.recorder.frame(source_key(rtsp_url), frame)
+                    return frame
+                logger.warning("⚠️ No frame from persistent camera stream, reconnecting")
+            
             with self.camera_lock:
                 cap = cv2.VideoCapture(rtsp_url)
                 
@@ -1316,6 +1732,8 @@ class HardwareMonitor:
                 if ret and frame is not None:
                     height, width = frame.shape[:2]
                     logger.debug(f"📸 Frame captured from RTSP: {width}x{height} pixels (attempt {attempt})")
+                    if self.recorder:
+                        self.recorder.frame(source_key(rtsp_url), frame)
                     return frame
                 else:
                     logger.warning(f"❌ Could not read frame from RTSP stream after {attempt} attempts (ret={ret})")
@@ -1325,26 +1743,54 @@ class HardwareMonitor:
             logger.error(f"❌ Error capturing frame: {e}")
             return None
     
-    async def load_local_image(self, image_path: str) -> Optional[np.ndarray]:
-        """Load image from local file"""
+    async def capture_frames(self, rtsp_url: str, count: int, interval: float) -> List[tuple]:
+        """Capture a burst of timestamped frames from the persistent camera stream"""
+        try:
+            stream = self.camera_streams.open(rtsp_url)
+            frames = []
+            last = time.time()
+            next_time = last
+            while len(frames) < count:
+                await asyncio.sleep(max(next_time - time.time(), 0))
+                item = await stream.next_frame(last, max(1.0, 4 * interval))
+                if item is None:
+                    logger.warning(f"❌ No frame from camera stream for burst capture")
+                    break
+                frames.append(item)
+                last = item[0]
+                next_time = last + interval
+            if self.recorder:
+                self.recorder.burst(source_key(rtsp_url), frames)
+            return frames
+        except Exception as e:
+            logger.error(f"❌ Error capturing frame burst: {e}")
+            return []
+    
+    async def load_local_image(self, image_path: str, consumer: str = None) -> Optional[np.ndarray]:
+        """Load image from local file, or the next image if the path is a directory
+        
+        Frames come from the shared cache and are read-only.
+        """
         try:
+            source = source_key(image_path, consumer)
             # Support both absolute and relative paths
             if not os.path.isabs(image_path):
                 # Relative path - resolve from project root (one level up from hardware-monitor)
                 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
                 image_path = os.path.join(project_root, image_path)
-                logger.info(f"Resolved relative path to: {image_path}")
+                logger.debug(f"Resolved relative path to: {image_path}")
             
             if not os.path.exists(image_path):
                 logger.error(f"❌ Local image file not found: {image_path}")
                 return None
             
-            # Load image using OpenCV
-            frame = cv2.imread(image_path)
+            # Decode off the event loop (cache hits only cost a stat)
+            loop = asyncio.get_running_loop()
+            frame = await loop.run_in_executor(None, self.local_images.load, image_path, consumer)
             
             if frame is not None:
-                height, width = frame.shape[:2]
-                logger.info(f"✅ Loaded local image: {width}x{height} pixels from {image_path}")
+                if self.recorder:
+                    self.recorder.frame(source, frame)
                 return frame
             else:
                 logger.error(f"❌ Could not load image from {image_path}")
@@ -1402,7 +1848,15 @@ class HardwareMonitor:
 async def main():
     """Main function"""
     monitor = HardwareMonitor()
-    await monitor.start()
+    if monitor.shard:
+        # docker stop sends SIGTERM - shut down through the finally below
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await monitor.start()
+    finally:
+        if monitor.shard:
+            # Hand the devices to the other instances right away instead of after the lease TTL
+            monitor.shard.leave()
 
 if __name__ == "__main__":
     asyncio.run(main())
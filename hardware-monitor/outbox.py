@@ -0,0 +1,327 @@
+"""
+Durable local outbox for detections.
+
+Detections are appended to segment files on disk (metadata JSON plus raw
+JPEG bytes) by a writer thread, so the control loop only hands a record
+over and moves on. A background uploader drains the segments oldest
+first in batches and retries with exponential backoff while the API is
+slow or down. A cursor file records how far uploads got, so nothing is
+sent twice or lost across restarts. When the outbox grows beyond
+max_bytes, the oldest segments are evicted.
+
+Record layout: MAGIC, metadata length, blob count (">4sII"), metadata
+JSON, then per blob its length (">I") and bytes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'TBOX'
+HEADER = struct.Struct('>4sII')
+BLOB_LENGTH = struct.Struct('>I')
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+
+
+def encode_record(metadata, blobs):
+    meta = json.dumps(metadata).encode('utf-8')
+    parts = [HEADER.pack(MAGIC, len(meta), len(blobs)), meta]
+    for blob in blobs:
+        parts.append(BLOB_LENGTH.pack(len(blob)))
+        parts.append(bytes(blob))
+    return b''.join(parts)
+
+
+def read_record(f):
+    """Next record from a segment file, or None at the end / on a torn tail"""
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    magic, meta_length, blob_count = HEADER.unpack(header)
+    if magic != MAGIC:
+        return None
+    meta = f.read(meta_length)
+    if len(meta) < meta_length:
+        return None
+    blobs = []
+    for _ in range(blob_count):
+        length = f.read(BLOB_LENGTH.size)
+        if len(length) < BLOB_LENGTH.size:
+            return None
+        (size,) = BLOB_LENGTH.unpack(length)
+        blob = f.read(size)
+        if len(blob) < size:
+            return None
+        blobs.append(blob)
+    return json.loads(meta.decode('utf-8')), blobs
+
+
+class Outbox:
+    """Append-only segment store with a background uploader
+
+    upload(records): async, gets a list of (metadata, blobs) and returns how many
+    of them (from the front) were delivered; raising counts as zero.
+    """
+
+    def __init__(self, directory, upload, max_bytes=512 * 1024 * 1024, segment_bytes=16 * 1024 * 1024,
+                 batch_size=8, retry_base=1.0, retry_max=300.0):
+        self.directory = directory
+        self.upload = upload
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.cursor_path = os.path.join(directory, 'cursor.json')
+
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # Segment sequence number -> committed (fully written) size in bytes
+        self.segments = {}
+        self.cursor = (0, 0)  # (segment, offset) of the next record to upload
+        self.active = None
+        self.active_file = None
+        self.pending = queue.SimpleQueue()
+        self.wakeup = None
+        self.stats = {"written": 0, "uploaded": 0, "evicted": 0, "failed_attempts": 0}
+        self.recover()
+
+        self.writer = threading.Thread(target=self.write_loop, name='outbox-writer', daemon=True)
+        self.writer.start()
+
+    # --- segments -----------------------------------------------------
+
+    def segment_path(self, sequence):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{sequence:012d}{SEGMENT_SUFFIX}")
+
+    def recover(self):
+        """Rebuild segment sizes and the cursor after a restart, dropping torn tails"""
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+                continue
+            sequence = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            path = self.segment_path(sequence)
+            valid = 0
+            with open(path, 'rb') as f:
+                while read_record(f) is not None:
+                    valid = f.tell()
+            if valid < os.path.getsize(path):
+                logger.warning(f"Outbox segment {name} has a torn record, truncating to {valid} bytes")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid)
+            self.segments[sequence] = valid
+
+        try:
+            with open(self.cursor_path) as f:
+                cursor = json.load(f)
+            self.cursor = (cursor['segment'], cursor['offset'])
+        except (OSError, ValueError, KeyError):
+            self.cursor = (min(self.segments), 0) if self.segments else (0, 0)
+
+        # New records always go to a fresh segment
+        self.open_segment(max(self.segments, default=self.cursor[0] - 1) + 1)
+
+    def open_segment(self, sequence):
+        if self.active_file:
+            self.active_file.close()
+        self.active = sequence
+        self.active_file = open(self.segment_path(sequence), 'ab')
+        self.segments[sequence] = 0
+
+    def save_cursor(self):
+        tmp = f"{self.cursor_path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({"segment": self.cursor[0], "offset": self.cursor[1]}, f)
+        os.replace(tmp, self.cursor_path)
+
+    def size(self):
+        with self.lock:
+            return sum(self.segments.values())
+
+    def backlog(self):
+        """Bytes not uploaded yet"""
+        with self.lock:
+            segment, offset = self.cursor
+            return sum(size for seq, size in self.segments.items() if seq > segment) + \
+                max(self.segments.get(segment, 0) - offset, 0)
+
+    # --- writing ------------------------------------------------------
+
+    def put(self, metadata, blobs=()):
+        """Queue a record for writing; returns immediately"""
+        self.pending.put((metadata, list(blobs)))
+
+    def write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            try:
+                self.append(encode_record(*item))
+            except Exception as e:
+                logger.error(f"Outbox write failed, record lost: {e}")
+
+    def append(self, record):
+        with self.lock:
+            if self.segments[self.active] and self.segments[self.active] + len(record) > self.segment_bytes:
+                self.open_segment(self.active + 1)
+            self.active_file.write(record)
+            self.active_file.flush()
+            os.fsync(self.active_file.fileno())
+            self.segments[self.active] += len(record)
+            self.stats["written"] += 1
+            self.evict()
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def evict(self):
+        """Drop the oldest segments while over the size cap (lock held)"""
+        while sum(self.segments.values()) > self.max_bytes and len(self.segments) > 1:
+            oldest = min(self.segments)
+            if oldest == self.active:
+                break
+            lost = self.count_records(oldest, self.cursor[1] if self.cursor[0] == oldest else 0) \
+                if self.cursor[0] <= oldest else 0
+            del self.segments[oldest]
+            os.remove(self.segment_path(oldest))
+            self.stats["evicted"] += lost
+            if self.cursor[0] <= oldest:
+                self.cursor = (min(self.segments), 0)
+                self.save_cursor()
+            logger.warning(f"Outbox over {self.max_bytes} bytes, evicted segment {oldest} ({lost} pending records)")
+
+    def count_records(self, sequence, offset):
+        count = 0
+        with open(self.segment_path(sequence), 'rb') as f:
+            f.seek(offset)
+            while read_record(f) is not None:
+                count += 1
+        return count
+
+    # --- uploading ----------------------------------------------------
+
+    def read_batch(self):
+        """Up to batch_size records from the cursor on, with the position after each"""
+        while True:
+            with self.lock:
+                segment, offset = self.cursor
+                segments = dict(self.segments)
+            try:
+                return self.read_records(segment, offset, segments)
+            except FileNotFoundError:
+                # Usually evicted by the writer since the snapshot (which also moved the cursor);
+                # a file deleted behind our back is dropped here, so this always makes progress
+                self.forget_missing()
+
+    def forget_missing(self):
+        with self.lock:
+            for sequence in [s for s in self.segments if s != self.active]:
+                if not os.path.exists(self.segment_path(sequence)):
+                    logger.error(f"Outbox segment {sequence} disappeared, its records are lost")
+                    del self.segments[sequence]
+            if self.cursor[0] not in self.segments:
+                self.cursor = (min(self.segments), 0)
+                self.save_cursor()
+
+    def read_records(self, segment, offset, segments):
+        batch = []
+        while len(batch) < self.batch_size and segment in segments:
+            committed = segments[segment]
+            if offset >= committed:
+                if segment == max(segments):
+                    break
+                # Segment fully read - continue with the next one
+                segment, offset = min(s for s in segments if s > segment), 0
+                continue
+            try:
+                f = open(self.segment_path(segment), 'rb')
+            except FileNotFoundError:
+                if batch:
+                    # Deliver what was read; advance() copes with the missing segment
+                    break
+                raise
+            with f:
+                f.seek(offset)
+                while len(batch) < self.batch_size and f.tell() < committed:
+                    record = read_record(f)
+                    if record is None:
+                        break
+                    offset = f.tell()
+                    batch.append((record, (segment, offset)))
+            if offset < committed and len(batch) < self.batch_size:
+                # Unreadable remainder - skip the rest of this segment
+                logger.error(f"Outbox segment {segment} is corrupt after offset {offset}, skipping")
+                offset = committed
+        return batch
+
+    def advance(self, position):
+        """Move the cursor past delivered records and delete finished segments"""
+        with self.lock:
+            # Only forward - eviction may have moved the cursor past this batch meanwhile
+            if position > self.cursor:
+                self.cursor = position
+            if self.cursor[0] not in self.segments:
+                # Its segment was evicted during the upload - go on with the oldest one left
+                self.cursor = (min(self.segments), 0)
+            for sequence in [s for s in self.segments if s < self.cursor[0] and s != self.active]:
+                del self.segments[sequence]
+                try:
+                    os.remove(self.segment_path(sequence))
+                except OSError:
+                    pass
+            self.save_cursor()
+
+    async def run(self):
+        """Drain the outbox forever; call as a background task"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        self.wakeup = lambda: loop.call_soon_threadsafe(event.set)
+        delay = 0.0
+        while True:
+            try:
+                batch = await loop.run_in_executor(None, self.read_batch)
+            except Exception as e:
+                # The uploader must outlive a bad segment - the control loop runs in the same gather
+                logger.error(f"Outbox read failed: {e}")
+                await asyncio.sleep(self.retry_base)
+                continue
+            if not batch:
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=30)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                delivered = await self.upload([record for record, _ in batch])
+            except Exception as e:
+                logger.warning(f"Outbox upload failed: {e}")
+                delivered = 0
+
+            if delivered:
+                self.stats["uploaded"] += delivered
+                await loop.run_in_executor(None, self.advance, batch[delivered - 1][1])
+            if delivered < len(batch):
+                self.stats["failed_attempts"] += 1
+                delay = min(max(delay * 2, self.retry_base), self.retry_max)
+                # Jitter so a fleet of monitors doesn't retry in lockstep
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                delay = 0.0
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join(timeout=5)
+        with self.lock:
+            if self.active_file:
+                self.active_file.close()
+                self.active_file = None
@@ -0,0 +1,168 @@
+"""
+Adaptive patrol scheduling for route mode.
+
+Instead of walking the route strictly round-robin, the scheduler keeps
+exponentially decaying bird statistics per device, route point and time
+of day (buckets of bucket_hours) and picks the next point by expected
+birds since its last visit: activity rate x time since visit. Hot points
+come up often, cold points rarely, but any point not visited for
+max_revisit seconds is visited next (the most overdue first), so nothing
+is starved: revisits stay within max_revisit plus the stop in progress,
+as long as max_revisit >= points x time per stop.
+
+Rates are shrunk towards the point's all-day rate and a small prior, so
+sparse time-of-day buckets don't swing the schedule. The state can be
+persisted to a JSON file so it survives restarts.
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class DecayingCounter:
+    """Birds seen and visits made, both decaying with the same half-life"""
+
+    __slots__ = ('birds', 'visits', 'updated')
+
+    def __init__(self, birds=0.0, visits=0.0, updated=None):
+        self.birds = birds
+        self.visits = visits
+        self.updated = updated
+
+    def decay(self, now, half_life):
+        if self.updated is not None and now > self.updated:
+            factor = 0.5 ** ((now - self.updated) / half_life)
+            self.birds *= factor
+            self.visits *= factor
+        self.updated = now
+
+    def add(self, birds, now, half_life):
+        self.decay(now, half_life)
+        self.birds += birds
+        self.visits += 1
+
+
+class PatrolScheduler:
+    """Chooses the next route point per device
+
+    half_life: seconds after which old observations count half
+    max_revisit: seconds after which a point is visited regardless of activity
+    bucket_hours: width of the time-of-day buckets
+    prior_rate / prior_weight: birds per visit assumed for points without history
+    """
+
+    def __init__(self, half_life=3 * 24 * 3600, max_revisit=600, bucket_hours=2,
+                 prior_rate=0.1, prior_weight=2.0, state_file=None):
+        self.half_life = half_life
+        self.max_revisit = max_revisit
+        self.bucket_hours = bucket_hours
+        self.prior_rate = prior_rate
+        self.prior_weight = prior_weight
+        self.state_file = state_file
+        # (device, point) -> {"all": DecayingCounter, bucket: DecayingCounter, ...}
+        self.stats = {}
+        # (device, point) -> timestamp of the last visit
+        self.last_visit = {}
+        if state_file:
+            self.load()
+
+    def bucket(self, now):
+        return int(datetime.fromtimestamp(now).hour // self.bucket_hours)
+
+    def rate(self, device_id, point, now):
+        """Expected birds per visit at this point and time of day"""
+        counters = self.stats.get((device_id, point), {})
+        overall = counters.get('all')
+        overall_rate = self.prior_rate
+        if overall is not None:
+            overall.decay(now, self.half_life)
+            overall_rate = (overall.birds + self.prior_rate * self.prior_weight) / (overall.visits + self.prior_weight)
+
+        current = counters.get(self.bucket(now))
+        if current is None:
+            return overall_rate
+        current.decay(now, self.half_life)
+        return (current.birds + overall_rate * self.prior_weight) / (current.visits + self.prior_weight)
+
+    def next_point(self, device_id, points, current=None, now=None):
+        """Index of the route point to visit next"""
+        now = time.time() if now is None else now
+        if points <= 1:
+            return 0
+
+        candidates = [p for p in range(points) if p != current]
+        never_visited = [p for p in candidates if (device_id, p) not in self.last_visit]
+        if never_visited:
+            return never_visited[0]
+
+        staleness = {p: now - self.last_visit[(device_id, p)] for p in candidates}
+        overdue = [p for p in candidates if staleness[p] >= self.max_revisit]
+        if overdue:
+            return max(overdue, key=lambda p: staleness[p])
+
+        # Birds expected to have arrived since the last visit
+        return max(candidates, key=lambda p: self.rate(device_id, p, now) * staleness[p])
+
+    def record_visit(self, device_id, point, birds, now=None):
+        now = time.time() if now is None else now
+        counters = self.stats.setdefault((device_id, point), {})
+        for key in ('all', self.bucket(now)):
+            counters.setdefault(key, DecayingCounter()).add(birds, now, self.half_life)
+        self.last_visit[(device_id, point)] = now
+        if self.state_file:
+            self.save()
+
+    def snapshot(self, device_id, points, now=None):
+        """Per-point rate and time since visit, for logging / monitor events"""
+        now = time.time() if now is None else now
+        result = []
+        for p in range(points):
+            last = self.last_visit.get((device_id, p))
+            result.append({
+                "point": p,
+                "rate": round(self.rate(device_id, p, now), 3),
+                "since_visit": round(now - last, 1) if last else None
+            })
+        return result
+
+    def save(self):
+        state = {
+            "stats": [
+                {"device": device_id, "point": point, "key": key,
+                 "birds": counter.birds, "visits": counter.visits, "updated": counter.updated}
+                for (device_id, point), counters in self.stats.items()
+                for key, counter in counters.items()
+            ],
+            "last_visit": [
+                {"device": device_id, "point": point, "time": timestamp}
+                for (device_id, point), timestamp in self.last_visit.items()
+            ]
+        }
+        tmp = f"{self.state_file}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not save patrol state to {self.state_file}: {e}")
+
+    def load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load patrol state from {self.state_file}: {e}")
+            return
+        for entry in state.get("stats", []):
+            key = entry["key"] if entry["key"] == 'all' else int(entry["key"])
+            self.stats.setdefault((entry["device"], entry["point"]), {})[key] = DecayingCounter(
+                entry["birds"], entry["visits"], entry["updated"])
+        for entry in state.get("last_visit", []):
+            self.last_visit[(entry["device"], entry["point"])] = entry["time"]
@@ -0,0 +1,168 @@
+"""
+Recording of real patrol cycles for offline replay (see loadtest/replay.py).
+
+With RECORD_PATH set, the monitor appends everything that enters it from
+outside to one file: device lists from the API, MQTT status messages
+(and the commands they answer), camera frames (single captures and bursts, as JPEG), camera
+stabilization waits and CV service responses, each with its wall-clock timestamp. Records use the outbox
+layout (metadata JSON plus binary blobs) and are written by a background
+thread, so recording costs the control loop a queue put.
+
+CV responses are stored with a perceptual hash of the analysed frame,
+so the replay can match them to the re-encoded recorded frames. Camera
+URLs are reduced to host and path (no credentials) as source keys, and
+passwords are masked in the recorded device documents.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+from outbox import encode_record, read_record
+
+logger = logging.getLogger(__name__)
+
+MASK = '***'
+
+
+def source_key(url_or_path, consumer=None):
+    """Stable, credential-free key for a camera stream or local image source"""
+    parts = urlsplit(url_or_path or '')
+    if parts.scheme and parts.hostname:
+        key = f"{parts.scheme}://{parts.hostname}{f':{parts.port}' if parts.port else ''}{parts.path}"
+    else:
+        key = f"local:{url_or_path}"
+    return f"{key}#{consumer}" if consumer else key
+
+
+def perceptual_hash(image):
+    """64-bit difference hash (dHash), stable under JPEG re-encoding"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def mask_device(device):
+    """Copy of a device document without camera credentials"""
+    device = json.loads(json.dumps(device, default=str))
+    camera = device.get('camera') or {}
+    if camera.get('rtspUrl'):
+        parts = urlsplit(camera['rtspUrl'])
+        if parts.password:
+            camera['rtspUrl'] = camera['rtspUrl'].replace(f":{parts.password}@", f":{MASK}@", 1)
+    tapo = camera.get('tapo') or {}
+    if tapo.get('password'):
+        tapo['password'] = MASK
+    return device
+
+
+def read_recording(path):
+    """All records of a recording file as (metadata, blobs), in order"""
+    records = []
+    with open(path, 'rb') as f:
+        while True:
+            record = read_record(f)
+            if record is None:
+                return records
+            records.append(record)
+
+
+class Recorder:
+
+    def __init__(self, path, jpeg_quality=90, max_bytes=None):
+        self.path = path
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        # Records are appended, so an existing recording counts towards the limit
+        self.written = os.path.getsize(path) if os.path.exists(path) else 0
+        # Set when the size limit is reached; later records are dropped
+        self.stopped = False
+        self.last_devices = None
+        self.pending = queue.SimpleQueue()
+        self.file = open(path, 'ab')
+        self.writer = threading.Thread(target=self.write_loop, name='recorder', daemon=True)
+        self.writer.start()
+        # Replay time starts here, when the monitor starts up
+        self.put('start', {})
+        logger.info(f"⏺️ Recording patrol cycles to {path}")
+
+    def put(self, kind, metadata, frames=(), blobs=()):
+        """Queue a record; frames are JPEG-encoded on the writer thread"""
+        if self.stopped:
+            return
+        self.pending.put(({"kind": kind, "t": time.time(), **metadata}, list(frames), list(blobs)))
+
+    def devices(self, devices):
+        # Only record changes - the control loop fetches the list every few seconds
+        snapshot = json.dumps(devices, sort_keys=True, default=str)
+        if snapshot != self.last_devices:
+            self.last_devices = snapshot
+            self.put('devices', {"devices": [mask_device(d) for d in devices]})
+
+    def mqtt(self, topic, payload: bytes):
+        self.put('mqtt', {"topic": topic}, blobs=[payload])
+
+    def wrap_publish(self, publish):
+        """Record the commands sent through an MQTT client's publish()"""
+        def recording_publish(topic, payload=None, *args, **kwargs):
+            self.put('command', {"topic": topic}, blobs=[payload.encode() if isinstance(payload, str) else payload or b''])
+            return publish(topic, payload, *args, **kwargs)
+        return recording_publish
+
+    def frame(self, source, frame):
+        if frame is not None:
+            self.put('frame', {"source": source}, frames=[frame])
+
+    def burst(self, source, frames):
+        self.put('burst', {"source": source, "timestamps": [t for t, _ in frames]}, frames=[f for _, f in frames])
+
+    def stabilized(self, source, report):
+        self.put('stabilize', {"source": source, **report})
+
+    def cv_response(self, frame, status, result, latency):
+        self.put('cv', {"status": status, "result": result, "latency": latency,
+                        "dhash": perceptual_hash(frame)})
+
+    def write_loop(self):
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            metadata, frames, blobs = item
+            try:
+                encoded = [cv2.imencode('.jpg', frame, params)[1].tobytes() for frame in frames]
+                record = encode_record(metadata, encoded + blobs)
+                if self.max_bytes and self.written + len(record) > self.max_bytes:
+                    logger.warning(f"Recording {self.path} reached its size limit, stopping")
+                    self.stopped = True
+                    self.file.close()
+                    self.drain()
+                    return
+                self.file.write(record)
+                self.file.flush()
+                self.written += len(record)
+            except Exception as e:
+                logger.error(f"Recording write failed: {e}")
+
+    def drain(self):
+        """Drop the records queued before put() saw the stop"""
+        try:
+            while True:
+                self.pending.get_nowait()
+        except queue.Empty:
+            pass
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join(timeout=5)
+        if not self.file.closed:
+            self.file.close()
@@ -0,0 +1,105 @@
+"""
+Image products for events and detection storage.
+
+Frames used to be pushed everywhere as full-resolution JPEGs at default
+quality. Each consumer now gets a rendition sized for it:
+
+- thumbnail: live monitor events (Socket.IO)
+- medium:    stored detections shown in the dashboard
+- full:      original resolution, only attached to confirmed hits
+
+Sizes, quality and the format (JPEG or WebP, if this OpenCV build can
+write it) are configurable. FrameProducts encodes each rendition of a
+frame at most once, however many consumers ask for it.
+"""
+
+import base64
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MIME_TYPES = {'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+
+@dataclass
+class Rendition:
+    name: str
+    max_width: Optional[int]  # None = keep the original size
+    quality: int
+
+
+def data_url(blob: bytes, mime: str) -> str:
+    return f"data:{mime};base64,{base64.b64encode(blob).decode('utf-8')}"
+
+
+class ImageProducts:
+    """Rendition settings shared by all frames"""
+
+    def __init__(self, renditions, image_format='jpeg'):
+        self.renditions = {r.name: r for r in renditions}
+        if image_format == 'webp' and not cv2.haveImageWriter('.webp'):
+            logger.warning("WebP encoding not available in this OpenCV build, using JPEG")
+            image_format = 'jpeg'
+        self.format = image_format if image_format in MIME_TYPES else 'jpeg'
+        self.mime = MIME_TYPES[self.format]
+
+    @classmethod
+    def from_env(cls, getenv):
+        def width(name, default):
+            value = int(getenv(name, default))
+            return value or None
+        return cls([
+            Rendition('thumbnail', width('IMAGE_THUMBNAIL_WIDTH', '320'), int(getenv('IMAGE_THUMBNAIL_QUALITY', '70'))),
+            Rendition('medium', width('IMAGE_MEDIUM_WIDTH', '960'), int(getenv('IMAGE_MEDIUM_QUALITY', '80'))),
+            Rendition('full', None, int(getenv('IMAGE_FULL_QUALITY', '90'))),
+        ], getenv('IMAGE_FORMAT', 'jpeg').lower())
+
+    def encode(self, frame: np.ndarray, name: str) -> bytes:
+        rendition = self.renditions[name]
+        height, width = frame.shape[:2]
+        if rendition.max_width and width > rendition.max_width:
+            scale = rendition.max_width / width
+            frame = cv2.resize(frame, (rendition.max_width, max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        if self.format == 'webp':
+            params = [cv2.IMWRITE_WEBP_QUALITY, rendition.quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, rendition.quality]
+        ok, buffer = cv2.imencode(f'.{self.format}', frame, params)
+        if not ok:
+            raise ValueError(f"Could not encode {name} rendition")
+        return buffer.tobytes()
+
+    def for_frame(self, frame: np.ndarray) -> 'FrameProducts':
+        return FrameProducts(self, frame)
+
+
+class FrameProducts:
+    """Lazily encoded renditions of one frame"""
+
+    def __init__(self, products: ImageProducts, frame: np.ndarray):
+        self.products = products
+        self.frame = frame
+        self.encoded: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def mime(self):
+        return self.products.mime
+
+    def get(self, name: str) -> bytes:
+        """Encoded rendition; safe to call from executor threads"""
+        with self.lock:
+            blob = self.encoded.get(name)
+            if blob is None:
+                blob = self.encoded[name] = self.products.encode(self.frame, name)
+            return blob
+
+    def data_url(self, name: str) -> str:
+        return data_url(self.get(name), self.mime)
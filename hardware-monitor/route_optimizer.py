@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Route order optimization for route-mode patrols.
+
+Route points are visited in their configured order no matter how far
+apart they are. Pan and tilt move at the same time, so a hop costs the
+slower axis plus the settle time; with a continuously rotating head the
+pan distance wraps around at 360 degrees. The route is a closed loop,
+so the optimal order is a TSP tour: exact for small routes, nearest
+neighbour plus 2-opt for larger ones (see shot_planner).
+
+Cycle time = travel + dwell per stop (stabilization, capture, CV and
+the inactivity wait), reported for the configured and the optimized
+order.
+
+Usage (from hardware-monitor/):
+    python -m route_optimizer route.json
+    python -m route_optimizer device.json --pan-speed 45 --dwell 25 --output optimized.json
+The input is a list of route coordinates or a device document with
+actions.route.coordinates.
+"""
+
+import argparse
+import json
+import sys
+
+from shot_planner import EXACT_LIMIT, held_karp, nearest_neighbour_2opt, tour_time, travel_time
+
+
+def route_points(coordinates):
+    return [(float(c.get('rotation', 0)), float(c.get('tilt', 0))) for c in coordinates]
+
+
+def cycle_time(points, order, cost, dwell_time):
+    """Seconds for one full loop over the route in the given order"""
+    if not points:
+        return 0.0
+    start = points[order[0]]
+    rest = order[1:]
+    return tour_time(start, points, rest, cost) + dwell_time * len(points)
+
+
+def optimize_route(coordinates, pan_speed=60.0, tilt_speed=30.0, settle_time=0.5, dwell_time=0.0, wrap=360.0):
+    """Reorder route coordinates to minimize the patrol cycle time
+
+    Returns {"order": original indices in visiting order, "coordinates": reordered
+    coordinates, "before": {...}, "after": {...}} with travel and cycle times.
+    """
+    points = route_points(coordinates)
+
+    def cost(a, b):
+        return travel_time(a, b, pan_speed, tilt_speed, settle_time, wrap)
+
+    original = list(range(len(points)))
+    if len(points) <= 3:
+        # Every closed loop over three points is the same tour
+        order = original
+    else:
+        # The loop is closed, so keep the first configured point as the start
+        rest = points[1:]
+        if len(rest) <= EXACT_LIMIT:
+            tail = held_karp(points[0], rest, cost)
+        else:
+            tail = nearest_neighbour_2opt(points[0], rest, cost)
+        order = [0] + [i + 1 for i in tail]
+        # Never report a worse order than the configured one
+        if cycle_time(points, order, cost, 0) >= cycle_time(points, original, cost, 0):
+            order = original
+
+    def report(o):
+        travel = cycle_time(points, o, cost, 0) if points else 0.0
+        return {"travel_time": round(travel, 2), "cycle_time": round(travel + dwell_time * len(points), 2)}
+
+    before, after = report(original), report(order)
+    return {
+        "order": order,
+        "coordinates": [coordinates[i] for i in order],
+        "before": before,
+        "after": after,
+        "saved": round(before["cycle_time"] - after["cycle_time"], 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reorder route points to minimize pan/tilt travel")
+    parser.add_argument('input', help="JSON file with route coordinates or a device document")
+    parser.add_argument('--pan-speed', type=float, default=60.0, help="deg/s")
+    parser.add_argument('--tilt-speed', type=float, default=30.0, help="deg/s")
+    parser.add_argument('--settle-time', type=float, default=0.5, help="Seconds per move after arrival")
+    parser.add_argument('--dwell', type=float, default=0.0, help="Seconds spent at each stop (stabilize, capture, CV, wait)")
+    parser.add_argument('--wrap', type=float, default=360.0, help="Rotation wrap-around in degrees (0 = head cannot turn through)")
+    parser.add_argument('--output', help="Write the optimized coordinates as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.input) as f:
+        data = json.load(f)
+    coordinates = data if isinstance(data, list) else data.get('actions', {}).get('route', {}).get('coordinates', [])
+    if not coordinates:
+        print("No route coordinates found", file=sys.stderr)
+        sys.exit(1)
+
+    result = optimize_route(coordinates, args.pan_speed, args.tilt_speed, args.settle_time, args.dwell, args.wrap or None)
+    print(f"order:  {' -> '.join(str(i + 1) for i in result['order'])}")
+    print(f"before: travel {result['before']['travel_time']}s, cycle {result['before']['cycle_time']}s")
+    print(f"after:  travel {result['after']['travel_time']}s, cycle {result['after']['cycle_time']}s "
+          f"(saves {result['saved']}s per cycle)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result['coordinates'], f, indent=2)
+        print(f"Optimized route written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Device sharding across several hardware-monitor instances.
+
+With SHARD_STORE set, each instance (node) only drives the devices it
+holds a lease for. Nodes and leases live in a small SQLite database
+shared by all instances (a file on a shared volume):
+
+- nodes heartbeat every `heartbeat` seconds; a node whose heartbeat is
+  older than the lease TTL is considered dead
+- the live nodes form a consistent-hash ring (`vnodes` points per node)
+  and each device belongs to the ring owner of its device ID, so a node
+  joining or leaving moves only about 1/N of the devices
+- a node acquires the lease of every device it owns; a lease is taken
+  over only when it is free, released, or expired, in one atomic UPSERT
+- leases are renewed every heartbeat and released when the ring moves a
+  device away - but never in the middle of that device's patrol cycle
+
+A device is only ever driven under a lease that is still valid with a
+safety margin, checked before every cycle and before shooting. A node
+that loses its store or stalls stops driving its devices before their
+leases can expire and be picked up elsewhere, so no turret gets commands
+from two instances. A node that dies unannounced loses its devices once
+its leases expire (SHARD_LEASE_TTL); a clean shutdown releases them at once.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    device_id TEXT PRIMARY KEY,
+    node_id TEXT NOT NULL,
+    expires REAL NOT NULL,
+    epoch INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+
+def ring_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = sorted(nodes)
+        points = sorted((ring_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes))
+        self.hashes = [h for h, _ in points]
+        self.owners = [node for _, node in points]
+
+    def owner(self, key):
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, ring_hash(key)) % len(self.hashes)
+        return self.owners[index]
+
+
+class LeaseStore:
+    """SQLite-backed node registry and device leases (blocking - use from one thread)"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, timeout=10, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+
+    def heartbeat(self, node_id, now):
+        self.db.execute('INSERT INTO nodes (node_id, heartbeat) VALUES (?, ?) '
+                        'ON CONFLICT(node_id) DO UPDATE SET heartbeat = excluded.heartbeat', (node_id, now))
+
+    def live_nodes(self, now, ttl):
+        return [row[0] for row in self.db.execute('SELECT node_id FROM nodes WHERE heartbeat >= ?', (now - ttl,))]
+
+    def acquire(self, device_id, node_id, now, ttl):
+        """Take or renew a lease; returns True if node_id holds it afterwards"""
+        self.db.execute(
+            'INSERT INTO leases (device_id, node_id, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT(device_id) DO UPDATE SET '
+            'epoch = epoch + (leases.node_id != excluded.node_id), '
+            'node_id = excluded.node_id, expires = excluded.expires '
+            'WHERE leases.node_id = excluded.node_id OR leases.expires < ?',
+            (device_id, node_id, now + ttl, now)
+        )
+        row = self.db.execute('SELECT node_id FROM leases WHERE device_id = ?', (device_id,)).fetchone()
+        return row is not None and row[0] == node_id
+
+    def release(self, device_id, node_id):
+        self.db.execute('DELETE FROM leases WHERE device_id = ? AND node_id = ?', (device_id, node_id))
+
+    def leave(self, node_id):
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            self.db.execute('DELETE FROM leases WHERE node_id = ?', (node_id,))
+            self.db.execute('DELETE FROM nodes WHERE node_id = ?', (node_id,))
+            self.db.execute('COMMIT')
+        except Exception:
+            self.db.execute('ROLLBACK')
+            raise
+
+
+class Shard:
+    """This instance's share of the fleet"""
+
+    def __init__(self, store_path, node_id=None, lease_ttl=30.0, heartbeat=5.0, vnodes=64):
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_ttl = lease_ttl
+        self.heartbeat = heartbeat
+        self.vnodes = vnodes
+        # Stop driving a device this long before its lease could be taken over
+        self.safety_margin = max(heartbeat, lease_ttl / 3)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shard')
+        self.store_path = store_path
+        self.store = None
+        self.devices = set()   # device IDs seen in the last device list
+        self.leases = {}       # device_id -> local expiry (monotonic)
+        self.draining = set()  # devices handed over, lease released next round
+        self.busy = set()      # devices in the middle of a patrol cycle
+        self.ring = HashRing([self.node_id], vnodes)
+
+    @classmethod
+    def from_env(cls, getenv):
+        store = getenv('SHARD_STORE')
+        if not store:
+            return None
+        return cls(
+            store,
+            node_id=getenv('SHARD_NODE_ID') or None,
+            lease_ttl=float(getenv('SHARD_LEASE_TTL', '30')),
+            heartbeat=float(getenv('SHARD_HEARTBEAT', '5')),
+            vnodes=int(getenv('SHARD_VNODES', '64'))
+        )
+
+    def owns(self, device_id):
+        """True while this node may drive the device (lease valid with margin)"""
+        expires = self.leases.get(str(device_id))
+        return expires is not None and time.monotonic() < expires - self.safety_margin
+
+    def filter(self, devices):
+        """Devices of a device list this node drives; also records the list for rebalancing"""
+        self.devices = {str(d.get('_id') or d.get('deviceId')) for d in devices}
+        return [d for d in devices if self.owns(d.get('_id') or d.get('deviceId'))]
+
+    def begin_cycle(self, device_id):
+        self.busy.add(str(device_id))
+
+    def end_cycle(self, device_id):
+        self.busy.discard(str(device_id))
+
+    def open_store(self):
+        if self.store is None:
+            self.store = LeaseStore(self.store_path)
+        return self.store
+
+    def sync(self, devices, held, draining, busy):
+        """One coordination round (store thread): heartbeat, ring, renew/acquire/release
+
+        A device moving to another node is handed over in two rounds: first
+        it is dropped locally (draining - no new cycle starts, a running one
+        keeps the lease renewed), then its lease is released once it is idle.
+        """
+        store = self.open_store()
+        # Local expiry counts from before the writes, so it never outlives the stored one
+        started = time.monotonic()
+        now = time.time()
+        store.heartbeat(self.node_id, now)
+        ring = HashRing(store.live_nodes(now, self.lease_ttl), self.vnodes)
+        leases = {}
+        drain = []
+        for device_id in sorted(devices | held | draining):
+            wanted = device_id in devices and ring.owner(device_id) == self.node_id
+            if wanted or device_id in busy:
+                if store.acquire(device_id, self.node_id, now, self.lease_ttl):
+                    leases[device_id] = started + self.lease_ttl
+            elif device_id in draining:
+                store.release(device_id, self.node_id)
+            elif device_id in held:
+                drain.append(device_id)
+        return ring, leases, drain
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        logger.info(f"🧩 Shard node {self.node_id} using lease store {self.store_path}")
+        while True:
+            try:
+                ring, leases, drain = await loop.run_in_executor(
+                    self.executor, self.sync, set(self.devices), set(self.leases), set(self.draining), set(self.busy)
+                )
+                if ring.nodes != self.ring.nodes:
+                    logger.info(f"🧩 Shard ring changed: {len(ring.nodes)} node(s) {ring.nodes}")
+                gained = set(leases) - set(self.leases)
+                if gained or drain:
+                    logger.info(f"🧩 Node {self.node_id}: +{len(gained)} / -{len(drain)} device(s), "
+                                f"driving {len(leases)}")
+                self.ring, self.leases = ring, leases
+                self.draining = set(drain)
+            except Exception as e:
+                # Leases run out on their own; owns() stops this node before anyone else can take over
+                logger.error(f"Shard coordination failed: {e}")
+            await asyncio.sleep(self.heartbeat)
+
+    def leave(self):
+        """Release all leases and deregister, so the other nodes take over at once"""
+        self.leases = {}
+        try:
+            self.executor.submit(lambda: self.open_store().leave(self.node_id)).result(timeout=10)
+            logger.info(f"🧩 Shard node {self.node_id} left")
+        except Exception as e:
+            logger.error(f"Could not leave shard cleanly: {e}")
@@ -0,0 +1,130 @@
+"""
+Shot planning for frames with several birds.
+
+Instead of one shot per patrol stop, all birds of a frame are visited in
+one sequence. Pan and tilt move at the same time, so the time between two
+aim points is the slower of the two axes plus the settle time. The visit
+order minimizing total travel (including the return to the route
+position) is a small TSP: exact (Held-Karp) for up to EXACT_LIMIT
+targets, nearest neighbour plus 2-opt above that. The number of shots is
+capped by max_shots and by the water budget.
+"""
+
+from itertools import combinations
+
+EXACT_LIMIT = 8
+
+
+def rotation_distance(a, b, wrap=None):
+    """Pan distance in degrees; with wrap (e.g. 360) the turret may turn either way round"""
+    distance = abs(b - a)
+    if wrap:
+        distance %= wrap
+        distance = min(distance, wrap - distance)
+    return distance
+
+
+def travel_time(a, b, pan_speed, tilt_speed, settle_time=0.0, wrap=None):
+    """Seconds to move between two (rotation, tilt) positions"""
+    if a == b:
+        return 0.0
+    return max(rotation_distance(a[0], b[0], wrap) / pan_speed, abs(b[1] - a[1]) / tilt_speed) + settle_time
+
+
+def tour_time(start, points, order, cost, return_to_start=True):
+    position = start
+    total = 0.0
+    for index in order:
+        total += cost(position, points[index])
+        position = points[index]
+    if return_to_start:
+        total += cost(position, start)
+    return total
+
+
+def held_karp(start, points, cost, return_to_start=True):
+    """Exact minimal-time visiting order, O(n^2 * 2^n)"""
+    n = len(points)
+    # best[(subset, last)] = (time, previous)
+    best = {(1 << i, i): (cost(start, points[i]), None) for i in range(n)}
+    for size in range(2, n + 1):
+        for subset in combinations(range(n), size):
+            mask = sum(1 << i for i in subset)
+            for last in subset:
+                previous_mask = mask & ~(1 << last)
+                best[(mask, last)] = min(
+                    (best[(previous_mask, k)][0] + cost(points[k], points[last]), k)
+                    for k in subset if k != last
+                )
+
+    full = (1 << n) - 1
+    end_cost = (lambda i: cost(points[i], start)) if return_to_start else (lambda i: 0.0)
+    last = min(range(n), key=lambda i: best[(full, i)][0] + end_cost(i))
+
+    order = []
+    mask = full
+    while last is not None:
+        order.append(last)
+        mask, last = mask & ~(1 << last), best[(mask, last)][1]
+    return order[::-1]
+
+
+def nearest_neighbour_2opt(start, points, cost, return_to_start=True):
+    """Heuristic order for larger flocks"""
+    remaining = set(range(len(points)))
+    order = []
+    position = start
+    while remaining:
+        nearest = min(remaining, key=lambda i: cost(position, points[i]))
+        order.append(nearest)
+        remaining.discard(nearest)
+        position = points[nearest]
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(order) - 1):
+            for j in range(i + 1, len(order)):
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                if tour_time(start, points, candidate, cost, return_to_start) < \
+                        tour_time(start, points, order, cost, return_to_start) - 1e-9:
+                    order = candidate
+                    improved = True
+    return order
+
+
+def plan_shots(start, targets, pan_speed=60.0, tilt_speed=30.0, settle_time=0.5,
+               max_shots=3, water_budget_ms=None, shot_duration_ms=300, return_to_start=True):
+    """Order the targets into a minimal-travel shot sequence
+
+    start: current (rotation, tilt)
+    targets: dicts with 'angles' (absolute rotation, tilt) and optionally 'confidence'
+    Returns {"shots": [targets in firing order], "skipped": [...], "travel_time", "total_time"}.
+    """
+    limit = max_shots
+    if water_budget_ms is not None and shot_duration_ms > 0:
+        limit = min(limit, int(water_budget_ms // shot_duration_ms))
+
+    # Spend the budget on the most certain birds, then order those for travel
+    ranked = sorted(targets, key=lambda t: t.get('confidence', 0), reverse=True)
+    chosen, skipped = ranked[:max(limit, 0)], ranked[max(limit, 0):]
+    if not chosen:
+        return {"shots": [], "skipped": skipped, "travel_time": 0.0, "total_time": 0.0}
+
+    points = [tuple(t['angles']) for t in chosen]
+
+    def cost(a, b):
+        return travel_time(a, b, pan_speed, tilt_speed, settle_time)
+
+    if len(points) <= EXACT_LIMIT:
+        order = held_karp(start, points, cost, return_to_start)
+    else:
+        order = nearest_neighbour_2opt(start, points, cost, return_to_start)
+
+    travel = tour_time(start, points, order, cost, return_to_start)
+    return {
+        "shots": [chosen[i] for i in order],
+        "skipped": skipped,
+        "travel_time": travel,
+        "total_time": travel + len(order) * shot_duration_ms / 1000
+    }
@@ -0,0 +1,142 @@
+"""
+Camera stabilization after a move.
+
+The monitor used to sleep a fixed 2 s after every stop before capturing.
+Most stops settle much faster, so the image itself is watched instead:
+frames are read from the camera's persistent stream right after the
+movement completes, and the wait ends once `stable_frames` consecutive
+frames show
+
+- no global motion: the median over an 8x8 grid of mean absolute
+  differences to the previous frame (brightness-normalized, so auto
+  exposure doesn't count) stays under motion_threshold - a bird or
+  swaying branch moves a few cells, camera shake moves all of them
+- no blur: sharpness (variance of the Laplacian) is at least
+  sharpness_ratio of the sharpest frame seen during this wait.
+
+Each device's settle times are learned; once min_samples are known the
+wait is capped at margin x their 95th percentile instead of the fallback
+timeout, so a scene that never looks still (rain, heavy wind) costs a
+known worst case rather than the full timeout. A device that keeps
+hitting its learned cap starts learning from scratch.
+"""
+
+import time
+from collections import defaultdict, deque
+
+import cv2
+import numpy as np
+
+ANALYSIS_WIDTH = 320
+GRID = 8
+
+
+def prepare(frame):
+    """Small brightness-normalized grayscale image plus its sharpness"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height, width = gray.shape[:2]
+    if width > ANALYSIS_WIDTH:
+        gray = cv2.resize(gray, (ANALYSIS_WIDTH, max(GRID, round(height * ANALYSIS_WIDTH / width))),
+                          interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    small = gray.astype(np.float32)
+    return small - small.mean(), sharpness
+
+
+def motion_score(previous, current):
+    """Median of per-cell mean absolute differences (gray levels)"""
+    diff = np.abs(current - previous)
+    height, width = diff.shape
+    cells = diff[:height - height % GRID, :width - width % GRID].reshape(GRID, height // GRID, GRID, width // GRID)
+    return float(np.median(cells.mean(axis=(1, 3))))
+
+
+class Stabilizer:
+
+    def __init__(self, timeout=2.0, motion_threshold=2.0, sharpness_ratio=0.8, stable_frames=2,
+                 min_bound=0.3, margin=1.5, min_samples=5, history=20, max_misses=3):
+        self.timeout = timeout
+        self.motion_threshold = motion_threshold
+        self.sharpness_ratio = sharpness_ratio
+        self.stable_frames = stable_frames
+        self.min_bound = min_bound
+        self.margin = margin
+        self.min_samples = min_samples
+        self.settle_times = defaultdict(lambda: deque(maxlen=history))
+        self.misses = defaultdict(int)
+        self.max_misses = max_misses
+
+    def bound(self, device):
+        """Longest wait for this device: learned from its settle times, else the fallback timeout"""
+        samples = self.settle_times.get(device)
+        if not samples or len(samples) < self.min_samples:
+            return self.timeout
+        learned = float(np.percentile(samples, 95)) * self.margin
+        return min(self.timeout, max(self.min_bound, learned))
+
+    def learn(self, device, report):
+        if report['stable']:
+            self.settle_times[device].append(report['waited'])
+            self.misses[device] = 0
+        elif report['bound'] < self.timeout:
+            # Capped by the learned bound - if that keeps happening the bound is too tight
+            self.misses[device] += 1
+            if self.misses[device] >= self.max_misses:
+                self.settle_times[device].clear()
+                self.misses[device] = 0
+
+    async def wait(self, device, next_frame, run_in_executor):
+        """Wait until the image is stable or the device's bound is reached
+
+        next_frame(after, timeout): awaitable (timestamp, frame) of the next
+        frame newer than `after`, or None.
+        run_in_executor(fn, *args): awaitable running fn off the event loop.
+        Returns a report dict: stable, waited, bound, frames, motion, sharpness.
+        """
+        start = time.time()
+        bound = self.bound(device)
+        deadline = start + bound
+        previous = None
+        best_sharpness = 0.0
+        stable = 0
+        frames = 0
+        last = start
+        motion = sharpness = None
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            item = await next_frame(last, remaining)
+            if item is None:
+                break
+            last, frame = item
+            frames += 1
+            current, sharpness = await run_in_executor(prepare, frame)
+            best_sharpness = max(best_sharpness, sharpness)
+            if previous is not None and previous.shape == current.shape:
+                motion = motion_score(previous, current)
+                if motion < self.motion_threshold and sharpness >= self.sharpness_ratio * best_sharpness:
+                    stable += 1
+                else:
+                    stable = 0
+            previous = current
+            if stable >= self.stable_frames:
+                report = self.report(True, max(0.0, last - start), bound, frames, motion, sharpness)
+                self.learn(device, report)
+                return report
+
+        report = self.report(False, time.time() - start, bound, frames, motion, sharpness)
+        self.learn(device, report)
+        return report
+
+    @staticmethod
+    def report(stable, waited, bound, frames, motion, sharpness):
+        return {
+            'stable': stable,
+            'waited': round(waited, 3),
+            'bound': round(bound, 3),
+            'frames': frames,
+            'motion': round(motion, 2) if motion is not None else None,
+            'sharpness': round(sharpness, 1) if sharpness is not None else None
+        }
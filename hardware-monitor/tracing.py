@@ -0,0 +1,280 @@
+"""
+Span tracing for patrol cycles.
+
+Each cycle (move to a route point or impulse step, then analyse and maybe
+shoot) is one trace. Its spans cover the steps the cycle time is made of:
+move command, movement wait, stabilize, capture, encode, CV round-trip,
+DB save and shoot. Attributes set on the cycle (device, route point) are
+copied to every span of the trace, so any span can be grouped by device
+without walking up the tree.
+
+The current span is kept in a context variable, so nesting follows the
+async call structure. The CV request carries the span as a W3C
+traceparent header, which lets cv-service tie its request metrics to the
+cycle that caused them.
+
+Finished spans are exported by a background thread to a JSON-lines file
+(TRACE_FILE) and/or an OTLP/HTTP JSON endpoint (TRACE_OTLP_URL, e.g. an
+OpenTelemetry collector or the load test's stand-in). Without an exporter
+the tracer is disabled and spans are no-ops.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH = 256
+
+current_span = ContextVar('current_span', default=None)
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'attributes', 'start_ns', 'start_perf', 'duration_ns',
+                 'status', 'error')
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.start_perf = time.perf_counter_ns()
+        self.duration_ns = None
+        self.status = 'ok'
+        self.error = None
+
+    @property
+    def trace_id(self):
+        return self.trace.trace_id
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def traceparent(self):
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self.duration_ns / 1e6, 3),
+            "attributes": {k: v for k, v in {**self.trace.attributes, **self.attributes}.items() if v is not None},
+            "status": self.status,
+            **({"error": self.error} if self.error else {})
+        }
+
+
+class Trace:
+    __slots__ = ('trace_id', 'attributes')
+
+    def __init__(self, attributes):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.attributes = attributes
+
+
+class NoopSpan:
+    """Stand-in when tracing is off or no cycle is active"""
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def traceparent(self):
+        return None
+
+
+NOOP_SPAN = NoopSpan()
+
+
+def server_time_ms(server_timing):
+    """Duration from a Server-Timing header ("app;dur=12.3"), None if absent"""
+    for metric in (server_timing or '').split(','):
+        for param in metric.split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key == 'dur':
+                try:
+                    return float(value)
+                except ValueError:
+                    return None
+    return None
+
+
+class JsonLinesExporter:
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def export(self, spans):
+        for span in spans:
+            self.file.write(json.dumps(span, default=str) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans, service_name):
+    """OTLP/JSON ExportTraceServiceRequest for a batch of span dicts"""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{
+            "scope": {"name": "hardware-monitor.tracing"},
+            "spans": [{
+                "traceId": span["trace_id"],
+                "spanId": span["span_id"],
+                **({"parentSpanId": span["parent_id"]} if span["parent_id"] else {}),
+                "name": span["name"],
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                "endTimeUnixNano": str(int(span["start"] * 1e9 + span["duration_ms"] * 1e6)),
+                "attributes": [{"key": k, "value": otlp_value(v)} for k, v in span["attributes"].items()],
+                "status": {"code": 2, "message": span.get("error", "")} if span["status"] == 'error' else {"code": 1}
+            } for span in spans]
+        }]
+    }]}
+
+
+class OtlpHttpExporter:
+    """POSTs spans as OTLP/JSON to <url>/v1/traces"""
+
+    def __init__(self, url, service_name='hardware-monitor', timeout=5.0):
+        self.url = url.rstrip('/') + ('' if url.rstrip('/').endswith('/v1/traces') else '/v1/traces')
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def export(self, spans):
+        body = json.dumps(to_otlp(spans, self.service_name), default=str).encode()
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except Exception as e:
+            # Traces are diagnostics - drop the batch rather than pile up behind a dead collector
+            logger.warning(f"Trace export to {self.url} failed, dropped {len(spans)} spans: {e}")
+
+    def close(self):
+        pass
+
+
+class Tracer:
+
+    def __init__(self, exporters=(), sample_rate=1.0):
+        self.exporters = list(exporters)
+        self.enabled = bool(self.exporters)
+        self.sample_rate = sample_rate
+        self.pending = queue.SimpleQueue()
+        if self.enabled:
+            self.writer = threading.Thread(target=self.export_loop, name='tracer', daemon=True)
+            self.writer.start()
+
+    @classmethod
+    def from_env(cls, getenv):
+        exporters = []
+        if getenv('TRACE_FILE'):
+            exporters.append(JsonLinesExporter(getenv('TRACE_FILE')))
+        if getenv('TRACE_OTLP_URL'):
+            exporters.append(OtlpHttpExporter(getenv('TRACE_OTLP_URL'),
+                                              getenv('TRACE_SERVICE_NAME', 'hardware-monitor')))
+        return cls(exporters, sample_rate=float(getenv('TRACE_SAMPLE_RATE', '1.0')))
+
+    @contextmanager
+    def cycle(self, name, **attributes):
+        """Start a new trace with a root span; nested span() calls belong to it"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            token = current_span.set(None)
+            try:
+                yield NOOP_SPAN
+            finally:
+                current_span.reset(token)
+            return
+        with self.run_span(Span(Trace(attributes), name, None, {})) as span:
+            yield span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Child span of the current one; a no-op outside a traced cycle"""
+        parent = current_span.get()
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        with self.run_span(Span(parent.trace, name, parent.span_id, attributes)) as span:
+            yield span
+
+    @contextmanager
+    def run_span(self, span):
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = 'error'
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ns = time.perf_counter_ns() - span.start_perf
+            current_span.reset(token)
+            self.pending.put(span)
+
+    def set_cycle_attributes(self, **attributes):
+        """Attributes for every span of the current trace (also those already finished)"""
+        span = current_span.get()
+        if span is not None:
+            span.trace.attributes.update(attributes)
+
+    def traceparent(self):
+        span = current_span.get()
+        return span.traceparent() if span is not None else None
+
+    def export_loop(self):
+        while True:
+            span = self.pending.get()
+            if span is None:
+                return
+            # Cycle attributes are merged into each span when it is converted here
+            batch = [span]
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    span = self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if span is None:
+                    self.export(batch)
+                    return
+                batch.append(span)
+            self.export(batch)
+
+    def export(self, spans):
+        records = [span.to_dict() for span in spans]
+        for exporter in self.exporters:
+            try:
+                exporter.export(records)
+            except Exception as e:
+                logger.error(f"Trace export failed: {e}")
+
+    def close(self):
+        if self.enabled:
+            self.pending.put(None)
+            self.writer.join(timeout=5)
+            for exporter in self.exporters:
+                exporter.close()
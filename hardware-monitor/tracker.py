@@ -0,0 +1,241 @@
+"""
+Lightweight multi-object tracker for bird detections (SORT-style).
+
+Each track is a constant-velocity Kalman filter over the bbox center
+(plus width/height, assumed constant). Detections of a new frame are
+associated to the predicted tracks greedily by IoU, with a center
+distance fallback for small, fast birds whose boxes no longer overlap.
+Frames carry their capture timestamps, so velocities are in pixels per
+second and a track can be extrapolated to the moment the shot is fired.
+
+Tracks live in image coordinates of one camera pose - create a new
+tracker whenever the turret has moved.
+
+Between CV service detections, follow() moves the tracks along by
+template matching: each bird's patch of the previous frame is searched
+for in a window around its predicted position in the next one. That
+costs a few small correlations per frame instead of a model inference.
+"""
+
+import cv2
+import numpy as np
+
+# State: [cx, cy, w, h, vx, vy]
+MEASUREMENT = np.hstack([np.eye(4), np.zeros((4, 2))])
+
+
+def bbox_to_xywh(bbox):
+    """CV service bbox dict -> (cx, cy, w, h)"""
+    w = float(bbox.get('width', 0))
+    h = float(bbox.get('height', 0))
+    return float(bbox.get('x', 0)) + w / 2, float(bbox.get('y', 0)) + h / 2, w, h
+
+
+def xywh_to_bbox(cx, cy, w, h):
+    return {"x": float(cx - w / 2), "y": float(cy - h / 2), "width": float(w), "height": float(h)}
+
+
+def clip_window(cx, cy, half_w, half_h, shape):
+    """Integer (x1, y1, x2, y2) of a box clipped to an image of the given shape"""
+    height, width = shape[:2]
+    x1, y1 = max(int(round(cx - half_w)), 0), max(int(round(cy - half_h)), 0)
+    x2, y2 = min(int(round(cx + half_w)), width), min(int(round(cy + half_h)), height)
+    return x1, y1, x2, y2
+
+
+def gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU between two arrays of (cx, cy, w, h) boxes"""
+    a = np.asarray(boxes_a, dtype=float).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=float).reshape(-1, 4)
+    a1, a2 = a[:, None, :2] - a[:, None, 2:] / 2, a[:, None, :2] + a[:, None, 2:] / 2
+    b1, b2 = b[None, :, :2] - b[None, :, 2:] / 2, b[None, :, :2] + b[None, :, 2:] / 2
+    overlap = np.clip(np.minimum(a2, b2) - np.maximum(a1, b1), 0, None)
+    intersection = overlap[..., 0] * overlap[..., 1]
+    union = (a[:, None, 2] * a[:, None, 3]) + (b[None, :, 2] * b[None, :, 3]) - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    """Constant-velocity Kalman filter for one bird"""
+
+    def __init__(self, track_id, detection, timestamp, position_noise=4.0, velocity_noise=200.0):
+        cx, cy, w, h = bbox_to_xywh(detection['bbox'])
+        self.id = track_id
+        self.state = np.array([cx, cy, w, h, 0.0, 0.0])
+        # Velocity is unknown at birth
+        self.covariance = np.diag([position_noise ** 2] * 4 + [velocity_noise ** 2] * 2)
+        self.position_noise = position_noise
+        self.timestamp = timestamp
+        self.detection = detection
+        self.hits = 1
+        self.misses = 0
+
+    def transition(self, dt):
+        F = np.eye(6)
+        F[0, 4] = F[1, 5] = dt
+        return F
+
+    def predict(self, timestamp):
+        """Advance the filter to timestamp (in place)"""
+        dt = max(timestamp - self.timestamp, 0.0)
+        F = self.transition(dt)
+        # White-noise acceleration, scaled with the time step
+        q = (self.position_noise * 10) ** 2
+        Q = np.diag([q * dt ** 3 / 3] * 2 + [self.position_noise ** 2 * dt] * 2 + [q * dt] * 2)
+        self.state = F @ self.state
+        self.covariance = F @ self.covariance @ F.T + Q
+        self.timestamp = timestamp
+
+    def update(self, detection):
+        z = np.array(bbox_to_xywh(detection['bbox']))
+        R = np.eye(4) * self.position_noise ** 2
+        S = MEASUREMENT @ self.covariance @ MEASUREMENT.T + R
+        K = self.covariance @ MEASUREMENT.T @ np.linalg.inv(S)
+        self.state = self.state + K @ (z - MEASUREMENT @ self.state)
+        self.covariance = (np.eye(6) - K @ MEASUREMENT) @ self.covariance
+        self.detection = detection
+        self.hits += 1
+        self.misses = 0
+
+    def box(self):
+        return self.state[:4]
+
+    def position_at(self, timestamp):
+        """Extrapolated (cx, cy, w, h) at timestamp without changing the filter"""
+        dt = timestamp - self.timestamp
+        cx, cy, w, h, vx, vy = self.state
+        return cx + vx * dt, cy + vy * dt, w, h
+
+    def to_dict(self, timestamp=None):
+        cx, cy, w, h = self.position_at(timestamp) if timestamp is not None else self.box()
+        return {
+            "track_id": self.id,
+            "bbox": xywh_to_bbox(cx, cy, w, h),
+            "velocity": {"x": float(self.state[4]), "y": float(self.state[5])},
+            "hits": self.hits,
+            "confidence": float(self.detection.get('confidence', 0)),
+            "timestamp": timestamp if timestamp is not None else self.timestamp
+        }
+
+
+class BirdTracker:
+    """Associates detections across a short burst of frames into tracks
+
+    iou_threshold: minimum IoU to match a detection to a predicted track
+    max_distance: fallback match radius in box sizes when boxes don't overlap
+    max_misses: frames a track may go unmatched before it is dropped
+    search_margin: follow() searches this many box sizes around the prediction
+    min_match: minimum normalized correlation of a template match
+    """
+
+    def __init__(self, iou_threshold=0.2, max_distance=3.0, max_misses=2, search_margin=1.0, min_match=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.search_margin = search_margin
+        self.min_match = min_match
+        self.tracks = []
+        self.next_id = 1
+        self.last_timestamp = None
+
+    def associate(self, detections):
+        """Greedy matching on IoU, then on normalized center distance"""
+        if not self.tracks or not detections:
+            return [], list(range(len(self.tracks))), list(range(len(detections)))
+
+        predicted = np.array([track.box() for track in self.tracks])
+        measured = np.array([bbox_to_xywh(d['bbox']) for d in detections])
+        iou = iou_matrix(predicted, measured)
+
+        # Center distance in units of the track's box size
+        scale = np.maximum(predicted[:, None, 2:].max(axis=2), 1.0)
+        distance = np.linalg.norm(predicted[:, None, :2] - measured[None, :, :2], axis=2) / scale
+
+        matches = []
+        unmatched_tracks = set(range(len(self.tracks)))
+        unmatched_detections = set(range(len(detections)))
+        for score, valid in ((iou, iou >= self.iou_threshold), (-distance, distance <= self.max_distance)):
+            candidates = [(score[t, d], t, d) for t, d in zip(*np.nonzero(valid))
+                          if t in unmatched_tracks and d in unmatched_detections]
+            for _, t, d in sorted(candidates, reverse=True):
+                if t in unmatched_tracks and d in unmatched_detections:
+                    matches.append((t, d))
+                    unmatched_tracks.discard(t)
+                    unmatched_detections.discard(d)
+
+        return matches, sorted(unmatched_tracks), sorted(unmatched_detections)
+
+    def update(self, detections, timestamp):
+        """Feed the detections of one frame; returns the live tracks"""
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        matches, unmatched_tracks, unmatched_detections = self.associate(detections)
+        for t, d in matches:
+            self.tracks[t].update(detections[d])
+        for t in unmatched_tracks:
+            self.tracks[t].misses += 1
+        for d in unmatched_detections:
+            self.tracks.append(Track(self.next_id, detections[d], timestamp))
+            self.next_id += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        self.last_timestamp = timestamp
+        return self.tracks
+
+    def locate(self, track, previous, frame, timestamp):
+        """Detection of track in frame by matching its patch of previous, None if not found"""
+        cx, cy, w, h = track.box()
+        x1, y1, x2, y2 = clip_window(cx, cy, w / 2, h / 2, previous.shape)
+        if x2 - x1 < 4 or y2 - y1 < 4:
+            return None
+        template = gray(previous[y1:y2, x1:x2])
+
+        # Search around the predicted center, widened by the distance the bird may have flown
+        px, py, _, _ = track.position_at(timestamp)
+        margin = self.search_margin * max(w, h)
+        sx1, sy1, sx2, sy2 = clip_window(px, py, w / 2 + margin, h / 2 + margin, frame.shape)
+        if sx2 - sx1 < template.shape[1] or sy2 - sy1 < template.shape[0]:
+            return None
+        scores = cv2.matchTemplate(gray(frame[sy1:sy2, sx1:sx2]), template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+        if not score >= self.min_match:
+            return None
+
+        # The patch may have been clipped at the image border - keep the box's offset to it
+        x = sx1 + mx - (x1 - (cx - w / 2))
+        y = sy1 + my - (y1 - (cy - h / 2))
+        return {**track.detection, "bbox": {"x": float(x), "y": float(y), "width": float(w), "height": float(h)},
+                "match_score": float(score)}
+
+    def follow(self, previous, frame, timestamp):
+        """Feed a frame without detections: tracks are located by template matching
+
+        previous is the frame of the tracks' last update. Tracks not found
+        count a miss; no new tracks are started.
+        """
+        for track in self.tracks:
+            detection = self.locate(track, previous, frame, timestamp)
+            track.predict(timestamp)
+            if detection is not None:
+                track.update(detection)
+            else:
+                track.misses += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        self.last_timestamp = timestamp
+        return self.tracks
+
+    def get(self, track_id):
+        return next((track for track in self.tracks if track.id == track_id), None)
+
+    def best_track(self):
+        """Most reliable target: seen most often, then highest confidence"""
+        live = [track for track in self.tracks if track.misses == 0] or self.tracks
+        if not live:
+            return None
+        return max(live, key=lambda track: (track.hits, track.detection.get('confidence', 0)))
@@ -16,6 +16,12 @@ const detectionSchema = new mongoose.Schema({
     filename: String,
     size: Number
   },
+  // Full-resolution original, only stored for confirmed hits
+  full_image: {
+    url: String,
+    filename: String,
+    size: Number
+  },
   detections: [{
     class: String,
     confidence: Number,
@@ -81,7 +81,13 @@ const deviceSchema = new mongoose.Schema({
       default: false
     },
     lastImage: String,
-    lastDetection: Date
+    lastDetection: Date,
+    // Lens calibration for aiming (full-sensor FOV in degrees, radial distortion k1)
+    calibration: {
+      hfov: Number,
+      vfov: Number,
+      k1: Number
+    }
   },
   // Route Configuration
   actions: {
@@ -12,6 +12,8 @@ router.post('/detection', async (req, res) => {
       deviceId, 
       original_image, 
       zoomed_image, 
+      full_image,
+      image_format,
       detections, 
       bird_count, 
       confidence_level, 
@@ -31,19 +33,27 @@ router.post('/detection', async (req, res) => {
       return res.status(404).json({ error: 'Device not found' });
     }
     
-    // Create detection record with both images
+    // Create detection record with both images (and the full image for confirmed hits)
+    const extension = image_format === 'webp' ? 'webp' : 'jpg';
     const detection = new Detection({
       device: device._id,
       image: {
         url: original_image,
-        filename: `detection_original_${deviceId}_${Date.now()}.jpg`,
+        filename: `detection_original_${deviceId}_${Date.now()}.${extension}`,
         size: original_image ? original_image.length : 0
       },
       zoomed_image: {
         url: zoomed_image,
-        filename: `detection_zoomed_${deviceId}_${Date.now()}.jpg`,
+        filename: `detection_zoomed_${deviceId}_${Date.now()}.${extension}`,
         size: zoomed_image ? zoomed_image.length : 0
       },
+      ...(full_image && {
+        full_image: {
+          url: full_image,
+          filename: `detection_full_${deviceId}_${Date.now()}.${extension}`,
+          size: full_image.length
+        }
+      }),
       detections: detections || [],
       processedAt: new Date(timestamp || Date.now()),
       processingTime: processing_time || 0,